@@ -1,7 +1,10 @@
 from typing import List, Dict, Optional
 import re
+from datetime import datetime
 from dotenv import load_dotenv
 
+from utils.data_loader import SnapshotMissingError, get_json, get_run_date, recorded_snapshot_id, snapshot_json
+
 load_dotenv()
 
 def normalize_pitcher_name(name: str) -> str:
@@ -46,7 +49,48 @@ def get_team_abbreviation(team_name: str) -> str:
     }
     return team_map.get(team_name, team_name)
 
+def props_key(date: str, market: str = 'strikeouts') -> str:
+    # Strikeout props keep their original snapshot key so older runs still replay
+    return f"props:{date}" if market == 'strikeouts' else f"props:{market}:{date}"
+
+
+def _recorded_props(date: str, market: str) -> List[Dict]:
+    snapshot_id = recorded_snapshot_id(props_key(date, market), date)
+    if snapshot_id is not None:
+        return get_json(snapshot_id)
+    if market in ENTERED_PROPS:
+        raise SnapshotMissingError(f"No {market} props recorded for {date}; lines can only be entered for today's slate")
+    return []
+
+
+def get_props(date: Optional[str] = None, market: str = 'strikeouts') -> List[Dict]:
+    """
+    Pitcher props for one market, each tagged with its market.
+
+    The entered lines are today's; a slate before today uses the props a run
+    recorded on its date.
+    """
+    if date is None:
+        date = get_run_date()
+
+    def fetch():
+        if date < datetime.now().strftime('%Y-%m-%d'):
+            return _recorded_props(date, market)
+        return ENTERED_PROPS.get(market, list)()
+
+    props = snapshot_json(props_key(date, market), fetch)
+    return [{**prop, 'market': market} for prop in props]
+
+
+def get_all_props(date: Optional[str] = None, markets: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+    return {market: get_props(date, market) for market in markets or list(ENTERED_PROPS)}
+
+
 def get_strikeout_props(date: Optional[str] = None) -> List[Dict]:
+    return get_props(date, 'strikeouts')
+
+
+def _entered_props() -> List[Dict]:
     # Currently this must be manually inputted each day
     return [
         {'pitcher': 'Chad Patrick', 'team': 'MIL', 'opponent': 'COL', 'line': 6.5, 'over_odds': None, 'under_odds': -165, 'book': 'ESPN Bet'},
@@ -79,3 +123,7 @@ def get_strikeout_props(date: Optional[str] = None) -> List[Dict]:
     ]
 
 
+# Manually entered lines by market; markets without an entry have no props today
+ENTERED_PROPS = {
+    'strikeouts': _entered_props
+}
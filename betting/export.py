@@ -1,14 +1,18 @@
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 import os
 
-def prepare_dataframe(results: List[Dict]) -> pd.DataFrame:
+from features.markets import MARKETS
 
+def prepare_dataframe(results: List[Dict], market: str = "strikeouts") -> pd.DataFrame:
+
+    results = [r for r in results if r.get("market", "strikeouts") == market]
+    projected = MARKETS[market].column
     df = pd.DataFrame(results)
     columns = [
         "pitcher", "team", "opponent", "game_time", "home_away",
-        "projected_k", "book_line", "edge_pct", "confidence_pct", "recommendation"
+        projected, "book_line", "edge_pct", "confidence_pct", "recommendation", "lineup_status"
     ]
     
     for col in columns:
@@ -17,6 +21,8 @@ def prepare_dataframe(results: List[Dict]) -> pd.DataFrame:
                 df[col] = None
             elif col == "home_away":
                 df[col] = "Unknown"
+            elif col == "lineup_status":
+                df[col] = "confirmed"
             else:
                 df[col] = 0.0
     
@@ -24,7 +30,7 @@ def prepare_dataframe(results: List[Dict]) -> pd.DataFrame:
     
     df = df.sort_values("edge_pct", key=abs, ascending=False)
 
-    df["projected_k"] = df["projected_k"].round(1)
+    df[projected] = df[projected].round(1)
     df["book_line"] = df["book_line"].round(1)
     df["edge_pct"] = df["edge_pct"].round(1)
     df["confidence_pct"] = df["confidence_pct"].round(1)
@@ -34,7 +40,8 @@ def prepare_dataframe(results: List[Dict]) -> pd.DataFrame:
 def export_results(
     results: List[Dict],
     export_type: str = "excel",
-    date: str = None
+    date: str = None,
+    snapshots: Optional[Dict[str, str]] = None
 ) -> None:
     df = prepare_dataframe(results)
     if date is None:
@@ -44,7 +51,23 @@ def export_results(
         os.makedirs("exports", exist_ok=True)
         
         filename = f"exports/strikeout_model_{date}.xlsx"
-        df.to_excel(filename, index=False)
+        with pd.ExcelWriter(filename) as writer:
+            df.to_excel(writer, sheet_name="projections", index=False)
+            for market in MARKETS:
+                if market != "strikeouts" and any(r.get("market") == market for r in results):
+                    prepare_dataframe(results, market).to_excel(writer, sheet_name=market, index=False)
+            attributions = [
+                {"pitcher": r["pitcher"], "team": r["team"], "model_k": r.get("model_k"), **r["attributions"]}
+                for r in results if r.get("attributions")
+            ]
+            if attributions:
+                # Per-feature TreeSHAP contributions of the XGBoost model; with bias they sum to log(model_k)
+                pd.DataFrame(attributions).to_excel(writer, sheet_name="attributions", index=False)
+            if snapshots:
+                # Input snapshot ids the run read, so the sheet can be replayed with --as-of
+                pd.DataFrame(sorted(snapshots.items()), columns=["input", "snapshot_id"]).to_excel(
+                    writer, sheet_name="snapshots", index=False
+                )
         print(f"\nExported results to {filename}")
         
     elif export_type.lower() == "sheets":
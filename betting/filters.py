@@ -1,11 +1,14 @@
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from features.markets import MARKETS, projected_value
+
 def filter_bets(
     results: List[Dict],
     edge_thresh: float = 7.0,
     conf_thresh: float = 70.0,
-    direction: Optional[str] = None
+    direction: Optional[str] = None,
+    market: Optional[str] = None
 ) -> List[Dict]:
 
     if not results:
@@ -15,6 +18,9 @@ def filter_bets(
     filtered = []
     for r in results:
 
+        if market is not None and r.get("market", "strikeouts") != market:
+            continue
+
         if r.get("confidence_pct", 0) < conf_thresh:
             continue
             
@@ -75,7 +81,8 @@ def print_filtered_bets(filtered_bets: List[Dict], summary: Dict) -> None:
     print("\nDetailed Picks:")
     for bet in filtered_bets:
         print(f"\n{bet['pitcher']} ({bet['team']} vs {bet['opponent']})")
-        print(f"Projected Ks: {bet['projected_k']} | Book Line: {bet['book_line']}")
+        market = MARKETS[bet.get('market', 'strikeouts')]
+        print(f"Projected {market.label}: {projected_value(bet)} | Book Line: {bet['book_line']}")
         print(f"Edge: {bet['edge_pct']}% | Confidence: {bet['confidence_pct']}%")
         print(f"Recommendation: {bet['recommendation']}")
         if "game_time" in bet:
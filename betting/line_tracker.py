@@ -0,0 +1,226 @@
+import argparse
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import cache_path
+
+TRACKER_NAME = 'line_tracker.sqlite'
+
+PROJECTION_FIELDS = ['pitcher', 'team', 'opponent', 'book_line', 'projected_k', 'edge_pct', 'confidence_pct',
+                     'recommendation', 'lineup_status']
+LINE_FIELDS = ['pitcher', 'team', 'book', 'line', 'over_odds', 'under_odds']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    slate_date TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_slate ON runs (slate_date, recorded_at);
+CREATE TABLE IF NOT EXISTS projections (
+    run_id TEXT NOT NULL,
+    pitcher TEXT NOT NULL,
+    team TEXT,
+    opponent TEXT,
+    book_line REAL,
+    projected_k REAL,
+    edge_pct REAL,
+    confidence_pct REAL,
+    recommendation TEXT,
+    lineup_status TEXT
+);
+CREATE INDEX IF NOT EXISTS projections_by_run ON projections (run_id, pitcher);
+CREATE TABLE IF NOT EXISTS lines (
+    run_id TEXT NOT NULL,
+    pitcher TEXT NOT NULL,
+    team TEXT,
+    book TEXT,
+    line REAL,
+    over_odds REAL,
+    under_odds REAL
+);
+CREATE INDEX IF NOT EXISTS lines_by_run ON lines (run_id, pitcher, book);
+"""
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    connection = sqlite3.connect(path or cache_path(TRACKER_NAME), timeout=30)
+    # WAL lets batch worker processes append while another run reads
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def record_run(
+    run_id: str,
+    slate_date: str,
+    projections: List[Dict],
+    lines: List[Dict],
+    path: Optional[str] = None
+) -> None:
+    """
+    Append one run's projections and book lines. Rows are never updated; recording
+    the same run_id twice is a no-op.
+    """
+    recorded_at = datetime.now().isoformat(timespec='seconds')
+    # closing() closes the connection; the inner block commits the run's rows as one transaction
+    with closing(connect(path)) as connection, connection:
+        inserted = connection.execute(
+            "INSERT OR IGNORE INTO runs VALUES (?, ?, ?)", (run_id, slate_date, recorded_at)
+        ).rowcount
+        if not inserted:
+            return
+        connection.executemany(
+            f"INSERT INTO projections VALUES (?, {', '.join('?' * len(PROJECTION_FIELDS))})",
+            [(run_id, *(proj.get(field) for field in PROJECTION_FIELDS)) for proj in projections]
+        )
+        connection.executemany(
+            f"INSERT INTO lines VALUES (?, {', '.join('?' * len(LINE_FIELDS))})",
+            [(run_id, *(line.get(field) for field in LINE_FIELDS)) for line in lines]
+        )
+
+
+def slate_runs(slate_date: str, path: Optional[str] = None) -> pd.DataFrame:
+    with closing(connect(path)) as connection:
+        return pd.read_sql_query(
+            "SELECT run_id, recorded_at FROM runs WHERE slate_date = ? ORDER BY recorded_at, run_id",
+            connection, params=(slate_date,)
+        )
+
+
+def _run_rows(table: str, run_id: str, connection: sqlite3.Connection) -> pd.DataFrame:
+    return pd.read_sql_query(f"SELECT * FROM {table} WHERE run_id = ?", connection, params=(run_id,))
+
+
+def diff_projections(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-pitcher changes between two runs: projection, edge and line deltas,
+    recommendation flips and pitchers added to or dropped from the slate.
+    """
+    keys = ['pitcher', 'team']
+    merged = previous.drop(columns='run_id').merge(
+        current.drop(columns='run_id'), on=keys, how='outer', suffixes=('_prev', ''), indicator=True
+    )
+    merged['status'] = merged['_merge'].map({'left_only': 'dropped', 'right_only': 'added', 'both': 'kept'}).astype(str)
+    for column in ('projected_k', 'edge_pct', 'book_line', 'confidence_pct'):
+        merged[f'{column}_change'] = merged[column] - merged[f'{column}_prev']
+    merged['recommendation_flip'] = (
+        (merged['status'] == 'kept') & (merged['recommendation'] != merged['recommendation_prev'])
+    )
+    merged['lineup_confirmed'] = (merged['lineup_status_prev'] == 'projected') & (merged['lineup_status'] == 'confirmed')
+
+    moved = (
+        merged[['projected_k_change', 'edge_pct_change', 'book_line_change']].fillna(0).abs().to_numpy().max(axis=1) > 1e-9
+    )
+    merged['changed'] = (merged['status'] != 'kept') | merged['recommendation_flip'] | merged['lineup_confirmed'] | moved
+    return merged.drop(columns='_merge').sort_values('edge_pct_change', key=np.abs, ascending=False, na_position='first')
+
+
+def diff_lines(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """
+    Line and price moves per (pitcher, book) between two runs.
+    """
+    keys = ['pitcher', 'team', 'book']
+    merged = previous.drop(columns='run_id').merge(
+        current.drop(columns='run_id'), on=keys, how='outer', suffixes=('_prev', '')
+    )
+    for column in ('line', 'over_odds', 'under_odds'):
+        merged[f'{column}_move'] = merged[column] - merged[f'{column}_prev']
+    moves = merged[['line_move', 'over_odds_move', 'under_odds_move']].to_numpy()
+    appeared = merged['line_prev'].isna() != merged['line'].isna()
+    merged['changed'] = appeared | (np.nan_to_num(np.abs(moves)).max(axis=1) > 1e-9)
+    return merged
+
+
+def changes_since_last_run(slate_date: str, run_id: Optional[str] = None, path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Diff run_id (default: the latest run of the slate) against the run before it.
+    Returns None when there is no earlier run to compare with.
+    """
+    runs = slate_runs(slate_date, path)['run_id'].tolist()
+    if run_id is None and runs:
+        run_id = runs[-1]
+    if run_id not in runs or runs.index(run_id) == 0:
+        return None
+    previous_id = runs[runs.index(run_id) - 1]
+
+    with closing(connect(path)) as connection:
+        projections = diff_projections(_run_rows('projections', previous_id, connection), _run_rows('projections', run_id, connection))
+        lines = diff_lines(_run_rows('lines', previous_id, connection), _run_rows('lines', run_id, connection))
+    return {
+        'previous_run': previous_id,
+        'run': run_id,
+        'projections': projections[projections['changed']],
+        'lines': lines[lines['changed']]
+    }
+
+
+def print_changes(changes: Optional[Dict]) -> None:
+    if changes is None:
+        print("\nNo earlier run of this slate to compare against")
+        return
+
+    print(f"\nChanges since last run ({changes['previous_run']} -> {changes['run']})")
+    print("=" * 80)
+    projections = changes['projections']
+    if projections.empty:
+        print("No projection changes")
+    for _, row in projections.iterrows():
+        if row['status'] == 'added':
+            print(f"+ {row['pitcher']} ({row['team']}): {row['projected_k']} Ks vs line {row['book_line']}, {row['recommendation']}")
+            continue
+        if row['status'] == 'dropped':
+            print(f"- {row['pitcher']} ({row['team']}) dropped from slate")
+            continue
+        notes = []
+        if row['projected_k_change']:
+            notes.append(f"proj {row['projected_k_prev']} -> {row['projected_k']}")
+        if row['book_line_change']:
+            notes.append(f"line {row['book_line_prev']} -> {row['book_line']}")
+        if row['edge_pct_change']:
+            notes.append(f"edge {row['edge_pct_prev']:+.1f}% -> {row['edge_pct']:+.1f}%")
+        if row['recommendation_flip']:
+            notes.append(f"FLIP {row['recommendation_prev']} -> {row['recommendation']}")
+        if row['lineup_confirmed']:
+            notes.append("lineup confirmed")
+        print(f"~ {row['pitcher']} ({row['team']}): {'; '.join(notes)}")
+
+    lines = changes['lines']
+    if not lines.empty:
+        print("\nLine moves:")
+        for _, row in lines.iterrows():
+            print(f"{row['pitcher']} @ {row['book']}: {row['line_prev']} -> {row['line']} "
+                  f"(over {row['over_odds_prev']} -> {row['over_odds']}, under {row['under_odds_prev']} -> {row['under_odds']})")
+
+
+def pitcher_history(slate_date: str, pitcher: str, path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Time series of one pitcher's projection and line across every run of a slate.
+    """
+    with closing(connect(path)) as connection:
+        return pd.read_sql_query(
+            "SELECT r.recorded_at, p.* FROM projections p JOIN runs r ON r.run_id = p.run_id "
+            "WHERE r.slate_date = ? AND p.pitcher = ? ORDER BY r.recorded_at",
+            connection, params=(slate_date, pitcher)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show what changed between runs of a slate")
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'))
+    parser.add_argument('--run', default=None, help="Run id to diff against its predecessor (default: latest)")
+    parser.add_argument('--pitcher', default=None, help="Print one pitcher's history across the slate's runs")
+    args = parser.parse_args()
+
+    if args.pitcher:
+        print(pitcher_history(args.date, args.pitcher).to_string(index=False))
+    else:
+        print_changes(changes_since_last_run(args.date, args.run))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,16 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Union
-from pybaseball import playerid_lookup, batting_stats
 from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
+from features.statcast import aggregate_snapshot, get_pitch_type_rates, has_aggregates
+from features.platoon import get_platoon_adjustment, get_pitcher_hand
+from features.pvb import get_pvb_adjustment
+from utils.data_loader import (
+    SnapshotMissingError, current_run, get_run_date, load_batting_stats, load_stats_snapshot, snapshot_json
+)
+from utils.lru import LRUCache
+from utils.player_registry import fangraphs_to_mlbam, lookup_fangraphs_id
 
 
 TEAM_NAME_TO_ABBR = {
@@ -43,24 +50,39 @@ TEAM_NAME_TO_ABBR = {
     "Washington Nationals": "WSH"
 }
 
-def get_lineup_for_team(team_abbr: str, date_str: str):
+def get_lineup_for_team(team_abbr: str, date_str: str, game_pk: Optional[int] = None):
+    # game_pk picks the right game of a doubleheader; without it the day's first posted lineup is used
+    snapshot_key = f"lineups:{date_str}"
+    if snapshot_key not in current_run().manifest and date_str < datetime.now().strftime('%Y-%m-%d'):
+        from utils.lineup_archive import get_archived_lineup
+        archived = get_archived_lineup(team_abbr, date_str, game_pk)
+        if archived:
+            return archived
+
     try:
         url = f"https://statsapi.mlb.com/api/v1/schedule?sportId=1&date={date_str}&hydrate=probablePitcher,lineups"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+
+        # One schedule payload serves every team's lineup for the date
+        def fetch():
+            response = requests.get(url)
+            response.raise_for_status()
+            return response.json()
+
+        data = snapshot_json(snapshot_key, fetch)
         if not data.get('dates'):
             print(f"No games found for {date_str}")
             return []
         games = data['dates'][0].get('games', [])
         for game in games:
+            if game_pk is not None and game.get('gamePk') != game_pk:
+                continue
             home_team_name = game.get('teams', {}).get('home', {}).get('team', {}).get('name', '')
             away_team_name = game.get('teams', {}).get('away', {}).get('team', {}).get('name', '')
             home_abbr = TEAM_NAME_TO_ABBR.get(home_team_name, '')
             away_abbr = TEAM_NAME_TO_ABBR.get(away_team_name, '')
             lineups = game.get('lineups', {})
             if team_abbr == home_abbr and 'homePlayers' in lineups:
-                batters = [{'name': player.get('fullName', ''), 'team': team_abbr} for player in lineups['homePlayers']]
+                batters = [{'name': player.get('fullName', ''), 'team': team_abbr, 'mlbam_id': player.get('id')} for player in lineups['homePlayers']]
                 if len(batters) == 9:
                     print(f"Found lineup for {team_abbr}: {', '.join(b['name'] for b in batters)}")
                     return batters
@@ -68,7 +90,7 @@ def get_lineup_for_team(team_abbr: str, date_str: str):
                     print(f"Incomplete home lineup for {team_abbr}: {len(batters)} batters")
                     return batters
             elif team_abbr == away_abbr and 'awayPlayers' in lineups:
-                batters = [{'name': player.get('fullName', ''), 'team': team_abbr} for player in lineups['awayPlayers']]
+                batters = [{'name': player.get('fullName', ''), 'team': team_abbr, 'mlbam_id': player.get('id')} for player in lineups['awayPlayers']]
                 if len(batters) == 9:
                     print(f"Found lineup for {team_abbr}: {', '.join(b['name'] for b in batters)}")
                     return batters
@@ -80,14 +102,30 @@ def get_lineup_for_team(team_abbr: str, date_str: str):
     except requests.exceptions.RequestException as e:
         print(f"Error fetching lineup from MLB API: {str(e)}")
         return []
+    except SnapshotMissingError:
+        raise
     except Exception as e:
         print(f"Unexpected error getting lineup for {team_abbr}: {str(e)}")
         print("Full traceback:")
         return []
 
-def get_opposing_lineups(pitchers: List[Dict], date_str: Optional[str] = None):
+def get_lineup_with_fallback(team_abbr: str, date_str: str, allow_projected: bool = True,
+                             game_pk: Optional[int] = None) -> List[Dict]:
+    """
+    Posted lineup for a team (in game game_pk when given), or its projected lineup
+    (batters flagged 'projected') when the real one isn't available yet.
+    """
+    lineup = get_lineup_for_team(team_abbr, date_str, game_pk)
+    if not lineup and allow_projected:
+        from features.team_profiles import get_projected_lineup
+        lineup = get_projected_lineup(team_abbr, date_str)
+        if lineup:
+            print(f"Lineup not posted for {team_abbr}; using projected lineup")
+    return lineup
+
+def get_opposing_lineups(pitchers: List[Dict], date_str: Optional[str] = None, allow_projected: bool = True):
     if date_str is None:
-        date_str = datetime.now().strftime('%Y-%m-%d')
+        date_str = get_run_date()
         
     lineup_map = {}
     
@@ -107,7 +145,7 @@ def get_opposing_lineups(pitchers: List[Dict], date_str: Optional[str] = None):
                 continue
             
         print(f"Getting lineup for {pitcher['pitcher_name']}'s opponent: {opponent}")
-        lineup = get_lineup_for_team(team_abbr, date_str)
+        lineup = get_lineup_with_fallback(team_abbr, date_str, allow_projected, pitcher.get('game_pk'))
         if lineup:
             lineup_map[pitcher['pitcher_name']] = lineup
         else:
@@ -131,7 +169,7 @@ def get_batter_stats(batter_name: str, season: int = 2025):
             print(f"Could not resolve FanGraphs ID for {batter_name}")
             fg_id = -1 
             
-        stats = batting_stats(season, qual=0)
+        stats = load_batting_stats(season)
         batter_stats = stats[stats['IDfg'] == fg_id]
         
         if batter_stats.empty and fg_id == -1:
@@ -182,6 +220,9 @@ def get_batter_stats(batter_name: str, season: int = 2025):
             'contact': float(stats_row['Contact% (sc)']) if pd.notna(stats_row['Contact% (sc)']) else 0
         }
         
+        if has_aggregates(season) and fg_id != -1:
+            add_pitch_type_rates(pitch_metrics, general_metrics, fangraphs_to_mlbam(fg_id), season)
+        
         return {
             'pitch_metrics': pitch_metrics,
             'general_metrics': general_metrics,
@@ -192,14 +233,38 @@ def get_batter_stats(batter_name: str, season: int = 2025):
         print(f"Error getting batter stats for {batter_name}: {str(e)}")
         return {}
 
-def normalize_metrics(metrics):
-    if not metrics:
+# Pseudo-counts used to shrink per-pitch statcast rates toward the batter's overall rate
+SWSTR_PRIOR_PITCHES = 50
+CONTACT_PRIOR_SWINGS = 25
+
+def add_pitch_type_rates(pitch_metrics: Dict, general_metrics: Dict, mlbam_id: Optional[int], season: int) -> None:
+    if not mlbam_id:
+        return
+    rates = get_pitch_type_rates(mlbam_id, season, role='batter')
+    for pitch_type, metrics in pitch_metrics.items():
+        if pitch_type not in rates:
+            continue
+        pitch_rates = rates[pitch_type]
+        metrics['swstr'] = (
+            (pitch_rates['whiffs'] + SWSTR_PRIOR_PITCHES * general_metrics['swstr']) /
+            (pitch_rates['pitches'] + SWSTR_PRIOR_PITCHES)
+        )
+        metrics['contact'] = (
+            (pitch_rates['swings'] - pitch_rates['whiffs'] + CONTACT_PRIOR_SWINGS * general_metrics['contact']) /
+            (pitch_rates['swings'] + CONTACT_PRIOR_SWINGS)
+        )
+        metrics['chase'] = float(pitch_rates['chase_rate']) if pd.notna(pitch_rates['chase_rate']) else 0
+        metrics['called_strike'] = float(pitch_rates['called_strike_rate']) if pd.notna(pitch_rates['called_strike_rate']) else 0
+
+def normalize_metrics(metrics, mean: Optional[float] = None, std: Optional[float] = None):
+    if metrics is None or len(metrics) == 0:
         return []
-    mean = np.mean(metrics)
-    std = np.std(metrics)
+    values = np.asarray(metrics, dtype=float)
+    mean = np.mean(values) if mean is None else mean
+    std = np.std(values) if std is None else std
     if std == 0:
-        return [0] * len(metrics)
-    return [(x - mean) / std for x in metrics]
+        return np.zeros(len(values))
+    return (values - mean) / std
 
 def calculate_pitch_score(neg_w_z: float, pct_seen_z: float, swstr_z: float, contact_z: float) -> float:
     return (0.30 * neg_w_z + 
@@ -216,8 +281,8 @@ def calculate_matchup_score(batter_stats: Dict, pitch_mix: Dict) -> float:
             pitch_stats = batter_stats['pitch_metrics'][pitch_type]
             neg_w = -pitch_stats['w_pitch']
             pct_seen = pitch_stats['pct_seen']
-            swstr = batter_stats['general_metrics']['swstr']
-            contact = batter_stats['general_metrics']['contact']
+            swstr = pitch_stats.get('swstr', batter_stats['general_metrics']['swstr'])
+            contact = pitch_stats.get('contact', batter_stats['general_metrics']['contact'])
             
             pitch_score = calculate_pitch_score(neg_w, pct_seen, swstr, contact)
             total_score += pitch_score * usage
@@ -225,6 +290,41 @@ def calculate_matchup_score(batter_stats: Dict, pitch_mix: Dict) -> float:
     
     return total_score / total_weight if total_weight > 0 else 0.0
 
+# Bounded process-wide cache of batter-vs-pitch-mix scores, shared by analyze_matchup,
+# the rule-based projector and any re-projection of the same slate
+MATCHUP_CACHE_SIZE = 20000
+matchup_cache = LRUCache(MATCHUP_CACHE_SIZE)
+
+def cached_matchup_score(
+    pitcher_key: Union[int, str],
+    batter_name: str,
+    pitch_mix: Dict,
+    season: int = 2025
+) -> Optional[float]:
+    """
+    calculate_matchup_score for one batter, memoized by (pitcher IDfg, batter IDfg,
+    stats and batter pitch-type aggregate snapshot ids), so newly ingested statcast
+    counts aren't answered from stale scores. Pitchers or batters without a FanGraphs id are keyed by name.
+    Returns None when the batter has no stats.
+    """
+    name_parts = batter_name.split()
+    batter_key = resolve_fangraphs_id(name_parts[0], name_parts[-1]) if len(name_parts) >= 2 else None
+    aggregate = aggregate_snapshot(season, 'batter_pitch') if has_aggregates(season) else None
+    snapshot = (
+        load_stats_snapshot('batting', season)[0], load_stats_snapshot('pitching', season)[0],
+        aggregate[0] if aggregate else None
+    )
+    key = (pitcher_key, batter_key or batter_name, snapshot)
+    
+    found, score = matchup_cache.lookup(key)
+    if found:
+        return score
+    
+    batter_stats = get_batter_stats(batter_name, season)
+    score = calculate_matchup_score(batter_stats, pitch_mix) if batter_stats else None
+    matchup_cache.put(key, score)
+    return score
+
 def analyze_matchup(pitcher: Dict, opponent_lineup: List[Dict], season: int = 2025):
     try:
         pitcher_name = pitcher['pitcher_name']
@@ -251,27 +351,42 @@ def analyze_matchup(pitcher: Dict, opponent_lineup: List[Dict], season: int = 20
         batter_scores = []
         valid_batters = 0
         
-        for batter in opponent_lineup:
-            batter_stats = get_batter_stats(batter['name'], season)
-            if not batter_stats:
-                continue
-
-            matchup_score = calculate_matchup_score(batter_stats, pitch_mix)
+        fg_id = pitcher.get('fg_id')
+        pitcher_key = fg_id if fg_id and fg_id != -1 else pitcher_name
+        # Lineup slot -> its batter_scores entry; platoon and PvB results come back in lineup order
+        scores_by_slot = {}
+        for slot, batter in enumerate(opponent_lineup):
+            matchup_score = cached_matchup_score(pitcher_key, batter['name'], pitch_mix, season)
             
             if matchup_score is not None:
                 agg_lineup_score += matchup_score
                 valid_batters += 1
                 
-                batter_scores.append({
+                scores_by_slot[slot] = {
                     'name': batter['name'],
                     'agg': matchup_score
-                })
+                }
+                batter_scores.append(scores_by_slot[slot])
         
         if valid_batters == 0:
             print(f"Skipping {pitcher_name} - no valid batter matchups")
             return None
             
         agg_lineup_score = agg_lineup_score / valid_batters
+        
+        platoon = get_platoon_adjustment(pitcher, opponent_lineup, season)
+        if platoon:
+            for slot, (side, expected_k) in enumerate(zip(platoon['batter_sides'], platoon['expected_k_pct'])):
+                if slot in scores_by_slot:
+                    scores_by_slot[slot]['side'] = side
+                    scores_by_slot[slot]['platoon_k_pct'] = expected_k
+        
+        pvb = get_pvb_adjustment(pitcher, opponent_lineup, season, platoon['expected_k_pct'] if platoon else None)
+        if pvb:
+            for slot, (pa, k_pct) in enumerate(zip(pvb['pvb_pa'], pvb['pvb_k_pct'])):
+                if slot in scores_by_slot:
+                    scores_by_slot[slot]['pvb_pa'] = pa
+                    scores_by_slot[slot]['pvb_k_pct'] = k_pct
             
         predicted_strikeouts = (k_per_9 * ip_per_g) / 9.0
         
@@ -280,8 +395,10 @@ def analyze_matchup(pitcher: Dict, opponent_lineup: List[Dict], season: int = 20
         return {
             'pitcher': pitcher_name,
             'opponent': opponent,
-            'handedness': 'R',  # Default to right-handed for now
+            'handedness': platoon['pitcher_hand'] if platoon else get_pitcher_hand(pitcher, season),
             'agg_lineup_score': agg_lineup_score,
+            'platoon_factor': platoon['platoon_factor'] if platoon else 1.0,
+            'pvb_factor': pvb['pvb_factor'] if pvb else 1.0,
             'batter_scores': batter_scores,
             'predicted_strikeouts': predicted_strikeouts,
             'confidence': confidence
@@ -293,7 +410,7 @@ def analyze_matchup(pitcher: Dict, opponent_lineup: List[Dict], season: int = 20
 
 def resolve_fangraphs_id(first_name: str, last_name: str) -> Union[int, None]:
     """
-    Resolve a player's FanGraphs ID from their name using pybaseball.
+    Resolve a player's FanGraphs ID from their name using the local id registry.
     
     Args:
         first_name (str): Player's first name
@@ -303,14 +420,7 @@ def resolve_fangraphs_id(first_name: str, last_name: str) -> Union[int, None]:
         Union[int, None]: FanGraphs ID if found, None if not found
     """
     try:
-        player_info = playerid_lookup(last_name, first_name)
-        if player_info.empty:
-            return None
-        player = player_info.iloc[0]
-        if (player['name_first'].lower() == first_name.lower() and 
-            player['name_last'].lower() == last_name.lower()):
-            return player['key_fangraphs']
-        return None
+        return lookup_fangraphs_id(first_name, last_name)
     except Exception as e:
         print(f"Error resolving FanGraphs ID for {first_name} {last_name}: {str(e)}")
         return None
@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_batting_stats, load_pitching_stats
+
+LINEUP_SLOTS = 9
+LEAGUE_OBP = 0.315
+
+
+def expected_batters_faced(
+    ip_per_g: np.ndarray,
+    lineup_obp: np.ndarray,
+    pitches_per_g: Optional[np.ndarray] = None,
+    pitches_per_pa: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Expected batters faced per start for each pitcher.
+
+    Innings give outs (3 per inning) and each PA ends in an out with probability
+    1 - OBP, so BF ~= 3 * IP / (1 - OBP). When a pitch-count profile is available,
+    the pitch budget per start (pitches/G over pitches/PA) is averaged in.
+    """
+    ip_per_g = np.asarray(ip_per_g, dtype=np.float64)
+    lineup_obp = np.clip(np.nan_to_num(np.asarray(lineup_obp, dtype=np.float64), nan=LEAGUE_OBP), 0.2, 0.45)
+    bf_innings = 3 * ip_per_g / (1 - lineup_obp)
+
+    if pitches_per_g is None or pitches_per_pa is None:
+        return bf_innings
+
+    pitches_per_g = np.asarray(pitches_per_g, dtype=np.float64)
+    pitches_per_pa = np.asarray(pitches_per_pa, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bf_pitches = pitches_per_g / pitches_per_pa
+    valid = np.isfinite(bf_pitches) & (bf_pitches > 0)
+    return np.where(valid, 0.5 * (bf_innings + np.where(valid, bf_pitches, 0)), bf_innings)
+
+
+def expected_pa_matrix(batters_faced: np.ndarray) -> np.ndarray:
+    """
+    Expected plate appearances per lineup slot, shape (pitchers, 9).
+
+    Slot i (0-based) bats for the (9k + i + 1)-th batter faced, so its expected PA is
+    the sum over trips k of clip(BF - 9k - i, 0, 1).
+    """
+    batters_faced = np.atleast_1d(np.asarray(batters_faced, dtype=np.float64))
+    trips = int(np.ceil(np.nanmax(batters_faced, initial=0) / LINEUP_SLOTS)) + 1
+    order = (
+        LINEUP_SLOTS * np.arange(trips)[None, None, :] +
+        np.arange(LINEUP_SLOTS)[None, :, None]
+    )
+    return np.clip(batters_faced[:, None, None] - order, 0, 1).sum(axis=2)
+
+
+def weighted_lineup_scores(scores: np.ndarray, pa_matrix: np.ndarray) -> np.ndarray:
+    """
+    PA-weighted mean of per-slot scores (pitchers x 9). Missing scores (NaN) carry
+    no weight; rows with no scores at all come back NaN.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    weights = np.where(np.isnan(scores), 0, pa_matrix)
+    totals = weights.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nansum(scores * weights, axis=1) / np.where(totals > 0, totals, np.nan)
+
+
+def _pitcher_profiles(pitchers: pd.DataFrame) -> pd.DataFrame:
+    games = pitchers['G'].replace(0, np.nan)
+    profile = pd.DataFrame({
+        'Name': pitchers['Name'],
+        'ip_per_g': pitchers['IP'] / games,
+        'pitches_per_g': pitchers['Pitches'] / games if 'Pitches' in pitchers else np.nan,
+        'pitches_per_pa': pitchers['Pitches'] / pitchers['TBF'].replace(0, np.nan) if 'TBF' in pitchers else np.nan
+    })
+    return profile.drop_duplicates('Name').set_index('Name')
+
+
+def build_slate_pa_matrix(
+    pitcher_names: List[str],
+    lineups: List[List[str]],
+    season: int,
+    pitchers: Optional[pd.DataFrame] = None,
+    hitters: Optional[pd.DataFrame] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Slot x pitcher expected-PA matrix for a whole slate in one vectorized pass.
+
+    Args:
+        pitcher_names: Starter names, one per row.
+        lineups: Opposing lineups (batter names in batting order), aligned with pitcher_names.
+        season: Season used for the stat pulls.
+        pitchers / hitters: Optional preloaded pitching / batting stats frames.
+
+    Returns:
+        Dict with 'batters_faced' (pitchers,) and 'pa' (pitchers x 9).
+    """
+    if pitchers is None:
+        pitchers = load_pitching_stats(season)
+    if hitters is None:
+        hitters = load_batting_stats(season)
+
+    profiles = _pitcher_profiles(pitchers).reindex(pitcher_names)
+    obp_by_name = hitters.drop_duplicates('Name').set_index('Name')['OBP']
+
+    obp = np.full((len(pitcher_names), LINEUP_SLOTS), np.nan)
+    for row, lineup in enumerate(lineups):
+        slots = lineup[:LINEUP_SLOTS]
+        obp[row, :len(slots)] = obp_by_name.reindex(slots).to_numpy(dtype=np.float64)
+
+    lineup_obp = np.nanmean(np.where(np.isnan(obp), LEAGUE_OBP, obp), axis=1)
+    batters_faced = expected_batters_faced(
+        profiles['ip_per_g'].to_numpy(dtype=np.float64),
+        lineup_obp,
+        profiles['pitches_per_g'].to_numpy(dtype=np.float64),
+        profiles['pitches_per_pa'].to_numpy(dtype=np.float64)
+    )
+    batters_faced = np.nan_to_num(batters_faced, nan=0.0)
+    return {'batters_faced': batters_faced, 'pa': expected_pa_matrix(batters_faced)}
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from features.rule_based import PROJECTION_FUDGE, combine_projection
+from models.calibration import PROJECTION_SD
+
+LEAGUE_WOBA = 0.320
+
+
+@dataclass(frozen=True)
+class Market:
+    name: str
+    # Output field holding the projection (strikeouts keep the historical 'projected_k')
+    column: str
+    label: str
+    # Edge is (projection - line) / edge_scale, in percent
+    edge_scale: float
+    # Spread used for the normal-CDF confidence
+    sd: float
+    # Weights over MARKET_COLUMNS for linear markets; None for the strikeout model
+    weights: Optional[Dict[str, float]] = None
+
+
+MARKETS = {
+    'strikeouts': Market('strikeouts', 'projected_k', 'Ks', 1.5, PROJECTION_SD),
+    'outs': Market('outs', 'projected_outs', 'Outs', 3.0, 3.0, {'estimated_ip': 3.0}),
+    'walks': Market('walks', 'projected_bb', 'BB', 1.0, 1.0, {'bb_base': 1.0}),
+    'hits_allowed': Market('hits_allowed', 'projected_h', 'Hits', 1.5, 1.7, {'h_base': 1.0, 'h_lineup': 1.0})
+}
+
+# Derived columns the linear markets are weighted over
+MARKET_COLUMNS = ['estimated_ip', 'bb_base', 'h_base', 'h_lineup']
+
+
+def build_feature_matrix(rows: Dict[int, Dict[str, float]]) -> pd.DataFrame:
+    """
+    One row per starter (indexed by MLBAM id) of compute_lineup_features output,
+    plus the per-start count baselines the linear markets use.
+    """
+    return add_market_baselines(pd.DataFrame.from_dict(rows, orient='index').astype('float64'))
+
+
+def add_market_baselines(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the walk and hit baselines to a frame of compute_lineup_features columns.
+    """
+    frame['bb_base'] = frame['bb_per_9'] * frame['estimated_ip'] / 9
+    frame['h_base'] = frame['h_per_9'] * frame['estimated_ip'] / 9
+    # Hits scale with opposing lineup quality relative to league wOBA
+    frame['h_lineup'] = frame['h_base'] * (frame['lineup_woba'] - LEAGUE_WOBA) / LEAGUE_WOBA
+    return frame
+
+
+def weight_matrix(markets: List[str]) -> np.ndarray:
+    """
+    (len(MARKET_COLUMNS), len(markets)) weights for the given linear markets.
+    """
+    weights = np.zeros((len(MARKET_COLUMNS), len(markets)))
+    for column, market in enumerate(markets):
+        for feature, weight in MARKETS[market].weights.items():
+            weights[MARKET_COLUMNS.index(feature), column] = weight
+    return weights
+
+
+def project_markets(
+    features: pd.DataFrame,
+    markets: Optional[List[str]] = None,
+    alpha: float = 0.15,
+    gamma: float = 0.15
+) -> pd.DataFrame:
+    """
+    Projections for every starter in a feature matrix, one column per market.
+
+    Strikeouts run the rule-based model column-wise; every linear market comes out of
+    a single product of the shared feature matrix with the stacked market weights.
+    """
+    markets = markets or list(MARKETS)
+    projections = pd.DataFrame(index=features.index)
+    if 'strikeouts' in markets:
+        projections['strikeouts'] = (
+            combine_projection(features, alpha, gamma) *
+            features['platoon_factor'] * features['pvb_factor'] * PROJECTION_FUDGE
+        )
+    linear = [market for market in markets if MARKETS[market].weights is not None]
+    if linear:
+        values = features[MARKET_COLUMNS].to_numpy(dtype=np.float64) @ weight_matrix(linear)
+        for column, market in enumerate(linear):
+            projections[market] = values[:, column]
+    return projections.round(1)
+
+
+def projected_value(row: Dict) -> float:
+    return row[MARKETS[row.get('market', 'strikeouts')].column]
@@ -0,0 +1,186 @@
+import json
+import os
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.batters import normalize_metrics
+from utils.data_loader import cache_path, load_stats_snapshot, start_run
+
+HITTER_METRICS = ['wOBA', 'K%', 'SLG', 'ISO']
+PITCHER_METRICS = ['K%']
+
+
+def _baseline(values: pd.Series) -> Dict[str, float]:
+    return {'mean': float(values.mean()), 'std': float(values.std(ddof=0))}
+
+
+def compute_hitter_norms(hitters: pd.DataFrame, baselines: Optional[Dict] = None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    League z-scores and the derived susceptibility score for every hitter.
+
+    When baselines are given (frozen), z-scores are taken against those means/stds
+    instead of the snapshot's own league distribution.
+    """
+    frame = pd.DataFrame({
+        'IDfg': hitters['IDfg'].astype('int32'),
+        'Name': hitters['Name'],
+        'wOBA': hitters['wOBA'],
+        'K%': hitters['SO'] / hitters['PA'].replace(0, np.nan),
+        'SLG': hitters['SLG'],
+        'ISO': hitters['ISO']
+    })
+
+    computed = {}
+    for metric in HITTER_METRICS:
+        values = frame[metric].fillna(frame[metric].mean())
+        computed[metric] = _baseline(values)
+        baseline = (baselines or computed)[metric]
+        frame[f'{metric}_z'] = normalize_metrics(values.to_numpy(), baseline['mean'], baseline['std'])
+
+    frame['susceptibility_score'] = (
+        0.7 * frame['K%_z'] +
+        0.2 * (-frame['wOBA_z']) +
+        0.1 * frame['ISO_z']
+    )
+    computed['susceptibility_score'] = _baseline(frame['susceptibility_score'])
+    baseline = (baselines or computed)['susceptibility_score']
+    frame['susceptibility_z'] = normalize_metrics(
+        frame['susceptibility_score'].to_numpy(), baseline['mean'], baseline['std']
+    )
+
+    frame = frame.astype({column: 'float32' for column in frame.columns if column not in ('IDfg', 'Name')})
+    return frame, computed
+
+
+def compute_pitcher_norms(pitchers: pd.DataFrame, baselines: Optional[Dict] = None) -> Tuple[pd.DataFrame, Dict]:
+    frame = pd.DataFrame({
+        'IDfg': pitchers['IDfg'].astype('int32'),
+        'Name': pitchers['Name'],
+        'K%': (pitchers['SO'] * 9) / (pitchers['IP'] * 9 + pitchers['BB'] + pitchers['H'])
+    })
+    values = frame['K%'].fillna(frame['K%'].mean())
+    computed = {'K%': _baseline(values)}
+    baseline = (baselines or computed)['K%']
+    frame['K%_z'] = normalize_metrics(values.to_numpy(), baseline['mean'], baseline['std'])
+    frame = frame.astype({'K%': 'float32', 'K%_z': 'float32'})
+    return frame, computed
+
+
+class NormalizationTables:
+    """
+    Hitter and pitcher normalization columns for one stats snapshot, indexed by IDfg
+    (and by exact name) so lookups are single dict accesses.
+    """
+
+    def __init__(self, snapshot_ids: Dict[str, str], hitters: pd.DataFrame, pitchers: pd.DataFrame,
+                 baselines: Dict, frozen: Optional[str] = None):
+        self.snapshot_ids = snapshot_ids
+        self.hitters = hitters
+        self.pitchers = pitchers
+        self.baselines = baselines
+        self.frozen = frozen
+        self._hitter_by_id = hitters.set_index('IDfg')['susceptibility_z'].to_dict()
+        self._pitcher_by_id = pitchers.set_index('IDfg')['K%_z'].to_dict()
+        self._hitter_by_name = hitters.drop_duplicates('Name').set_index('Name')['susceptibility_z'].to_dict()
+        self._pitcher_by_name = pitchers.drop_duplicates('Name').set_index('Name')['K%_z'].to_dict()
+
+    def hitter_susceptibility(self, fg_id: int) -> Optional[float]:
+        return self._hitter_by_id.get(int(fg_id))
+
+    def pitcher_k_z(self, fg_id: int) -> Optional[float]:
+        return self._pitcher_by_id.get(int(fg_id))
+
+    def hitter_susceptibility_by_name(self, name: str) -> Optional[float]:
+        return self._hitter_by_name.get(name)
+
+    def pitcher_k_z_by_name(self, name: str) -> Optional[float]:
+        return self._pitcher_by_name.get(name)
+
+
+def _norms_path(snapshot_ids: Dict[str, str], frozen: Optional[str], table: str) -> str:
+    suffix = f".frozen-{frozen}" if frozen else ""
+    return cache_path('snapshots', f"{snapshot_ids[table]}{suffix}.norms.parquet")
+
+
+def freeze_baselines(name: str, tables: 'NormalizationTables') -> str:
+    """
+    Persist a snapshot's league means/stds under a name so later runs (e.g. backtests)
+    can normalize against exactly the same baselines.
+    """
+    path = cache_path('norm_baselines', f"{name}.json")
+    with open(path, 'w') as f:
+        json.dump(tables.baselines, f, indent=2)
+    print(f"Froze normalization baselines as '{name}'")
+    return path
+
+
+def freeze_baselines_as_of(name: str, date: str) -> str:
+    """
+    Freeze the baselines of the season's stats as of date (for a past date, the
+    snapshots recorded on or before it). Starts a run dated to date.
+    """
+    start_run(date)
+    return freeze_baselines(name, get_normalization(int(date[:4])))
+
+
+def load_frozen_baselines(name: str) -> Dict:
+    path = cache_path('norm_baselines', f"{name}.json")
+    if not os.path.exists(path):
+        raise ValueError(f"No frozen normalization baselines named '{name}'")
+    with open(path) as f:
+        return json.load(f)
+
+
+_tables: Dict[tuple, NormalizationTables] = {}
+_active_frozen: Optional[str] = None
+
+
+def use_frozen_baselines(name: Optional[str]) -> None:
+    """
+    Make every subsequent get_normalization call in this process use the named
+    frozen baselines (None restores live league baselines).
+    """
+    global _active_frozen
+    if name:
+        load_frozen_baselines(name)
+    _active_frozen = name
+
+
+def get_normalization(season: int, frozen: Optional[str] = None) -> NormalizationTables:
+    """
+    Normalization tables for the season's current stats snapshots.
+
+    Computed once per snapshot (and baseline set), persisted next to the snapshot and
+    reused from disk by later processes.
+    """
+    if frozen is None:
+        frozen = _active_frozen
+    batting_id, hitters_raw = load_stats_snapshot('batting', season)
+    pitching_id, pitchers_raw = load_stats_snapshot('pitching', season)
+    snapshot_ids = {'hitters': batting_id, 'pitchers': pitching_id}
+    key = (batting_id, pitching_id, frozen)
+    if key in _tables:
+        return _tables[key]
+
+    frozen_baselines = load_frozen_baselines(frozen) if frozen else None
+    hitter_path = _norms_path(snapshot_ids, frozen, 'hitters')
+    pitcher_path = _norms_path(snapshot_ids, frozen, 'pitchers')
+    baseline_path = hitter_path.replace('.norms.parquet', '.baselines.json')
+
+    if os.path.exists(hitter_path) and os.path.exists(pitcher_path) and os.path.exists(baseline_path):
+        hitters = pd.read_parquet(hitter_path)
+        pitchers = pd.read_parquet(pitcher_path)
+        with open(baseline_path) as f:
+            baselines = json.load(f)
+    else:
+        hitters, hitter_baselines = compute_hitter_norms(hitters_raw, frozen_baselines and frozen_baselines['hitters'])
+        pitchers, pitcher_baselines = compute_pitcher_norms(pitchers_raw, frozen_baselines and frozen_baselines['pitchers'])
+        baselines = frozen_baselines or {'hitters': hitter_baselines, 'pitchers': pitcher_baselines}
+        hitters.to_parquet(hitter_path, index=False)
+        pitchers.to_parquet(pitcher_path, index=False)
+        with open(baseline_path, 'w') as f:
+            json.dump(baselines, f, indent=2)
+
+    _tables[key] = NormalizationTables(snapshot_ids, hitters, pitchers, baselines, frozen)
+    return _tables[key]
@@ -0,0 +1,213 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from utils.data_loader import load_stats_snapshot
+
+PITCH_MIX_COLUMNS = {
+    'FA% (pi)': 'Fastball',
+    'FC% (pi)': 'Cutter',
+    'SL% (pi)': 'Slider',
+    'CH% (pi)': 'Changeup',
+    'CU% (pi)': 'Curveball',
+    'SI% (pi)': 'Sinker'
+}
+SKILL_COLUMNS = ['Stuff+', 'Location+', 'K%', 'vFA (pi)']
+
+# Pitchers with at least this many innings are comps; anyone below is low-sample
+ESTABLISHED_IP = 40.0
+COMP_COUNT = 10
+# A low-sample pitcher's own numbers get weight ip / (ip + COMP_PRIOR_IP) against his comps
+COMP_PRIOR_IP = 15.0
+# Early in a season, when fewer pitchers than this are established, the pool is the
+# MIN_COMP_POOL pitchers with the most innings instead
+MIN_COMP_POOL = 3 * COMP_COUNT
+# Prior for a snapshot with no usable pitchers at all (e.g. before opening day)
+LEAGUE_PRIOR = {'k_per_9': 8.5, 'ip_per_g': 5.0, 'quality_score': 0.0, 'bb_per_9': 3.2, 'h_per_9': 8.5}
+
+
+def pitcher_profiles(pitchers: pd.DataFrame) -> pd.DataFrame:
+    """
+    One profile row per pitcher: normalized pitch mix, Stuff+, Location+, K% and
+    fastball velocity (when the snapshot has it), plus the outcome columns comps lend.
+    """
+    mix = pitchers[[column for column in PITCH_MIX_COLUMNS if column in pitchers.columns]].astype('float64').fillna(0.0)
+    totals = mix.sum(axis=1).replace(0, np.nan)
+    profiles = mix.div(totals, axis=0).rename(columns=PITCH_MIX_COLUMNS)
+
+    ip = pitchers['IP'].astype('float64').fillna(0.0)
+    games = pitchers['G'].astype('float64').replace(0, np.nan)
+    profiles['Stuff+'] = pitchers['Stuff+'].astype('float64')
+    profiles['Location+'] = pitchers['Location+'].astype('float64')
+    profiles['K%'] = pitchers['SO'] / pitchers['TBF'].replace(0, np.nan)
+    if 'vFA (pi)' in pitchers.columns:
+        profiles['vFA (pi)'] = pitchers['vFA (pi)'].astype('float64')
+
+    profiles['IP'] = ip
+    profiles['k_per_9'] = pitchers['SO'] * 9 / ip.replace(0, np.nan)
+    profiles['ip_per_g'] = ip / games
+    profiles['bb_per_9'] = pitchers['BB'] * 9 / ip.replace(0, np.nan)
+    profiles['h_per_9'] = pitchers['H'] * 9 / ip.replace(0, np.nan)
+    quality = 0.6 * (profiles['Stuff+'] - 100) / 20 + 0.4 * (profiles['Location+'] - 100) / 20
+    profiles['quality_score'] = quality.clip(-1.0, 1.0)
+    profiles.index = pitchers['IDfg'].astype('int64').to_numpy()
+    return profiles[~profiles.index.duplicated()]
+
+
+class PitcherCompIndex:
+    """
+    KD-tree over standardized profile vectors of established pitchers for one
+    pitching snapshot. Missing profile values are imputed at the established mean,
+    so a pitcher with no row at all is queried from the league-average profile.
+    When too few pitchers have ESTABLISHED_IP the innings bar drops to let in the
+    MIN_COMP_POOL most-used ones; with none usable, priors are LEAGUE_PRIOR.
+
+    Everything a query touches is a numpy array, so a comp lookup is a dict hit plus
+    one tree query.
+    """
+
+    OUTCOMES = ['IP', 'k_per_9', 'ip_per_g', 'quality_score', 'bb_per_9', 'h_per_9']
+
+    def __init__(self, profiles: pd.DataFrame):
+        self.feature_columns = [column for column in list(PITCH_MIX_COLUMNS.values()) + SKILL_COLUMNS
+                                if column in profiles.columns]
+        self.pitch_columns = [pitch for pitch in PITCH_MIX_COLUMNS.values() if pitch in profiles.columns]
+        self.ids = profiles.index.to_numpy()
+        self._rows = {int(fg_id): row for row, fg_id in enumerate(self.ids.tolist())}
+        self.outcomes = profiles[self.OUTCOMES].to_numpy(dtype=np.float64)
+        self.mixes = profiles[self.pitch_columns].to_numpy(dtype=np.float64)
+
+        features = profiles[self.feature_columns].to_numpy(dtype=np.float64)
+        innings = self.outcomes[:, 0]
+        usable = (innings > 0) & ~np.isnan(self.outcomes[:, 1:3]).any(axis=1)
+        self.comp_ip = ESTABLISHED_IP
+        if np.count_nonzero(usable & (innings >= ESTABLISHED_IP)) < MIN_COMP_POOL and usable.any():
+            ranked = np.sort(innings[usable])[::-1]
+            self.comp_ip = min(ESTABLISHED_IP, float(ranked[min(MIN_COMP_POOL, len(ranked)) - 1]))
+        established = usable & (innings >= self.comp_ip)
+        self.established = np.flatnonzero(established)
+
+        self.tree = None
+        self.mean = np.zeros(len(self.feature_columns))
+        self.std = np.ones(len(self.feature_columns))
+        if len(self.established):
+            with np.errstate(all='ignore'):
+                self.mean = np.nan_to_num(np.nanmean(features[established], axis=0))
+                std = np.nanstd(features[established], axis=0)
+            self.std = np.where(std > 0, std, 1.0)
+        self.features = self._standardize(features)
+        if len(self.established):
+            self.tree = KDTree(self.features[established])
+
+    def _standardize(self, features: np.ndarray) -> np.ndarray:
+        return np.nan_to_num((features - self.mean) / self.std, nan=0.0)
+
+    def innings(self, fg_id: Optional[int]) -> float:
+        row = self._rows.get(fg_id) if fg_id is not None else None
+        return 0.0 if row is None else float(self.outcomes[row, 0])
+
+    def is_low_sample(self, fg_id: Optional[int]) -> bool:
+        return self.innings(fg_id) < ESTABLISHED_IP
+
+    def comps(self, fg_id: Optional[int], k: int = COMP_COUNT) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Profile rows of the k nearest established pitchers (excluding the pitcher
+        himself) and their distances in standardized profile space; empty when the
+        snapshot has no comp pool.
+        """
+        row = self._rows.get(fg_id) if fg_id is not None else None
+        if self.tree is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        vector = self.features[row] if row is not None else np.zeros(len(self.feature_columns))
+        distances, neighbors = self.tree.query(vector[None, :], k=min(k + 1, len(self.established)))
+        rows = self.established[neighbors[0]]
+        keep = rows != row
+        return rows[keep][:k], distances[0][keep][:k]
+
+    def prior(self, fg_id: Optional[int], k: int = COMP_COUNT) -> Dict:
+        """
+        Inverse-distance weighted comp averages of the per-9 rates, ip_per_g,
+        quality_score and pitch mix.
+        """
+        rows, distances = self.comps(fg_id, k)
+        if not len(rows):
+            return {'comps': [], **LEAGUE_PRIOR, 'pitch_mix': {}}
+        weights = 1.0 / (distances + 1e-6)
+        weights /= weights.sum()
+        outcomes = np.nansum(self.outcomes[rows] * weights[:, None], axis=0)
+        mix = np.nansum(self.mixes[rows] * weights[:, None], axis=0)
+        return {
+            'comps': self.ids[rows].tolist(),
+            'k_per_9': float(outcomes[1]),
+            'ip_per_g': float(outcomes[2]),
+            'quality_score': float(outcomes[3]),
+            'bb_per_9': float(outcomes[4]),
+            'h_per_9': float(outcomes[5]),
+            'pitch_mix': dict(zip(self.pitch_columns, mix.tolist()))
+        }
+
+    def blended(self, fg_id: Optional[int], k: int = COMP_COUNT) -> Dict:
+        """
+        The pitcher's own rates shrunk toward his comps' prior by innings pitched;
+        values he doesn't have come entirely from the prior.
+        """
+        prior = self.prior(fg_id, k)
+        ip = self.innings(fg_id)
+        own_weight = ip / (ip + COMP_PRIOR_IP)
+        row = self._rows.get(fg_id) if ip > 0 else None
+
+        def blend(own_value, prior_value):
+            if row is None or np.isnan(own_value):
+                return prior_value
+            return own_weight * float(own_value) + (1 - own_weight) * prior_value
+
+        pitch_mix = prior['pitch_mix']
+        if row is not None and not np.isnan(self.mixes[row]).all():
+            # Without comps (LEAGUE_PRIOR has no mix) his own mix stands alone
+            pitch_mix = {
+                pitch: blend(own, pitch_mix[pitch]) if pitch in pitch_mix else float(np.nan_to_num(own))
+                for pitch, own in zip(self.pitch_columns, self.mixes[row])
+            }
+        own = self.outcomes[row] if row is not None else np.full(len(self.OUTCOMES), np.nan)
+        return {
+            'ip': ip,
+            'own_weight': own_weight,
+            'comps': prior['comps'],
+            'k_per_9': blend(own[1], prior['k_per_9']),
+            'ip_per_g': blend(own[2], prior['ip_per_g']),
+            'quality_score': blend(own[3], prior['quality_score']),
+            'bb_per_9': blend(own[4], prior['bb_per_9']),
+            'h_per_9': blend(own[5], prior['h_per_9']),
+            'pitch_mix': pitch_mix
+        }
+
+
+_indexes: Dict[str, PitcherCompIndex] = {}
+_innings: Dict[str, Dict[int, float]] = {}
+
+
+def pitcher_innings(fg_id: Optional[int], season: int) -> float:
+    """
+    Innings in the season's pitching snapshot, looked up without building the index.
+    """
+    snapshot_id, pitchers = load_stats_snapshot('pitching', season)
+    if snapshot_id not in _innings:
+        pitchers = pitchers.drop_duplicates('IDfg')
+        _innings[snapshot_id] = dict(zip(pitchers['IDfg'].astype('int64').tolist(),
+                                         pitchers['IP'].astype('float64').fillna(0.0).tolist()))
+    return 0.0 if fg_id is None else _innings[snapshot_id].get(int(fg_id), 0.0)
+
+
+def is_low_sample(fg_id: Optional[int], season: int) -> bool:
+    return pitcher_innings(fg_id, season) < ESTABLISHED_IP
+
+
+def get_comp_index(season: int) -> PitcherCompIndex:
+    """
+    Comp index for the season's current pitching snapshot, built once per snapshot.
+    """
+    snapshot_id, pitchers = load_stats_snapshot('pitching', season)
+    if snapshot_id not in _indexes:
+        _indexes[snapshot_id] = PitcherCompIndex(pitcher_profiles(pitchers))
+    return _indexes[snapshot_id]
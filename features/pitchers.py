@@ -1,12 +1,13 @@
 import requests
-from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
-from pybaseball import playerid_lookup, pitching_stats
 from typing import List, Dict, Union
 from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
 
+from utils.data_loader import get_run_date, load_pitching_stats, snapshot_json
+from utils.player_registry import lookup_fangraphs_id
+
 # Team name to abbreviation mapping
 TEAM_NAME_TO_ABBR = {
     "Arizona Diamondbacks": "ARI",
@@ -41,18 +42,21 @@ TEAM_NAME_TO_ABBR = {
     "Washington Nationals": "WSH"
 }
 
-def fetch_pitchers() -> List[Dict[str, Any]]:
+def fetch_pitchers(date: Optional[str] = None) -> List[Dict[str, Any]]:
 
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
+        today = date or get_run_date()
 
         # MLB stats api endpoint for probable pitchers
         url = f"https://statsapi.mlb.com/api/v1/schedule?sportId=1&date={today}&hydrate=probablePitcher"
         print(f"Fetching probable pitchers for {today}")
         
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        def fetch():
+            response = requests.get(url)
+            response.raise_for_status()
+            return response.json()
+        
+        data = snapshot_json(f"schedule:{today}", fetch)
         
         if not data.get('dates'):
             print(f"No games found for {today}")
@@ -84,9 +88,11 @@ def fetch_pitchers() -> List[Dict[str, Any]]:
             if home_pitcher and home_pitcher.get('fullName') and home_pitcher.get('fullName') != 'Unknown':
                 pitchers.append({
                     'pitcher_name': home_pitcher.get('fullName', ''),
+                    'mlbam_id': home_pitcher.get('id'),
                     'team': home_team,
                     'opponent': away_team,
                     'game_time': game_time,
+                    'game_pk': game.get('gamePk'),
                     'is_home': True
                 })
             elif home_pitcher:
@@ -96,9 +102,11 @@ def fetch_pitchers() -> List[Dict[str, Any]]:
             if away_pitcher and away_pitcher.get('fullName') and away_pitcher.get('fullName') != 'Unknown':
                 pitchers.append({
                     'pitcher_name': away_pitcher.get('fullName', ''),
+                    'mlbam_id': away_pitcher.get('id'),
                     'team': away_team,
                     'opponent': home_team,
                     'game_time': game_time,
+                    'game_pk': game.get('gamePk'),
                     'is_home': False
                 })
             elif away_pitcher:
@@ -115,14 +123,7 @@ def fetch_pitchers() -> List[Dict[str, Any]]:
 
 def resolve_fangraphs_id(first_name: str, last_name: str) -> Union[int, None]:
     try:
-        player_info = playerid_lookup(last_name, first_name, True)
-        if player_info.empty:
-            return None
-        player = player_info.iloc[0]
-        if (player['name_first'].lower() == first_name.lower() and 
-            player['name_last'].lower() == last_name.lower()):
-            return player['key_fangraphs']
-        return None
+        return lookup_fangraphs_id(first_name, last_name)
     except Exception as e:
         print(f"Error resolving FanGraphs ID for {first_name} {last_name}: {str(e)}")
         return None
@@ -130,7 +131,7 @@ def resolve_fangraphs_id(first_name: str, last_name: str) -> Union[int, None]:
 def get_season_stats(fg_id: int, season: int = 2025, pitcher_name: str = None) -> Dict:
     try:
         print(f"\nFetching stats for ID {fg_id} for season {season}")
-        stats = pitching_stats(season, qual=1)
+        stats = load_pitching_stats(season)
         print(f"Found {len(stats)} total pitchers")
         
        
@@ -245,6 +246,7 @@ def process_pitcher_stats(pitchers: List[Dict], season: int = 2025) -> pd.DataFr
         pitcher_record = {
             'pitcher': full_name,
             'team': team,
+            'mlbam_id': pitcher.get('mlbam_id'),
             'fg_id': stats['fg_id'],  
             'k_per_9': stats['k_per_9'],
             'ip_per_g': stats['ip_per_g'],
@@ -0,0 +1,184 @@
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.statcast import aggregate_snapshot
+from utils.data_loader import cache_path
+from utils.player_registry import handedness_snapshot, load_registry, mlbam_to_fangraphs, get_handedness, registry_snapshot
+
+# Pseudo plate appearances used to shrink a split toward the player's overall K%
+BATTER_SPLIT_PRIOR_PA = 60
+PITCHER_SPLIT_PRIOR_PA = 100
+DEFAULT_LEAGUE_K_PCT = 0.22
+
+# season -> (inputs version, tables); hands snapshot id -> hands by FanGraphs id
+_split_tables: Dict[int, Tuple[str, Tuple[pd.DataFrame, pd.DataFrame, float]]] = {}
+_hands_by_fg: Dict[str, pd.DataFrame] = {}
+
+
+def _shrunk_splits(counts: pd.DataFrame, player_col: str, hand_col: str, prior_pa: int) -> pd.DataFrame:
+    counts = counts.reset_index()
+    overall = counts.groupby(player_col)[['pa', 'strikeouts']].sum()
+    overall_k = (overall['strikeouts'] / overall['pa'].replace(0, np.nan)).rename('overall_k_pct')
+    counts = counts.join(overall_k, on=player_col)
+    counts['k_pct'] = (
+        (counts['strikeouts'] + prior_pa * counts['overall_k_pct']) / (counts['pa'] + prior_pa)
+    )
+
+    registry = load_registry()
+    fg_map = dict(zip(registry['key_mlbam'], registry['key_fangraphs']))
+    counts['IDfg'] = counts[player_col].map(fg_map)
+    counts = counts.dropna(subset=['IDfg', 'k_pct'])
+    counts = counts.astype({'IDfg': 'int32', 'pa': 'int32', 'k_pct': 'float32', 'overall_k_pct': 'float32'})
+    counts = counts.rename(columns={hand_col: 'hand'})
+    counts['hand'] = counts['hand'].astype(str)
+    return counts.set_index(['IDfg', 'hand'])[['pa', 'k_pct', 'overall_k_pct']].sort_index()
+
+
+def _split_inputs(season: int) -> Tuple[str, Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """
+    The hand aggregates pinned to the current run, plus a version naming them and the
+    registry that maps them to FanGraphs ids.
+    """
+    batter = aggregate_snapshot(season, 'batter_hand')
+    pitcher = aggregate_snapshot(season, 'pitcher_hand')
+    if batter is None or pitcher is None:
+        return '', None, None
+    inputs = f"{batter[0]}:{pitcher[0]}:{registry_snapshot()[0]}"
+    return hashlib.sha256(inputs.encode()).hexdigest()[:12], batter[1], pitcher[1]
+
+
+def split_tables_version(season: int) -> str:
+    """
+    Version of the split tables the current run reads; empty when they're unavailable.
+    """
+    return _split_inputs(season)[0]
+
+
+def _split_paths(season: int, version: str) -> Tuple[str, str]:
+    return (cache_path('splits', str(season), f"batter_splits_{version}.parquet"),
+            cache_path('splits', str(season), f"pitcher_splits_{version}.parquet"))
+
+
+def build_split_tables(season: int) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    """
+    Precompute batter K% vs LHP/RHP and pitcher K% vs LHB/RHB from the ingested
+    statcast hand aggregates, keyed by (IDfg, hand) and persisted per season and
+    input version.
+    """
+    version, batter_counts, pitcher_counts = _split_inputs(season)
+    if batter_counts is None or pitcher_counts is None:
+        raise ValueError(f"No statcast hand aggregates for {season}; run features.statcast.ingest_range first")
+
+    league_k = float(batter_counts['strikeouts'].sum() / max(batter_counts['pa'].sum(), 1))
+    batter_splits = _shrunk_splits(batter_counts, 'batter', 'p_throws', BATTER_SPLIT_PRIOR_PA)
+    pitcher_splits = _shrunk_splits(pitcher_counts, 'pitcher', 'stand', PITCHER_SPLIT_PRIOR_PA)
+
+    batter_path, pitcher_path = _split_paths(season, version)
+    batter_splits.to_parquet(batter_path)
+    pitcher_splits.to_parquet(pitcher_path)
+    _split_tables[season] = (version, (batter_splits, pitcher_splits, league_k))
+    return _split_tables[season][1]
+
+
+def load_split_tables(season: int) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    version, batter_counts, _ = _split_inputs(season)
+    if season in _split_tables and _split_tables[season][0] == version:
+        return _split_tables[season][1]
+
+    batter_path, pitcher_path = _split_paths(season, version)
+    if batter_counts is None or not (os.path.exists(batter_path) and os.path.exists(pitcher_path)):
+        return build_split_tables(season)
+
+    batter_splits = pd.read_parquet(batter_path)
+    pitcher_splits = pd.read_parquet(pitcher_path)
+    league_k = DEFAULT_LEAGUE_K_PCT
+    if batter_counts['pa'].sum() > 0:
+        league_k = float(batter_counts['strikeouts'].sum() / batter_counts['pa'].sum())
+    _split_tables[season] = (version, (batter_splits, pitcher_splits, league_k))
+    return _split_tables[season][1]
+
+
+def _hands_for(season: int) -> pd.DataFrame:
+    snapshot_id, hands = handedness_snapshot(season)
+    if snapshot_id not in _hands_by_fg:
+        hands = hands[hands['key_fangraphs'] > 0].drop_duplicates('key_fangraphs')
+        _hands_by_fg[snapshot_id] = hands.set_index('key_fangraphs')[['bats', 'throws']].astype(str)
+    return _hands_by_fg[snapshot_id]
+
+
+def log5_k_pct(batter_k: np.ndarray, pitcher_k: np.ndarray, league_k: float) -> np.ndarray:
+    """
+    Odds-ratio combination of batter and pitcher K% relative to league average.
+    """
+    odds = (batter_k * pitcher_k / league_k) / ((1 - batter_k) * (1 - pitcher_k) / (1 - league_k))
+    return odds / (1 + odds)
+
+
+def score_platoon_lineup(pitcher_fg: int, batter_fgs: List[int], season: int) -> Dict:
+    """
+    Score every lineup slot against the split matching the pitcher's throwing hand
+    (and the pitcher's split matching each batter's side) in one vectorized pass.
+
+    Switch hitters bat from the side opposite the pitcher. Missing splits fall back to
+    the player's overall K%, then to league average.
+    """
+    batter_splits, pitcher_splits, league_k = load_split_tables(season)
+    hands = _hands_for(season)
+
+    batter_fgs = np.asarray(batter_fgs, dtype=np.int64)
+    throws = hands['throws'].get(pitcher_fg, 'R')
+    bats = hands['bats'].reindex(batter_fgs).fillna('R').to_numpy()
+    stands = np.where(bats == 'S', 'L' if throws == 'R' else 'R', bats)
+
+    batter_rows = batter_splits.reindex(pd.MultiIndex.from_arrays([batter_fgs, np.full(len(batter_fgs), throws)]))
+    pitcher_rows = pitcher_splits.reindex(pd.MultiIndex.from_arrays([np.full(len(batter_fgs), pitcher_fg), stands]))
+
+    batter_overall = batter_rows['overall_k_pct'].fillna(league_k).to_numpy(dtype=np.float64)
+    batter_k = batter_rows['k_pct'].to_numpy(dtype=np.float64)
+    batter_k = np.where(np.isnan(batter_k), batter_overall, batter_k)
+
+    pitcher_overall = league_k
+    if pitcher_fg in pitcher_splits.index.get_level_values('IDfg'):
+        pitcher_overall = float(pitcher_splits.xs(pitcher_fg, level='IDfg')['overall_k_pct'].iloc[0])
+    pitcher_k = pitcher_rows['k_pct'].fillna(pitcher_overall).to_numpy(dtype=np.float64)
+
+    expected_split = log5_k_pct(batter_k, pitcher_k, league_k)
+    expected_neutral = log5_k_pct(batter_overall, np.full(len(batter_fgs), pitcher_overall), league_k)
+
+    return {
+        'pitcher_hand': throws,
+        'batter_sides': stands.tolist(),
+        'expected_k_pct': expected_split.tolist(),
+        'expected_neutral_k_pct': expected_neutral.tolist(),
+        'platoon_factor': float(expected_split.sum() / expected_neutral.sum()) if len(batter_fgs) else 1.0
+    }
+
+
+def get_platoon_adjustment(pitcher_info: Dict, lineup: List[Dict], season: int) -> Optional[Dict]:
+    """
+    Platoon scoring for a pitcher dict and a lineup of batter dicts carrying mlbam ids.
+    Returns None when ids or split tables are unavailable.
+    """
+    try:
+        pitcher_fg = pitcher_info.get('fg_id')
+        if not pitcher_fg or pitcher_fg == -1:
+            pitcher_fg = mlbam_to_fangraphs(pitcher_info.get('mlbam_id') or 0)
+        batter_fgs = [mlbam_to_fangraphs(batter.get('mlbam_id') or 0) or -1 for batter in lineup]
+        if not pitcher_fg or all(fg == -1 for fg in batter_fgs):
+            return None
+        return score_platoon_lineup(int(pitcher_fg), batter_fgs, season)
+    except Exception as e:
+        print(f"Platoon splits unavailable for {pitcher_info.get('pitcher_name')}: {str(e)}")
+        return None
+
+
+def get_pitcher_hand(pitcher_info: Dict, season: int) -> str:
+    try:
+        if pitcher_info.get('mlbam_id'):
+            return get_handedness(pitcher_info['mlbam_id'], season)[1]
+    except Exception as e:
+        print(f"Could not look up handedness for {pitcher_info.get('pitcher_name')}: {str(e)}")
+    return 'R'
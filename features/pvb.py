@@ -0,0 +1,199 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.statcast import aggregate_snapshot, has_aggregates
+from utils.data_loader import cache_path
+
+# Career pitcher-vs-batter history is summed over this many seasons
+PVB_SEASONS = 5
+PVB_COUNTS = ['pa', 'strikeouts', 'whiffs', 'pitches']
+# Pseudo plate appearances at the model's prior K% (PvB samples are tiny and noisy)
+PVB_PRIOR_PA = 50
+DEFAULT_PRIOR_K_PCT = 0.22
+
+
+class PvBMatrix:
+    """
+    Sparse pitcher x batter count matrix in CSR layout: row offsets per pitcher,
+    sorted batter ids per row and an (nnz, len(PVB_COUNTS)) int32 count block.
+
+    A pair lookup is a dict hit for the pitcher plus a binary search inside that
+    pitcher's row (a few hundred batters at most); a lineup is gathered in one
+    vectorized searchsorted.
+    """
+
+    def __init__(self, pitcher_ids: np.ndarray, indptr: np.ndarray, batter_ids: np.ndarray, counts: np.ndarray):
+        self.pitcher_ids = pitcher_ids
+        self.indptr = indptr
+        self.batter_ids = batter_ids
+        self.counts = counts
+        self._rows = {int(pitcher_id): row for row, pitcher_id in enumerate(pitcher_ids.tolist())}
+
+    @classmethod
+    def from_counts(cls, counts: pd.DataFrame) -> 'PvBMatrix':
+        """
+        Build from a long (pitcher, batter) -> PVB_COUNTS frame.
+        """
+        counts = counts.sort_values(['pitcher', 'batter'])
+        pitchers = counts['pitcher'].to_numpy(dtype=np.int32)
+        pitcher_ids, starts = np.unique(pitchers, return_index=True)
+        indptr = np.append(starts, len(pitchers)).astype(np.int64)
+        return cls(pitcher_ids, indptr, counts['batter'].to_numpy(dtype=np.int32),
+                   counts[PVB_COUNTS].to_numpy(dtype=np.int32))
+
+    def save(self, path: str) -> None:
+        np.savez(path, pitcher_ids=self.pitcher_ids, indptr=self.indptr, batter_ids=self.batter_ids, counts=self.counts)
+
+    @classmethod
+    def load(cls, path: str) -> 'PvBMatrix':
+        with np.load(path) as data:
+            return cls(data['pitcher_ids'], data['indptr'], data['batter_ids'], data['counts'])
+
+    def to_counts(self) -> pd.DataFrame:
+        frame = pd.DataFrame(self.counts, columns=PVB_COUNTS)
+        frame.insert(0, 'batter', self.batter_ids)
+        frame.insert(0, 'pitcher', np.repeat(self.pitcher_ids, np.diff(self.indptr)))
+        return frame
+
+    def gather(self, pitcher_id: int, batter_ids: List[int]) -> np.ndarray:
+        """
+        (len(batter_ids), len(PVB_COUNTS)) counts for one pitcher against a lineup;
+        pairs with no history are zero rows.
+        """
+        batter_ids = np.asarray(batter_ids, dtype=np.int32)
+        result = np.zeros((len(batter_ids), len(PVB_COUNTS)), dtype=np.int32)
+        row = self._rows.get(int(pitcher_id))
+        if row is None:
+            return result
+        start, end = self.indptr[row], self.indptr[row + 1]
+        faced = self.batter_ids[start:end]
+        positions = np.searchsorted(faced, batter_ids)
+        found = positions < len(faced)
+        found[found] = faced[positions[found]] == batter_ids[found]
+        result[found] = self.counts[start + positions[found]]
+        return result
+
+    def pair(self, pitcher_id: int, batter_id: int) -> Optional[Dict[str, int]]:
+        counts = self.gather(pitcher_id, [batter_id])[0]
+        if not counts.any():
+            return None
+        return dict(zip(PVB_COUNTS, counts.tolist()))
+
+
+def _season_counts(season: int) -> Optional[pd.DataFrame]:
+    snapshot = aggregate_snapshot(season, 'pitcher_batter')
+    if snapshot is None:
+        return None
+    return snapshot[1].reset_index()[['pitcher', 'batter'] + PVB_COUNTS]
+
+
+def _sum_counts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [frame for frame in frames if frame is not None and len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=['pitcher', 'batter'] + PVB_COUNTS, dtype='int32')
+    return pd.concat(frames, ignore_index=True).groupby(['pitcher', 'batter'], as_index=False)[PVB_COUNTS].sum()
+
+
+def _aggregate_id(season: int) -> Optional[str]:
+    # Snapshot of the season's counts pinned to the current run; the matrices are keyed by it
+    snapshot = aggregate_snapshot(season, 'pitcher_batter')
+    return snapshot[0] if snapshot is not None else None
+
+
+def _career_meta(season: int) -> Dict[str, Optional[str]]:
+    return {str(year): _aggregate_id(year) for year in range(season - PVB_SEASONS + 1, season + 1)}
+
+
+def build_pvb_matrix(season: int) -> PvBMatrix:
+    """
+    Career matrix through season, persisted as .npz under cache/pvb/.
+
+    Completed seasons are summed once into a cached history matrix; when the current
+    season's aggregate changes only it is re-added to the history.
+    """
+    first = season - PVB_SEASONS + 1
+    history_path = cache_path('pvb', f"history_{first}_{season - 1}.npz")
+    history_meta = {str(year): _aggregate_id(year) for year in range(first, season)}
+    history = None
+    if os.path.exists(history_path) and os.path.exists(history_path.replace('.npz', '.json')):
+        with open(history_path.replace('.npz', '.json')) as f:
+            if json.load(f) == history_meta:
+                history = PvBMatrix.load(history_path)
+    if history is None:
+        history = PvBMatrix.from_counts(_sum_counts([_season_counts(year) for year in range(first, season)]))
+        history.save(history_path)
+        with open(history_path.replace('.npz', '.json'), 'w') as f:
+            json.dump(history_meta, f)
+
+    career = PvBMatrix.from_counts(_sum_counts([history.to_counts(), _season_counts(season)]))
+    career.save(cache_path('pvb', f"career_{season}.npz"))
+    with open(cache_path('pvb', f"career_{season}.json"), 'w') as f:
+        json.dump(_career_meta(season), f)
+    return career
+
+
+_matrices: Dict[int, Tuple[Dict[str, Optional[str]], PvBMatrix]] = {}
+
+
+def get_pvb_matrix(season: int) -> PvBMatrix:
+    """
+    Career matrix for season, rebuilt only when a pinned aggregate it sums changes.
+    """
+    meta = _career_meta(season)
+    if season in _matrices and _matrices[season][0] == meta:
+        return _matrices[season][1]
+
+    path = cache_path('pvb', f"career_{season}.npz")
+    meta_path = cache_path('pvb', f"career_{season}.json")
+    matrix = None
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                matrix = PvBMatrix.load(path)
+    if matrix is None:
+        matrix = build_pvb_matrix(season)
+    _matrices[season] = (meta, matrix)
+    return matrix
+
+
+def shrunk_pvb_k_pct(counts: np.ndarray, prior_k: np.ndarray, prior_pa: int = PVB_PRIOR_PA) -> np.ndarray:
+    pa = counts[:, PVB_COUNTS.index('pa')]
+    strikeouts = counts[:, PVB_COUNTS.index('strikeouts')]
+    return (strikeouts + prior_pa * prior_k) / (pa + prior_pa)
+
+
+def score_pvb_lineup(pitcher_mlbam: int, batter_mlbams: List[int], season: int,
+                     prior_k: Optional[List[float]] = None) -> Dict:
+    """
+    Direct-history adjustment for a lineup: each batter's K% against this pitcher,
+    shrunk toward prior_k (the model's expected K% for the pair, e.g. the platoon
+    log5 estimate), and the lineup-level ratio of shrunk to prior.
+    """
+    if prior_k is None:
+        prior_k = [DEFAULT_PRIOR_K_PCT] * len(batter_mlbams)
+    prior = np.asarray(prior_k, dtype=np.float64)
+    counts = get_pvb_matrix(season).gather(pitcher_mlbam, [mlbam or 0 for mlbam in batter_mlbams])
+    shrunk = shrunk_pvb_k_pct(counts, prior)
+    return {
+        'pvb_pa': counts[:, PVB_COUNTS.index('pa')].tolist(),
+        'pvb_k_pct': shrunk.tolist(),
+        'pvb_factor': float(shrunk.sum() / prior.sum()) if prior.sum() > 0 else 1.0
+    }
+
+
+def get_pvb_adjustment(pitcher_info: Dict, lineup: List[Dict], season: int,
+                       prior_k: Optional[List[float]] = None) -> Optional[Dict]:
+    """
+    PvB scoring for a pitcher dict and a lineup of batter dicts carrying mlbam ids.
+    Returns None when ids or ingested history are unavailable.
+    """
+    try:
+        if not pitcher_info.get('mlbam_id') or not has_aggregates(season, 'pitcher_batter'):
+            return None
+        return score_pvb_lineup(int(pitcher_info['mlbam_id']), [batter.get('mlbam_id') for batter in lineup], season, prior_k)
+    except Exception as e:
+        print(f"Pitcher-vs-batter history unavailable for {pitcher_info.get('pitcher_name')}: {str(e)}")
+        return None
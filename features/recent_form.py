@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.statcast import chunk_dates, fetch_pitch_chunk, week_chunks
+from utils.data_loader import SnapshotMissingError, cache_path, snapshot_json
+from utils.player_registry import fangraphs_to_mlbam
+
+PITCHER_WINDOW_STARTS = 5
+HITTER_WINDOW_DAYS = 14
+# Appearances below this pitch count are relief outings and don't count as starts
+MIN_START_PITCHES = 30
+
+FORM_COUNTS = ['pitches', 'pa', 'strikeouts', 'whiffs', 'swings']
+GAME_LOG_COLUMNS = ['player_id', 'game_pk', 'game_date'] + FORM_COUNTS
+
+
+class RollingWindow:
+    """
+    Per-player rolling window of game-log rows with running totals.
+
+    Windows are bounded either by a number of games (pitchers) or by a number of
+    days (hitters). Pushing a game and evicting old ones touches only that player,
+    so a daily update costs O(new games) regardless of how long the logs are.
+    """
+
+    def __init__(self, size: int, by_days: bool = False):
+        self.size = size
+        self.by_days = by_days
+        self.games: Dict[int, Deque[Tuple[int, np.ndarray]]] = {}
+        self.totals: Dict[int, np.ndarray] = {}
+
+    def push(self, player_id: int, game_date: int, counts: np.ndarray) -> None:
+        window = self.games.setdefault(player_id, deque())
+        window.append((game_date, counts))
+        self.totals[player_id] = self.totals.get(player_id, np.zeros(len(FORM_COUNTS), dtype=np.int64)) + counts
+        if self.by_days:
+            self.evict(player_id, game_date)
+        else:
+            while len(window) > self.size:
+                _, old = window.popleft()
+                self.totals[player_id] -= old
+
+    def evict(self, player_id: int, as_of: int) -> None:
+        """
+        Drop games older than the day window ending at as_of (yyyymmdd).
+        """
+        window = self.games.get(player_id)
+        if not window:
+            return
+        cutoff = int((datetime.strptime(str(as_of), '%Y%m%d') - timedelta(days=self.size - 1)).strftime('%Y%m%d'))
+        while window and window[0][0] < cutoff:
+            _, old = window.popleft()
+            self.totals[player_id] -= old
+
+    def get(self, player_id: int, as_of: Optional[int] = None) -> Optional[Dict]:
+        if self.by_days and as_of is not None:
+            self.evict(player_id, as_of)
+        window = self.games.get(player_id)
+        if not window:
+            return None
+        totals = dict(zip(FORM_COUNTS, self.totals[player_id].tolist()))
+        totals['games'] = len(window)
+        totals['last_game'] = window[-1][0]
+        return totals
+
+    def to_frame(self) -> pd.DataFrame:
+        rows = [
+            (player_id, game_date, *counts.tolist())
+            for player_id, window in self.games.items()
+            for game_date, counts in window
+        ]
+        return pd.DataFrame(rows, columns=['player_id', 'game_date'] + FORM_COUNTS).astype('int32')
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, size: int, by_days: bool = False) -> 'RollingWindow':
+        window = cls(size, by_days)
+        ordered = frame.sort_values(['player_id', 'game_date'])
+        counts = ordered[FORM_COUNTS].to_numpy(dtype=np.int64)
+        for player_id, game_date, row in zip(ordered['player_id'].tolist(), ordered['game_date'].tolist(), counts):
+            window.push(player_id, game_date, row)
+        return window
+
+
+def _game_logs(pitches: pd.DataFrame, role: str) -> pd.DataFrame:
+    logs = pitches.groupby([role, 'game_pk', 'game_date'], observed=True)[FORM_COUNTS].sum().reset_index()
+    return logs.rename(columns={role: 'player_id'}).astype('int32')
+
+
+class FormStore:
+    """
+    Incremental game-log store backing the rolling recent-form features.
+
+    Game logs are appended per day under cache/gamelogs/<season>/; only the bounded
+    window state is rewritten on each update.
+    """
+
+    def __init__(self, season: int):
+        self.season = season
+        self.processed = set()
+        self.pitchers = RollingWindow(PITCHER_WINDOW_STARTS)
+        self.hitters = RollingWindow(HITTER_WINDOW_DAYS, by_days=True)
+        # through date -> (pitcher window, hitter window) rebuilt from the day logs
+        self._windows: Dict[str, Tuple[RollingWindow, RollingWindow]] = {}
+        self.load()
+
+    def _path(self, name: str) -> str:
+        return cache_path('gamelogs', str(self.season), name)
+
+    def load(self) -> None:
+        if os.path.exists(self._path('processed.json')):
+            with open(self._path('processed.json')) as f:
+                self.processed = set(json.load(f))
+        if os.path.exists(self._path('pitcher_window.parquet')):
+            self.pitchers = RollingWindow.from_frame(
+                pd.read_parquet(self._path('pitcher_window.parquet')), PITCHER_WINDOW_STARTS
+            )
+        if os.path.exists(self._path('hitter_window.parquet')):
+            self.hitters = RollingWindow.from_frame(
+                pd.read_parquet(self._path('hitter_window.parquet')), HITTER_WINDOW_DAYS, by_days=True
+            )
+
+    def save(self) -> None:
+        self.pitchers.to_frame().to_parquet(self._path('pitcher_window.parquet'), index=False)
+        self.hitters.to_frame().to_parquet(self._path('hitter_window.parquet'), index=False)
+        with open(self._path('processed.json'), 'w') as f:
+            json.dump(sorted(self.processed), f)
+
+    def add_day(self, date_str: str, pitches: pd.DataFrame) -> None:
+        pitcher_logs = _game_logs(pitches, 'pitcher')
+        hitter_logs = _game_logs(pitches, 'batter')
+        pitcher_logs.to_parquet(self._path(f"pitchers/{date_str}.parquet"), index=False)
+        hitter_logs.to_parquet(self._path(f"hitters/{date_str}.parquet"), index=False)
+
+        starts = pitcher_logs[pitcher_logs['pitches'] >= MIN_START_PITCHES].sort_values('game_date')
+        for logs, window in ((starts, self.pitchers), (hitter_logs.sort_values('game_date'), self.hitters)):
+            counts = logs[FORM_COUNTS].to_numpy(dtype=np.int64)
+            for player_id, game_date, row in zip(logs['player_id'].tolist(), logs['game_date'].tolist(), counts):
+                window.push(player_id, game_date, row)
+        self.processed.add(date_str)
+
+    def update(self, through_date: Optional[str] = None) -> None:
+        """
+        Fold every unprocessed completed day of the season into the windows.
+        """
+        if through_date is None:
+            through_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        start = max(self.processed) if self.processed else f"{self.season}-03-01"
+        end = min(through_date, f"{self.season}-11-30")
+
+        new_days = 0
+        # Read through the same weekly chunk files statcast ingestion caches
+        for chunk in week_chunks(start, end):
+            dates = [d for d in chunk_dates(chunk, start, end) if d not in self.processed]
+            if not dates:
+                continue
+            pitches = fetch_pitch_chunk(*chunk)
+            for date_str in dates:
+                self.add_day(date_str, pitches[pitches['game_date'] == int(date_str.replace('-', ''))])
+                new_days += 1
+
+        if new_days:
+            self.save()
+            print(f"Updated recent form with {new_days} new days through {through_date}")
+
+    def as_of(self) -> Optional[int]:
+        if not self.processed:
+            return None
+        return int(max(self.processed).replace('-', ''))
+
+    def latest_before(self, date_str: str) -> Optional[str]:
+        days = [day for day in self.processed if day < date_str]
+        return max(days) if days else None
+
+    def _day_logs(self, role: str, days: List[str]) -> pd.DataFrame:
+        frames = [pd.read_parquet(self._path(f"{role}/{day}.parquet")) for day in days]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=GAME_LOG_COLUMNS)
+
+    def windows(self, through: Optional[str] = None) -> Tuple[RollingWindow, RollingWindow]:
+        """
+        (pitcher window, hitter window) holding only days up to through (YYYY-MM-DD).
+        The live windows already end at the last processed day; an earlier day's are
+        rebuilt from the per-day game logs, so a past slate never sees later games.
+        """
+        if through is None or through == max(self.processed, default=None):
+            return self.pitchers, self.hitters
+        if through not in self._windows:
+            days = sorted(day for day in self.processed if day <= through)
+            first_hitter_day = (datetime.strptime(through, '%Y-%m-%d') - timedelta(days=HITTER_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+            pitcher_logs = self._day_logs('pitchers', days)
+            pitchers = RollingWindow.from_frame(
+                pitcher_logs[pitcher_logs['pitches'] >= MIN_START_PITCHES], PITCHER_WINDOW_STARTS
+            )
+            hitters = RollingWindow.from_frame(
+                self._day_logs('hitters', [day for day in days if day >= first_hitter_day]), HITTER_WINDOW_DAYS, by_days=True
+            )
+            self._windows[through] = (pitchers, hitters)
+        return self._windows[through]
+
+    def get_pitcher_form(self, mlbam_id: int, through: Optional[str] = None) -> Optional[Dict]:
+        totals = self.windows(through)[0].get(int(mlbam_id))
+        return _form_rates(totals) if totals else None
+
+    def get_hitter_form(self, mlbam_id: int, through: Optional[str] = None) -> Optional[Dict]:
+        as_of = int(through.replace('-', '')) if through else self.as_of()
+        totals = self.windows(through)[1].get(int(mlbam_id), as_of)
+        return _form_rates(totals) if totals else None
+
+
+def _form_rates(totals: Dict) -> Dict:
+    return {
+        'games': totals['games'],
+        'pa': totals['pa'],
+        'k_pct': totals['strikeouts'] / totals['pa'] if totals['pa'] else None,
+        'swstr_pct': totals['whiffs'] / totals['pitches'] if totals['pitches'] else None,
+        'pitches_per_game': totals['pitches'] / totals['games'] if totals['games'] else None,
+        'last_game': totals['last_game']
+    }
+
+
+_stores: Dict[int, FormStore] = {}
+
+
+def get_form_store(season: int) -> FormStore:
+    if season not in _stores:
+        _stores[season] = FormStore(season)
+    return _stores[season]
+
+
+def form_through(season: int, date_str: str) -> Optional[str]:
+    """
+    The last logged day before date_str, pinned to the current run so a replay
+    evaluates the same windows even after later days have been logged.
+    """
+    store = get_form_store(season)
+    return snapshot_json(f"recent_form:{season}:{date_str}", lambda: store.latest_before(date_str))
+
+
+def get_recent_form(fg_id: int, season: int, role: str = 'pitcher', date: Optional[str] = None) -> Optional[Dict]:
+    """
+    Rolling recent-form features (last N starts for pitchers, last N days for hitters)
+    looked up by FanGraphs id. With a date, the windows end the day before it
+    rather than at the last logged day. Returns None when the player has no logged
+    games (or, in a replay of a run that didn't record form, at all).
+    """
+    store = get_form_store(season)
+    if not store.processed:
+        return None
+    mlbam_id = fangraphs_to_mlbam(fg_id)
+    if not mlbam_id:
+        return None
+    through = None
+    if date is not None:
+        try:
+            through = form_through(season, date)
+        except SnapshotMissingError:
+            return None
+        if through is None:
+            return None
+    if role == 'pitcher':
+        return store.get_pitcher_form(mlbam_id, through)
+    return store.get_hitter_form(mlbam_id, through)
+
+
+def get_recent_form_frame(fg_ids: List[int], season: int, role: str = 'pitcher', date: Optional[str] = None) -> pd.DataFrame:
+    rows = {fg_id: get_recent_form(fg_id, season, role, date) or {} for fg_id in fg_ids}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold completed days into the recent-form game logs")
+    parser.add_argument('--season', type=int, default=datetime.now().year)
+    parser.add_argument('--through', default=None, help="Last day to fold in (YYYY-MM-DD); defaults to yesterday")
+    args = parser.parse_args()
+
+    try:
+        get_form_store(args.season).update(args.through)
+    except Exception as e:
+        print(f"Error updating recent form: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
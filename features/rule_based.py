@@ -1,13 +1,17 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 import pandas as pd
 import numpy as np
-from scipy.stats import zscore
-from pybaseball import batting_stats, pitching_stats
 from datetime import datetime
 from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
 from features.batters import get_opposing_lineups
-from features.batters import get_batter_stats, calculate_matchup_score
+from features.batters import cached_matchup_score
+from features.platoon import get_platoon_adjustment
+from features.pvb import get_pvb_adjustment
+from features.batters_faced import build_slate_pa_matrix, weighted_lineup_scores, LINEUP_SLOTS
+from features.normalization import get_normalization
+from features.pitcher_comps import get_comp_index, is_low_sample
+from utils.data_loader import load_batting_stats, load_pitching_stats
 
 
 
@@ -28,50 +32,30 @@ def get_hitter_z_scores(season: int = None) -> pd.DataFrame:
     if season is None:
         season = datetime.now().year
     
-    hitters = batting_stats(start_season=season, end_season=season, qual=0)
-    
-    hitters['wOBA'] = hitters['wOBA'].fillna(hitters['wOBA'].mean())
-    hitters['K%'] = hitters['SO'] / hitters['PA']
-    
-    metrics = ['wOBA', 'K%', 'SLG', 'ISO']
-    for metric in metrics:
-        hitters[f'{metric}_z'] = zscore(hitters[metric].fillna(hitters[metric].mean()))
- 
-    hitters['susceptibility_score'] = (
-        0.7 * hitters['K%_z'] +      
-        0.2 * (-hitters['wOBA_z']) + 
-        0.1 * hitters['ISO_z']       
-    )
-    
-    hitters['susceptibility_z'] = zscore(hitters['susceptibility_score'])
-    
-    return hitters[['Name', 'susceptibility_z']]
+    return get_normalization(season).hitters[['Name', 'susceptibility_z']]
 
 def get_pitcher_k_factor(pitcher_name: str, season: int = None) -> float:
     if season is None:
         season = datetime.now().year
         
-    pitchers = pitching_stats(season, qual=1)
-    
-    pitchers['K%'] = (pitchers['SO'] * 9) / (pitchers['IP'] * 9 + pitchers['BB'] + pitchers['H'])
+    norms = get_normalization(season)
     
-    pitchers['K%_z'] = zscore(pitchers['K%'].fillna(pitchers['K%'].mean()))
-    
-    pitcher_names = pitchers['Name'].tolist()
+    pitcher_names = norms.pitchers['Name'].tolist()
     matched_name = fuzzy_name_match(pitcher_name, pitcher_names)
     
     if matched_name:
-        pitcher = pitchers[pitchers['Name'] == matched_name]
-        if not pitcher.empty:
-            return float(pitcher['K%_z'].iloc[0])
+        k_z = norms.pitcher_k_z_by_name(matched_name)
+        if k_z is not None:
+            return float(k_z)
     
     raise ValueError(f"Pitcher '{pitcher_name}' not found in pitching data. Available pitchers: {len(pitcher_names)}")
 
-def get_pitch_quality_score(pitcher_name: str) -> float:
+def get_pitch_quality_score(pitcher_name: str, season: int = None) -> float:
     try:
-        season = datetime.now().year
+        if season is None:
+            season = datetime.now().year
         
-        pitchers = pitching_stats(season, qual=1)
+        pitchers = load_pitching_stats(season)
 
         pitcher_names = pitchers['Name'].tolist()
         matched_name = fuzzy_name_match(pitcher_name, pitcher_names)
@@ -103,7 +87,7 @@ def calculate_ip_adjustment(pitcher_name: str, lineup_woba: float, season: int =
     if season is None:
         season = datetime.now().year
         
-    pitchers = pitching_stats(season, qual=1)
+    pitchers = load_pitching_stats(season)
     
     pitcher_names = pitchers['Name'].tolist()
     matched_name = fuzzy_name_match(pitcher_name, pitcher_names)
@@ -116,9 +100,11 @@ def calculate_ip_adjustment(pitcher_name: str, lineup_woba: float, season: int =
     if pitcher.empty:
         raise ValueError(f"No data found for {pitcher_name}")
     
-    league_woba = 0.320  
-
     base_ip = float(pitcher['IP'].iloc[0] / pitcher['G'].iloc[0])
+    return adjust_ip_for_lineup(base_ip, lineup_woba)
+
+def adjust_ip_for_lineup(base_ip: float, lineup_woba: float) -> float:
+    league_woba = 0.320  
     beta = 0.02  
     
     woba_diff = lineup_woba - league_woba
@@ -130,7 +116,7 @@ def get_lineup_woba(lineup: List[str], season: int = None):
     if season is None:
         season = datetime.now().year
     
-    batting_stats_df = batting_stats(start_season=season, end_season=season, qual=0)
+    batting_stats_df = load_batting_stats(season)
     
     found_players = []
     for player in lineup:
@@ -145,38 +131,64 @@ def get_lineup_woba(lineup: List[str], season: int = None):
     
     return np.mean(found_players)
 
-def project_strikeouts(
+def get_lineup_slot_weights(pitcher_name: str, lineup: List[str], season: int = None) -> np.ndarray:
+    if season is None:
+        season = datetime.now().year
+
+    pitchers = load_pitching_stats(season)
+    matched_pitcher = fuzzy_name_match(pitcher_name, pitchers['Name'].tolist()) or pitcher_name
+    hitter_names = load_batting_stats(season)['Name'].tolist()
+    matched_lineup = [fuzzy_name_match(player, hitter_names) or player for player in lineup]
+
+    pa = build_slate_pa_matrix([matched_pitcher], [matched_lineup], season, pitchers=pitchers)['pa']
+    return pa[0]
+
+# Tunable constants of the rule-based projection (see models/train_model.py)
+MATCHUP_BLEND = 0.65
+PITCH_MIX_WEIGHT = 0.2
+PROJECTION_FUDGE = 1.05
+
+PROJECTION_FEATURES = ['k_per_9', 'estimated_ip', 'lineup_z', 'k_z', 'pitch_mix_score', 'quality_score']
+
+def compute_projection_features(
     pitcher_name: str,
     lineup: List[str],
     season: int = None,
-    alpha: float = 0.06,
-    gamma: float = 0.02
-):
+    slot_weights: Optional[List[float]] = None
+) -> Dict[str, float]:
     if season is None:
         season = datetime.now().year
 
-    hitters = get_hitter_z_scores(season)
+    norms = get_normalization(season)
+    hitter_names = norms.hitters['Name'].tolist()
 
-    found_scores = []
-    for player in lineup:
-        matched_name = fuzzy_name_match(player, hitters['Name'].tolist())
+    slot_scores = np.full(LINEUP_SLOTS, np.nan)
+    for slot, player in enumerate(lineup[:LINEUP_SLOTS]):
+        matched_name = fuzzy_name_match(player, hitter_names)
         if matched_name:
-            player_data = hitters[hitters['Name'] == matched_name]
-            if not player_data.empty:
-                found_scores.append(float(player_data['susceptibility_z'].iloc[0]))
+            susceptibility_z = norms.hitter_susceptibility_by_name(matched_name)
+            if susceptibility_z is not None:
+                slot_scores[slot] = float(susceptibility_z)
     
-    if len(found_scores) == 0:
+    if np.isnan(slot_scores).all():
         raise ValueError(f"No players found in lineup: {lineup}")
     
-    lineup_z = np.mean(found_scores)
+    # Weight each hitter by expected plate appearances from his lineup slot
+    if slot_weights is None:
+        slot_weights = get_lineup_slot_weights(pitcher_name, lineup, season)
+    lineup_z = weighted_lineup_scores(slot_scores[None, :], np.asarray(slot_weights, dtype=float)[None, :])[0]
+    if np.isnan(lineup_z):
+        lineup_z = np.nanmean(slot_scores)
+    
+    # The comp index is only built once a low-sample starter needs it
+    fg_id = get_pitcher_fg_id(pitcher_name, season)
+    if is_low_sample(fg_id, season):
+        return compute_comp_projection_features(pitcher_name, fg_id, lineup, float(lineup_z), season)
     
     k_z = get_pitcher_k_factor(pitcher_name, season)
     
-    matchup_factor = 1 + (lineup_z - k_z) * alpha
     pitch_mix_score = calculate_pitch_mix_matchup_score(pitcher_name, lineup, season)
     
-    combined_matchup_factor = (0.65 * (1 + pitch_mix_score * 0.2)) + (0.35 * matchup_factor)
-    
     try:
         lineup_woba = get_lineup_woba(lineup, season)
     except Exception as e:
@@ -186,7 +198,7 @@ def project_strikeouts(
     estimated_ip = calculate_ip_adjustment(pitcher_name, lineup_woba, season) # pyright: ignore[reportArgumentType]
     
     try:
-        pitchers = pitching_stats(season, qual=1)
+        pitchers = load_pitching_stats(season)
         pitcher_names = pitchers['Name'].tolist()
         matched_name = fuzzy_name_match(pitcher_name, pitcher_names)
         
@@ -199,15 +211,94 @@ def project_strikeouts(
             raise ValueError(f"No data found for {pitcher_name}")
         
         k_per_9 = float(pitcher['SO'].iloc[0] * 9 / pitcher['IP'].iloc[0])
+        bb_per_9 = float(pitcher['BB'].iloc[0] * 9 / pitcher['IP'].iloc[0])
+        h_per_9 = float(pitcher['H'].iloc[0] * 9 / pitcher['IP'].iloc[0])
         
     except Exception as e:
         raise
     
-    base_strikeouts = (k_per_9 * estimated_ip) / 9
+    quality_score = get_pitch_quality_score(pitcher_name, season)
+    
+    return {
+        'k_per_9': k_per_9,
+        'estimated_ip': float(estimated_ip),
+        'lineup_z': float(lineup_z),
+        'k_z': float(k_z),
+        'pitch_mix_score': float(pitch_mix_score),
+        'quality_score': float(quality_score),
+        'bb_per_9': bb_per_9,
+        'h_per_9': h_per_9,
+        'lineup_woba': float(lineup_woba)
+    }
+
+def compute_comp_projection_features(
+    pitcher_name: str,
+    fg_id: Optional[int],
+    lineup: List[str],
+    lineup_z: float,
+    season: int
+) -> Dict[str, float]:
+    """
+    Projection features for a call-up or opener with too few innings to stand on his
+    own: his rates shrunk toward those of his nearest established comps.
+    """
+    comp_index = get_comp_index(season)
+    blended = comp_index.blended(fg_id)
+    print(f"{pitcher_name} has {blended['ip']:.1f} IP; blending with {len(blended['comps'])} comps "
+          f"(own weight {blended['own_weight']:.2f})")
+    
+    norms = get_normalization(season)
+    comp_k_z = [norms.pitcher_k_z(comp) for comp in blended['comps']]
+    k_z = float(np.mean([z for z in comp_k_z if z is not None] or [0.0]))
+    own_k_z = norms.pitcher_k_z(fg_id) if fg_id else None
+    if own_k_z is not None:
+        k_z = blended['own_weight'] * float(own_k_z) + (1 - blended['own_weight']) * k_z
+    
+    pitch_mix_score = calculate_pitch_mix_matchup_score(pitcher_name, lineup, season, pitch_mix=blended['pitch_mix'])
+    lineup_woba = get_lineup_woba(lineup, season)
+    estimated_ip = adjust_ip_for_lineup(blended['ip_per_g'], lineup_woba)
+    
+    return {
+        'k_per_9': float(blended['k_per_9']),
+        'estimated_ip': float(estimated_ip),
+        'lineup_z': lineup_z,
+        'k_z': k_z,
+        'pitch_mix_score': float(pitch_mix_score),
+        'quality_score': float(blended['quality_score']),
+        'bb_per_9': float(blended['bb_per_9']),
+        'h_per_9': float(blended['h_per_9']),
+        'lineup_woba': float(lineup_woba)
+    }
+
+def combine_projection(
+    features,
+    alpha: float = 0.06,
+    gamma: float = 0.02,
+    blend: float = MATCHUP_BLEND,
+    pitch_mix_weight: float = PITCH_MIX_WEIGHT
+):
+    """
+    Combine projection features into projected strikeouts. Works on a single feature
+    dict or column-wise on a DataFrame / dict of arrays (one row per start).
+    """
+    matchup_factor = 1 + (features['lineup_z'] - features['k_z']) * alpha
+    combined_matchup_factor = (blend * (1 + features['pitch_mix_score'] * pitch_mix_weight)) + ((1 - blend) * matchup_factor)
+    
+    base_strikeouts = (features['k_per_9'] * features['estimated_ip']) / 9
     core_projection = base_strikeouts * combined_matchup_factor
     
-    quality_score = get_pitch_quality_score(pitcher_name)
-    final_proj = core_projection * (1 + gamma * quality_score)
+    return core_projection * (1 + gamma * features['quality_score'])
+
+def project_strikeouts(
+    pitcher_name: str,
+    lineup: List[str],
+    season: int = None,
+    alpha: float = 0.06,
+    gamma: float = 0.02,
+    slot_weights: Optional[List[float]] = None
+):
+    features = compute_projection_features(pitcher_name, lineup, season, slot_weights)
+    final_proj = combine_projection(features, alpha, gamma)
     
     return round(final_proj, 1)
 
@@ -216,7 +307,8 @@ def project_strikeouts_with_lineup_fetching(
     date: str = None,
     season: int = None,
     alpha: float = 0.15,
-    gamma: float = 0.15
+    gamma: float = 0.15,
+    slot_weights: Optional[List[float]] = None
 ):
     if date is None:
         date = datetime.now().strftime('%Y-%m-%d')
@@ -232,21 +324,61 @@ def project_strikeouts_with_lineup_fetching(
     if pitcher_name not in lineup_map:
         raise ValueError(f"No lineup found for {pitcher_name} on {date}")
     
-    lineup_data = lineup_map[pitcher_name]
+    return project_strikeouts_for_lineup(pitcher_info, lineup_map[pitcher_name], season, alpha, gamma, slot_weights)
+
+def project_strikeouts_for_lineup(
+    pitcher_info: Dict,
+    lineup_data: List[Dict],
+    season: int,
+    alpha: float = 0.15,
+    gamma: float = 0.15,
+    slot_weights: Optional[List[float]] = None
+) -> float:
+    """
+    Final projection for a pitcher against an already-known lineup (list of batter dicts).
+    """
+    features = compute_lineup_features(pitcher_info, lineup_data, season, slot_weights)
+    
+    projection = combine_projection(features, alpha, gamma)
+    projection *= features['platoon_factor'] * features['pvb_factor'] * PROJECTION_FUDGE
+    
+    # Rounded once, after every factor, as project_markets does
+    return round(float(projection), 1)
+
+def compute_lineup_features(
+    pitcher_info: Dict,
+    lineup_data: List[Dict],
+    season: int,
+    slot_weights: Optional[List[float]] = None
+) -> Dict[str, float]:
+    """
+    compute_projection_features plus the platoon and pitcher-vs-batter factors for a
+    pitcher against a known lineup: one row of a slate's feature matrix.
+    """
     lineup = [player['name'] for player in lineup_data]
+    features = compute_projection_features(pitcher_info['pitcher_name'], lineup, season, slot_weights)
     
-    
-    projection = project_strikeouts(pitcher_name, lineup, season, alpha, gamma)
-    
-    projection *= 1.05 
-    
-    return round(projection, 1)
+    platoon = get_platoon_adjustment(pitcher_info, lineup_data, season)
+    pvb = get_pvb_adjustment(pitcher_info, lineup_data, season, platoon['expected_k_pct'] if platoon else None)
+    features['platoon_factor'] = platoon['platoon_factor'] if platoon else 1.0
+    features['pvb_factor'] = pvb['pvb_factor'] if pvb else 1.0
+    return features
+
+def get_pitcher_fg_id(pitcher_name: str, season: int = None) -> Optional[int]:
+    if season is None:
+        season = datetime.now().year
+
+    pitchers = load_pitching_stats(season)
+    matched_name = fuzzy_name_match(pitcher_name, pitchers['Name'].tolist())
+    if not matched_name:
+        return None
+    return int(pitchers.loc[pitchers['Name'] == matched_name, 'IDfg'].iloc[0])
 
 def get_pitcher_pitch_mix(pitcher_name: str, season: int = None) -> Dict:
     if season is None:
         season = datetime.now().year
 
-    pitchers = pitching_stats(season, qual=1)
+    pitchers = load_pitching_stats(season)
     
     pitcher_names = pitchers['Name'].tolist()
     matched_name = fuzzy_name_match(pitcher_name, pitcher_names)
@@ -281,16 +413,27 @@ def get_pitcher_pitch_mix(pitcher_name: str, season: int = None) -> Dict:
     
     return pitch_mix
 
-def calculate_pitch_mix_matchup_score(pitcher_name: str, lineup: List[str], season: int = None):
-    if get_batter_stats is None or calculate_matchup_score is None:
-        print("Warning: Pitch mix analysis not available, returning 0")
-        return 0.0
-    
+def matchup_pitch_mix(pitcher_name: str, season: int, pitch_mix: Optional[Dict] = None) -> Tuple[Union[int, str, tuple], Dict]:
+    """
+    (matchup cache key, pitch mix) batters are scored against for this pitcher.
+    """
+    if pitch_mix is None:
+        pitch_mix = get_pitcher_pitch_mix(pitcher_name, season)
+        return get_pitcher_fg_id(pitcher_name, season) or pitcher_name, pitch_mix
+    # A supplied (e.g. comp-blended) mix is cached under the mix itself
+    return tuple(sorted(pitch_mix.items())), pitch_mix
+
+def calculate_pitch_mix_matchup_score(
+    pitcher_name: str,
+    lineup: List[str],
+    season: int = None,
+    pitch_mix: Optional[Dict] = None
+):
     if season is None:
         season = datetime.now().year
     
     try:
-        pitch_mix = get_pitcher_pitch_mix(pitcher_name, season)
+        pitcher_key, pitch_mix = matchup_pitch_mix(pitcher_name, season, pitch_mix)
         
         if not pitch_mix:
             return 0.0
@@ -298,11 +441,9 @@ def calculate_pitch_mix_matchup_score(pitcher_name: str, lineup: List[str], seas
         matchup_scores = []
         for batter_name in lineup:
             try:
-                batter_stats = get_batter_stats(batter_name, season)
-                if not batter_stats or 'pitch_metrics' not in batter_stats:
+                matchup_score = cached_matchup_score(pitcher_key, batter_name, pitch_mix, season)
+                if matchup_score is None:
                     continue
-                
-                matchup_score = calculate_matchup_score(batter_stats, pitch_mix)
                 matchup_scores.append(matchup_score)
                 
                 
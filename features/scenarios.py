@@ -0,0 +1,281 @@
+import copy
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+from features.batters import cached_matchup_score
+from features.batters_faced import LINEUP_SLOTS
+from features.contextual import park_k_factors
+from features.markets import LEAGUE_WOBA, add_market_baselines, project_markets
+from features.normalization import get_normalization
+from features.pitcher_comps import get_comp_index, is_low_sample
+from features.platoon import DEFAULT_LEAGUE_K_PCT, get_platoon_adjustment, score_platoon_lineup
+from features.pvb import DEFAULT_PRIOR_K_PCT, get_pvb_adjustment, score_pvb_lineup
+from features.rule_based import (
+    adjust_ip_for_lineup, compute_lineup_features, fuzzy_name_match, get_lineup_slot_weights,
+    get_pitcher_fg_id, matchup_pitch_mix
+)
+from utils.data_loader import load_batting_stats
+from utils.player_registry import mlbam_to_fangraphs
+
+# What one batter contributes to a projection, independent of where he bats
+TERM_COLUMNS = ['susceptibility_z', 'matchup_score', 'woba', 'split_k', 'neutral_k', 'pvb_k', 'pvb_prior']
+# Lineup-level sums the features are ratios of; a slot's share of each is additive
+AGGREGATE_COLUMNS = ['z_weighted', 'z_weight', 'z_sum', 'z_count', 'matchup_sum', 'matchup_count',
+                     'woba_sum', 'woba_count', 'split_k', 'neutral_k', 'pvb_k', 'pvb_prior']
+PITCHER_COLUMNS = ['k_per_9', 'k_z', 'quality_score', 'bb_per_9', 'h_per_9']
+
+
+def _batter_key(batter: Dict) -> Union[int, str]:
+    return batter.get('mlbam_id') or batter['name']
+
+
+def slot_aggregates(terms: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Each slot's share of the lineup sums, shape (..., slots, len(AGGREGATE_COLUMNS)),
+    for batter terms of shape (..., slots, len(TERM_COLUMNS)) and PA weights per slot.
+    """
+    z, matchup, woba = terms[..., 0], terms[..., 1], terms[..., 2]
+    z_known = ~np.isnan(z)
+    matchup_known = ~np.isnan(matchup)
+    woba_known = ~np.isnan(woba)
+    weights = np.broadcast_to(weights, z.shape)
+    return np.stack([
+        np.where(z_known, z * weights, 0.0), np.where(z_known, weights, 0.0),
+        np.where(z_known, z, 0.0), z_known.astype(np.float64),
+        np.where(matchup_known, matchup, 0.0), matchup_known.astype(np.float64),
+        np.where(woba_known, woba, 0.0), woba_known.astype(np.float64),
+        terms[..., 3], terms[..., 4], terms[..., 5], terms[..., 6]
+    ], axis=-1)
+
+
+class LineupScenario:
+    """
+    A starter's projection against one lineup, kept as per-slot batter terms and the
+    lineup sums they add up to, so what-ifs don't re-run the feature pipeline.
+
+    Swapping a batter subtracts his slot's share of each sum and adds the
+    replacement's; the pitcher-only features, slot PA weights and matchup pitch mix
+    are fixed at construction. A batter's terms are looked up once and memoized, and
+    many lineups are scored together in one vectorized pass, so large batches of
+    hypothetical lineups are cheap.
+
+    Slot weights stay those of the base lineup, so a swap doesn't move the expected
+    PA per slot (the base lineup's OBP sets batters faced).
+    """
+
+    def __init__(
+        self,
+        pitcher_info: Dict,
+        lineup_data: List[Dict],
+        season: int,
+        slot_weights: Optional[List[float]] = None,
+        park: Optional[str] = None,
+        alpha: float = 0.15,
+        gamma: float = 0.15
+    ):
+        self.pitcher_info = pitcher_info
+        self.season = season
+        self.park = park
+        self.alpha = alpha
+        self.gamma = gamma
+        self.lineup = list(lineup_data[:LINEUP_SLOTS])
+        pitcher_name = pitcher_info['pitcher_name']
+        if slot_weights is None:
+            slot_weights = get_lineup_slot_weights(pitcher_name, [batter['name'] for batter in self.lineup], season)
+        self.weights = np.asarray(slot_weights, dtype=np.float64)[:len(self.lineup)]
+
+        self.base_features = compute_lineup_features(pitcher_info, self.lineup, season, self.weights)
+        self.pitcher = {column: self.base_features[column] for column in PITCHER_COLUMNS}
+        # Innings before the lineup wOBA adjustment
+        self.base_ip = self.base_features['estimated_ip'] / adjust_ip_for_lineup(1.0, self.base_features['lineup_woba'])
+
+        self.matchup_key, self.pitch_mix = None, {}
+        try:
+            fg_id = get_pitcher_fg_id(pitcher_name, season)
+            supplied_mix = get_comp_index(season).blended(fg_id)['pitch_mix'] if is_low_sample(fg_id, season) else None
+            self.matchup_key, self.pitch_mix = matchup_pitch_mix(pitcher_name, season, supplied_mix)
+        except Exception as e:
+            print(f"Error resolving pitch mix for {pitcher_name}: {str(e)}")
+
+        self.pitcher_fg = pitcher_info.get('fg_id')
+        if not self.pitcher_fg or self.pitcher_fg == -1:
+            self.pitcher_fg = mlbam_to_fangraphs(pitcher_info.get('mlbam_id') or 0)
+        platoon = get_platoon_adjustment(pitcher_info, self.lineup, season)
+        self.platoon = platoon is not None and bool(self.pitcher_fg)
+        self.pvb = get_pvb_adjustment(pitcher_info, self.lineup, season,
+                                      platoon['expected_k_pct'] if platoon else None) is not None
+
+        norms = get_normalization(season)
+        self._norms = norms
+        self._hitter_names = norms.hitters['Name'].tolist()
+        batting = load_batting_stats(season).drop_duplicates('Name')
+        self._woba = dict(zip(batting['Name'].tolist(), batting['wOBA'].astype('float64').tolist()))
+        self._woba_names = list(self._woba)
+        self._terms: Dict[Union[int, str], np.ndarray] = {}
+
+        self.terms = self.batter_terms(self.lineup)
+        self._set_slots()
+
+    def _set_slots(self) -> None:
+        self.slots = slot_aggregates(self.terms, self.weights)
+        self.aggregates = self.slots.sum(axis=0)
+
+    def batter_terms(self, batters: List[Dict]) -> np.ndarray:
+        """
+        TERM_COLUMNS for each batter, shape (len(batters), len(TERM_COLUMNS)). Only
+        batters not seen before are looked up, platoon and PvB in one pass each.
+        """
+        missing = list({_batter_key(batter): batter for batter in batters if _batter_key(batter) not in self._terms}.values())
+        if missing:
+            terms = np.full((len(missing), len(TERM_COLUMNS)), np.nan)
+            for row, batter in enumerate(missing):
+                matched = fuzzy_name_match(batter['name'], self._hitter_names)
+                susceptibility_z = self._norms.hitter_susceptibility_by_name(matched) if matched else None
+                if susceptibility_z is not None:
+                    terms[row, 0] = float(susceptibility_z)
+                if self.pitch_mix:
+                    try:
+                        score = cached_matchup_score(self.matchup_key, batter['name'], self.pitch_mix, self.season)
+                        if score is not None:
+                            terms[row, 1] = float(score)
+                    except Exception:
+                        pass
+                matched = fuzzy_name_match(batter['name'], self._woba_names)
+                if matched:
+                    terms[row, 2] = self._woba[matched]
+
+            # Without platoon splits (or PvB history) the factor is 1: split equals neutral
+            terms[:, 3:5] = DEFAULT_LEAGUE_K_PCT
+            prior_k = [DEFAULT_PRIOR_K_PCT] * len(missing)
+            if self.platoon:
+                batter_fgs = [mlbam_to_fangraphs(batter.get('mlbam_id') or 0) or -1 for batter in missing]
+                platoon = score_platoon_lineup(int(self.pitcher_fg), batter_fgs, self.season)
+                terms[:, 3] = platoon['expected_k_pct']
+                terms[:, 4] = platoon['expected_neutral_k_pct']
+                prior_k = platoon['expected_k_pct']
+            terms[:, 6] = prior_k
+            terms[:, 5] = prior_k
+            if self.pvb:
+                pvb = score_pvb_lineup(int(self.pitcher_info['mlbam_id']), [batter.get('mlbam_id') for batter in missing],
+                                       self.season, prior_k)
+                terms[:, 5] = pvb['pvb_k_pct']
+
+            for batter, row in zip(missing, terms):
+                self._terms[_batter_key(batter)] = row
+        return np.array([self._terms[_batter_key(batter)] for batter in batters]).reshape(len(batters), len(TERM_COLUMNS))
+
+    def slot_of(self, batter: Union[str, int]) -> int:
+        """
+        Batting-order slot (1-based) of a batter in the base lineup, by name or MLBAM id.
+        """
+        for slot, current in enumerate(self.lineup, start=1):
+            if batter in (current.get('mlbam_id'), current['name']):
+                return slot
+        raise ValueError(f"{batter} is not in the lineup")
+
+    def _swapped(self, swaps: Optional[Dict[int, Dict]]) -> np.ndarray:
+        aggregates = self.aggregates.copy()
+        if swaps:
+            slots = np.array([slot - 1 for slot in swaps])
+            new = slot_aggregates(self.batter_terms(list(swaps.values())), self.weights[slots])
+            aggregates += new.sum(axis=0) - self.slots[slots].sum(axis=0)
+        return aggregates
+
+    def features(
+        self,
+        aggregates: np.ndarray,
+        ip: Optional[Union[float, np.ndarray]] = None
+    ) -> pd.DataFrame:
+        """
+        compute_lineup_features columns (plus market baselines) for rows of lineup
+        sums, shape (n, len(AGGREGATE_COLUMNS)). ip pins the expected innings.
+        """
+        sums = dict(zip(AGGREGATE_COLUMNS, np.atleast_2d(aggregates).T))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lineup_z = np.where(sums['z_weight'] > 0, sums['z_weighted'] / sums['z_weight'], sums['z_sum'] / sums['z_count'])
+            pitch_mix_score = np.where(sums['matchup_count'] > 0, sums['matchup_sum'] / sums['matchup_count'], 0.0)
+            lineup_woba = np.where(sums['woba_count'] > 0, sums['woba_sum'] / sums['woba_count'], LEAGUE_WOBA)
+            platoon_factor = np.where(sums['neutral_k'] > 0, sums['split_k'] / sums['neutral_k'], 1.0)
+            pvb_factor = np.where(sums['pvb_prior'] > 0, sums['pvb_k'] / sums['pvb_prior'], 1.0)
+        estimated_ip = adjust_ip_for_lineup(self.base_ip, lineup_woba) if ip is None else np.broadcast_to(ip, lineup_woba.shape)
+
+        frame = pd.DataFrame({
+            **{column: np.full(len(lineup_z), value) for column, value in self.pitcher.items()},
+            'estimated_ip': estimated_ip,
+            'lineup_z': lineup_z,
+            'pitch_mix_score': pitch_mix_score,
+            'lineup_woba': lineup_woba,
+            'platoon_factor': platoon_factor,
+            'pvb_factor': pvb_factor
+        }).astype('float64')
+        return add_market_baselines(frame)
+
+    def _project(self, aggregates: np.ndarray, ip, park: Optional[str], markets: Optional[List[str]]) -> pd.DataFrame:
+        projections = project_markets(self.features(aggregates, ip), markets, self.alpha, self.gamma)
+        park = park or self.park
+        if park and 'strikeouts' in projections:
+            projections['strikeouts'] *= park_k_factors.get(park, 1.00)
+        return projections
+
+    def evaluate(
+        self,
+        swaps: Optional[Dict[int, Dict]] = None,
+        ip: Optional[float] = None,
+        park: Optional[str] = None,
+        markets: Optional[List[str]] = None
+    ) -> Dict[str, float]:
+        """
+        Projections per market with batters swapped in ({batting-order slot: batter
+        dict}), an innings expectation and/or a park (team abbreviation whose park
+        strikeout factor applies). With no park, strikeouts are the raw model output.
+        """
+        return self._project(self._swapped(swaps), ip, park, markets).iloc[0].to_dict()
+
+    def evaluate_candidates(
+        self,
+        slot: int,
+        batters: List[Dict],
+        ip: Optional[float] = None,
+        park: Optional[str] = None,
+        markets: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Projections with each candidate batter in one batting-order slot, one row per
+        candidate (indexed by MLBAM id or name), from a single delta per candidate.
+        """
+        new = slot_aggregates(self.batter_terms(batters), self.weights[slot - 1])
+        projections = self._project(self.aggregates + new - self.slots[slot - 1], ip, park, markets)
+        projections.index = [_batter_key(batter) for batter in batters]
+        return projections
+
+    def evaluate_many(
+        self,
+        lineups: List[List[Dict]],
+        ip: Optional[Union[float, np.ndarray]] = None,
+        park: Optional[str] = None,
+        markets: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Projections for many hypothetical full lineups at once, one row per lineup,
+        with the base lineup's slot weights.
+        """
+        if any(len(lineup) != len(self.lineup) for lineup in lineups):
+            raise ValueError(f"Every lineup needs {len(self.lineup)} batters")
+        terms = self.batter_terms([batter for lineup in lineups for batter in lineup])
+        terms = terms.reshape(len(lineups), len(self.lineup), len(TERM_COLUMNS))
+        return self._project(slot_aggregates(terms, self.weights).sum(axis=1), ip, park, markets)
+
+    def apply(self, swaps: Dict[int, Dict]) -> 'LineupScenario':
+        """
+        A new scenario whose base lineup has the swaps made, sharing this one's
+        memoized batter terms.
+        """
+        scenario = copy.copy(self)
+        scenario.lineup = list(self.lineup)
+        for slot, batter in swaps.items():
+            scenario.lineup[slot - 1] = batter
+        scenario.terms = self.terms.copy()
+        scenario.terms[[slot - 1 for slot in swaps]] = self.batter_terms(list(swaps.values()))
+        scenario._set_slots()
+        return scenario
@@ -0,0 +1,298 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pybaseball import statcast
+
+from utils.data_loader import cache_path, current_run, pin_local_frame
+
+# Statcast pitch_type codes grouped into the pitch names used by the pitch-mix features
+PITCH_GROUPS = {
+    'FF': 'Fastball', 'FA': 'Fastball',
+    'SI': 'Sinker', 'FT': 'Sinker',
+    'FC': 'Cutter',
+    'SL': 'Slider', 'ST': 'Slider', 'SV': 'Slider',
+    'CH': 'Changeup', 'FS': 'Changeup', 'FO': 'Changeup', 'SC': 'Changeup',
+    'CU': 'Curveball', 'KC': 'Curveball', 'CS': 'Curveball'
+}
+PITCH_GROUP_DTYPE = pd.CategoricalDtype(sorted(set(PITCH_GROUPS.values())))
+HAND_DTYPE = pd.CategoricalDtype(['L', 'R'])
+
+RAW_COLUMNS = [
+    'game_date', 'game_pk', 'batter', 'pitcher', 'pitch_type',
+    'description', 'zone', 'events', 'stand', 'p_throws'
+]
+COUNT_COLUMNS = ['pitches', 'swings', 'whiffs', 'out_zone', 'chases', 'called_strikes', 'pa', 'strikeouts']
+
+SWING_DESCRIPTIONS = {
+    'swinging_strike', 'swinging_strike_blocked', 'foul', 'foul_tip', 'foul_bunt',
+    'hit_into_play', 'missed_bunt', 'bunt_foul_tip'
+}
+WHIFF_DESCRIPTIONS = {'swinging_strike', 'swinging_strike_blocked', 'missed_bunt'}
+STRIKEOUT_EVENTS = {'strikeout', 'strikeout_double_play'}
+
+
+def compact_pitches(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce a raw statcast pull to the per-pitch flags the aggregates need,
+    stored in int32/int8/categorical columns (roughly 20 bytes per pitch).
+    """
+    description = raw['description'].astype(str)
+    swings = description.isin(SWING_DESCRIPTIONS)
+    out_zone = raw['zone'].fillna(0) >= 11
+
+    return pd.DataFrame({
+        'game_date': pd.to_datetime(raw['game_date']).dt.strftime('%Y%m%d').astype('int32'),
+        'game_pk': raw['game_pk'].astype('int32'),
+        'batter': raw['batter'].astype('int32'),
+        'pitcher': raw['pitcher'].astype('int32'),
+        'pitch_group': raw['pitch_type'].map(PITCH_GROUPS).astype(PITCH_GROUP_DTYPE),
+        'stand': raw['stand'].astype(HAND_DTYPE),
+        'p_throws': raw['p_throws'].astype(HAND_DTYPE),
+        'pitches': np.ones(len(raw), dtype='int8'),
+        'swings': swings.astype('int8'),
+        'whiffs': description.isin(WHIFF_DESCRIPTIONS).astype('int8'),
+        'out_zone': out_zone.astype('int8'),
+        'chases': (swings & out_zone).astype('int8'),
+        'called_strikes': (description == 'called_strike').astype('int8'),
+        'pa': raw['events'].notna().astype('int8'),
+        'strikeouts': raw['events'].isin(STRIKEOUT_EVENTS).astype('int8')
+    })
+
+
+def _season_path(season: int, name: str) -> str:
+    return cache_path('statcast', str(season), name)
+
+
+def fetch_pitch_chunk(start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    Load compacted pitch-level data for a date chunk, pulling from statcast only
+    when the chunk is not already cached locally.
+    """
+    path = cache_path('statcast', 'pitches', f"{start_date}_{end_date}.parquet")
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    print(f"Pulling statcast pitches for {start_date} to {end_date}")
+    raw = statcast(start_dt=start_date, end_dt=end_date, verbose=False)
+    if raw is None or raw.empty:
+        pitches = compact_pitches(pd.DataFrame(columns=RAW_COLUMNS))
+    else:
+        pitches = compact_pitches(raw[RAW_COLUMNS])
+
+    # Days still in progress are not cached so the next pull picks up the rest
+    if end_date < datetime.now().strftime('%Y-%m-%d'):
+        pitches.to_parquet(path, index=False)
+    return pitches
+
+
+def week_chunks(start_date: str, end_date: str) -> List[Tuple[str, str]]:
+    """
+    Monday-to-Sunday chunks covering [start_date, end_date], cut off at yesterday.
+    Chunks don't depend on the requested range, so every caller reads the same
+    cached chunk files.
+    """
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    start -= timedelta(days=start.weekday())
+    chunks = []
+    while start.strftime('%Y-%m-%d') <= min(end_date, yesterday):
+        chunk_end = min((start + timedelta(days=6)).strftime('%Y-%m-%d'), yesterday)
+        chunks.append((start.strftime('%Y-%m-%d'), chunk_end))
+        start += timedelta(days=7)
+    return chunks
+
+
+def chunk_dates(chunk: Tuple[str, str], start_date: str, end_date: str) -> List[str]:
+    """
+    The days of a chunk that fall inside [start_date, end_date].
+    """
+    start = datetime.strptime(max(chunk[0], start_date), '%Y-%m-%d')
+    end = datetime.strptime(min(chunk[1], end_date), '%Y-%m-%d')
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+
+
+def aggregate_pitches(pitches: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    grouped = pitches.groupby(keys, observed=True)[COUNT_COLUMNS].sum()
+    return grouped.astype('int32')
+
+
+def merge_counts(existing: Optional[pd.DataFrame], new: pd.DataFrame) -> pd.DataFrame:
+    if existing is None or existing.empty:
+        return new
+    combined = pd.concat([existing, new])
+    return combined.groupby(level=list(range(combined.index.nlevels)), observed=True).sum().astype('int32')
+
+
+# Aggregates the original list-format ledger (a flat list of dates) covered
+LEGACY_AGGREGATES = ['batter_pitch', 'pitcher_pitch']
+
+# Aggregate tables maintained by ingestion: name -> groupby keys
+AGGREGATES = {
+    'batter_pitch': ['batter', 'pitch_group'],
+    'pitcher_pitch': ['pitcher', 'pitch_group'],
+    'batter_hand': ['batter', 'p_throws'],
+    'pitcher_hand': ['pitcher', 'stand'],
+    'pitcher_batter': ['pitcher', 'batter']
+}
+
+
+def _load_ingested(season: int) -> Dict[str, set]:
+    """
+    Dates already folded into each aggregate, so a newly added aggregate
+    backfills on the next ingestion without double counting the others.
+    """
+    path = _season_path(season, 'ingested.json')
+    ingested = {name: set() for name in AGGREGATES}
+    if os.path.exists(path):
+        with open(path) as f:
+            ledger = json.load(f)
+        legacy = isinstance(ledger, list)
+        if legacy:
+            # Older ledgers are one date list shared by the per-pitch-type tables
+            ledger = {name: ledger for name in LEGACY_AGGREGATES}
+        for name, dates in ledger.items():
+            ingested[name] = set(dates)
+        if legacy:
+            _save_ingested(season, ingested)
+    return ingested
+
+
+def _save_ingested(season: int, ingested: Dict[str, set]) -> None:
+    with open(_season_path(season, 'ingested.json'), 'w') as f:
+        json.dump({name: sorted(dates) for name, dates in ingested.items()}, f)
+
+
+def _aggregate_key(season: int, name: str) -> str:
+    return f"statcast:{name}:{season}"
+
+
+def has_aggregates(season: int, name: str = 'batter_pitch') -> bool:
+    run = current_run()
+    if _aggregate_key(season, name) in run.manifest:
+        return True
+    return run.mode == 'live' and os.path.exists(_season_path(season, f"{name}.parquet"))
+
+
+def _read_aggregate(season: int, name: str) -> Optional[pd.DataFrame]:
+    # The live table ingestion folds new days into; readers go through aggregate_snapshot
+    path = _season_path(season, f"{name}.parquet")
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+_aggregates: Dict[str, pd.DataFrame] = {}
+
+
+def aggregate_snapshot(season: int, name: str) -> Optional[Tuple[str, pd.DataFrame]]:
+    """
+    (snapshot_id, counts) for an aggregate as pinned to the current run, so a replay
+    reads the counts the original run saw rather than whatever has been ingested
+    since. None when the aggregate hasn't been ingested.
+    """
+    pinned = pin_local_frame(
+        _aggregate_key(season, name), _season_path(season, f"{name}.parquet"),
+        lambda path: pd.read_parquet(path).reset_index()
+    )
+    if pinned is None:
+        return None
+    snapshot_id, counts = pinned
+    if snapshot_id not in _aggregates:
+        _aggregates[snapshot_id] = counts.set_index(AGGREGATES[name])
+    return snapshot_id, _aggregates[snapshot_id]
+
+
+def load_aggregate(season: int, name: str) -> Optional[pd.DataFrame]:
+    snapshot = aggregate_snapshot(season, name)
+    return None if snapshot is None else snapshot[1]
+
+
+def ingest_range(start_date: str, end_date: str) -> None:
+    """
+    Fold statcast pitches for [start_date, end_date] into the season aggregate tables.
+
+    Chunks are processed one at a time and only summed counts are kept, so memory
+    stays bounded by a single chunk regardless of how much of the season is ingested.
+    Dates already folded in are skipped, which makes repeated daily calls incremental.
+    """
+    season = int(start_date[:4])
+    ingested = _load_ingested(season)
+    tables = {name: _read_aggregate(season, name) for name in AGGREGATES}
+
+    for chunk in week_chunks(start_date, end_date):
+        dates = [d for d in chunk_dates(chunk, start_date, end_date) if any(d not in ingested[name] for name in AGGREGATES)]
+        if not dates:
+            continue
+
+        pitches = fetch_pitch_chunk(*chunk)
+        pitches = pitches[pitches['game_date'].isin([int(d.replace('-', '')) for d in dates])]
+        for name, keys in AGGREGATES.items():
+            new_dates = [d for d in dates if d not in ingested[name]]
+            if not new_dates:
+                continue
+            date_ints = [int(d.replace('-', '')) for d in new_dates]
+            new_pitches = pitches[pitches['game_date'].isin(date_ints)]
+            tables[name] = merge_counts(tables[name], aggregate_pitches(new_pitches, keys))
+            tables[name].to_parquet(_season_path(season, f"{name}.parquet"))
+            ingested[name].update(new_dates)
+
+        _save_ingested(season, ingested)
+        print(f"Ingested {len(pitches)} pitches for {dates[0]} to {dates[-1]}")
+
+
+def update_daily(season: Optional[int] = None) -> None:
+    """
+    Append every completed day since the last ingestion up to yesterday.
+    """
+    if season is None:
+        season = datetime.now().year
+    ingested = _load_ingested(season)
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    # Start from the most behind aggregate so newly added tables backfill
+    start = min((max(dates) if dates else f"{season}-03-01") for dates in ingested.values())
+    end = min(yesterday, f"{season}-11-30")
+    if start <= end:
+        ingest_range(start, end)
+
+
+def with_rates(counts: pd.DataFrame) -> pd.DataFrame:
+    rates = counts.copy()
+    pitches = counts['pitches'].replace(0, np.nan)
+    swings = counts['swings'].replace(0, np.nan)
+    rates['swstr'] = (counts['whiffs'] / pitches).astype('float32')
+    rates['whiff_rate'] = (counts['whiffs'] / swings).astype('float32')
+    rates['contact'] = (1 - counts['whiffs'] / swings).astype('float32')
+    rates['chase_rate'] = (counts['chases'] / counts['out_zone'].replace(0, np.nan)).astype('float32')
+    rates['called_strike_rate'] = (counts['called_strikes'] / pitches).astype('float32')
+    return rates
+
+
+_pitch_rate_index: Dict[Tuple[int, str], Tuple[Optional[str], Dict[Tuple[int, str], Dict]]] = {}
+
+
+def get_pitch_type_rates(mlbam_id: int, season: int, role: str = 'batter') -> Dict[str, Dict]:
+    """
+    Per-pitch-type whiff/chase/called-strike rates for a batter or pitcher.
+
+    Returns {pitch_name: {'pitches', 'swings', 'swstr', 'contact', ...}} or {} when
+    the player has no ingested pitches.
+    """
+    key = (season, role)
+    snapshot = aggregate_snapshot(season, f"{role}_pitch")
+    snapshot_id = snapshot[0] if snapshot is not None else None
+    if key not in _pitch_rate_index or _pitch_rate_index[key][0] != snapshot_id:
+        index = {}
+        if snapshot is not None:
+            for (player_id, pitch_group), row in with_rates(snapshot[1]).iterrows():
+                index[(int(player_id), str(pitch_group))] = row.to_dict()
+        _pitch_rate_index[key] = (snapshot_id, index)
+
+    index = _pitch_rate_index[key][1]
+    return {
+        pitch_group: index[(int(mlbam_id), pitch_group)]
+        for pitch_group in PITCH_GROUP_DTYPE.categories
+        if (int(mlbam_id), pitch_group) in index
+    }
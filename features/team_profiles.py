@@ -0,0 +1,186 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.normalization import get_normalization
+from features.platoon import load_split_tables, split_tables_version
+from utils.data_loader import cache_path, load_stats_snapshot
+from utils.lineup_archive import archive_version, date_to_int, get_archive
+from utils.player_registry import mlbam_to_fangraphs, registry_snapshot
+
+# Typical lineups are built from each team's most recent games before the slate date
+PROFILE_WINDOW_GAMES = 14
+PROFILE_LOOKBACK_DAYS = 30
+LINEUP_SLOTS = 9
+
+
+def typical_lineups(lineups: pd.DataFrame, as_of: int, window_games: int = PROFILE_WINDOW_GAMES) -> pd.DataFrame:
+    """
+    Most common starter per batting slot over each team's last window_games games
+    before as_of (yyyymmdd). A player fills at most one slot: slots are assigned
+    greedily by how often the player started there.
+
+    Returns one row per (team, slot) with mlbam_id and starts.
+    """
+    recent = lineups[lineups['date'] < as_of]
+    game_order = recent[['team', 'date', 'game_pk']].drop_duplicates().sort_values(['team', 'date', 'game_pk'])
+    last_games = game_order.groupby('team', observed=True).tail(window_games)
+    recent = recent.merge(last_games, on=['team', 'date', 'game_pk'])
+
+    counts = (
+        recent.groupby(['team', 'slot', 'mlbam_id'], observed=True).size().rename('starts').reset_index()
+        .sort_values(['team', 'starts', 'slot'], ascending=[True, False, True])
+    )
+
+    rows = []
+    for team, group in counts.groupby('team', observed=True):
+        filled, used = set(), set()
+        for slot, mlbam_id, starts in group[['slot', 'mlbam_id', 'starts']].itertuples(index=False):
+            if slot in filled or mlbam_id in used:
+                continue
+            filled.add(slot)
+            used.add(mlbam_id)
+            rows.append((str(team), int(slot), int(mlbam_id), int(starts)))
+            if len(filled) == LINEUP_SLOTS:
+                break
+
+    frame = pd.DataFrame(rows, columns=['team', 'slot', 'mlbam_id', 'starts'])
+    return frame.sort_values(['team', 'slot']).reset_index(drop=True).astype(
+        {'slot': 'int8', 'mlbam_id': 'int32', 'starts': 'int16'}
+    )
+
+
+def _batter_k_by_hand(fg_ids: np.ndarray, season: int, fallback_k: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    Shrunk K% vs LHP and RHP for each batter; the season K% from the batting snapshot
+    stands in when the statcast split tables aren't available.
+    """
+    try:
+        batter_splits, _, league_k = load_split_tables(season)
+    except ValueError:
+        batter_splits, league_k = None, float(fallback_k.mean())
+
+    base = fallback_k.reindex(fg_ids).fillna(league_k).to_numpy(dtype=np.float64)
+    result = {}
+    for hand in ('L', 'R'):
+        if batter_splits is None:
+            result[hand] = base
+            continue
+        index = pd.MultiIndex.from_arrays([fg_ids, np.full(len(fg_ids), hand)])
+        split = batter_splits['k_pct'].reindex(index).to_numpy(dtype=np.float64)
+        result[hand] = np.where(np.isnan(split), base, split)
+    return result
+
+
+class TeamProfiles:
+    """
+    Per-team projected lineup by slot plus team-level K% vs LHP/RHP and the mean
+    hitter susceptibility z of that lineup.
+    """
+
+    def __init__(self, slots: pd.DataFrame):
+        self.slots = slots
+        self._lineups: Dict[str, List[Dict]] = {}
+        self._summary: Dict[str, Dict] = {}
+        for team, group in slots.groupby('team', sort=False):
+            self._lineups[team] = [
+                {'name': name, 'team': team, 'mlbam_id': mlbam_id, 'projected': True}
+                for name, mlbam_id in zip(group['name'].tolist(), group['mlbam_id'].tolist())
+            ]
+            first = group.iloc[0]
+            self._summary[team] = {
+                'k_pct_vs_L': float(first['team_k_pct_vs_L']),
+                'k_pct_vs_R': float(first['team_k_pct_vs_R']),
+                'susceptibility_z': float(first['team_susceptibility_z'])
+            }
+
+    def projected_lineup(self, team_abbr: str) -> List[Dict]:
+        return [dict(batter) for batter in self._lineups.get(team_abbr, [])]
+
+    def summary(self, team_abbr: str) -> Optional[Dict]:
+        return self._summary.get(team_abbr)
+
+
+def profile_inputs(season: int) -> Optional[str]:
+    """
+    Version of everything a season's profiles are built from as pinned to the current
+    run: the lineup archive, batting snapshot, registry and split tables.
+    """
+    archive = archive_version(season)
+    if archive is None:
+        return None
+    inputs = [*archive, load_stats_snapshot('batting', season)[0], registry_snapshot()[0], split_tables_version(season)]
+    return hashlib.sha256(':'.join(inputs).encode()).hexdigest()[:12]
+
+
+def build_team_profiles(season: int, date_str: str) -> Optional[TeamProfiles]:
+    """
+    Precompute every team's profile as of date_str from the lineup archive and the
+    season's batting snapshot. Persisted per (date, profile inputs).
+    """
+    inputs = profile_inputs(season)
+    archive = get_archive(season)
+    if inputs is None or archive is None or archive.lineups.empty:
+        return None
+
+    hitters = load_stats_snapshot('batting', season)[1]
+    path = cache_path('teams', str(season), f"profiles_{date_str}_{inputs}.parquet")
+    if os.path.exists(path):
+        return TeamProfiles(pd.read_parquet(path))
+
+    as_of = date_to_int(date_str)
+    cutoff = date_to_int((datetime.strptime(date_str, '%Y-%m-%d') - timedelta(days=PROFILE_LOOKBACK_DAYS)).strftime('%Y-%m-%d'))
+    lineups = archive.lineups[archive.lineups['date'] >= cutoff]
+    slots = typical_lineups(lineups, as_of)
+    if slots.empty:
+        return None
+
+    slots['name'] = [archive.names.get(mlbam_id, '') for mlbam_id in slots['mlbam_id'].tolist()]
+    slots['IDfg'] = [mlbam_to_fangraphs(mlbam_id) or -1 for mlbam_id in slots['mlbam_id'].tolist()]
+    slots['IDfg'] = slots['IDfg'].astype('int32')
+
+    fg_ids = slots['IDfg'].to_numpy()
+    season_k = (hitters['SO'] / hitters['PA'].replace(0, np.nan)).set_axis(hitters['IDfg']).groupby(level=0).first()
+    k_by_hand = _batter_k_by_hand(fg_ids, season, season_k)
+    slots['k_pct_vs_L'] = k_by_hand['L'].astype('float32')
+    slots['k_pct_vs_R'] = k_by_hand['R'].astype('float32')
+
+    norms = get_normalization(season)
+    susceptibility = np.array([norms.hitter_susceptibility(fg_id) for fg_id in fg_ids.tolist()], dtype=np.float64)
+    slots['susceptibility_z'] = np.nan_to_num(susceptibility, nan=0.0).astype('float32')
+
+    team_means = slots.groupby('team')[['k_pct_vs_L', 'k_pct_vs_R', 'susceptibility_z']].transform('mean')
+    slots['team_k_pct_vs_L'] = team_means['k_pct_vs_L']
+    slots['team_k_pct_vs_R'] = team_means['k_pct_vs_R']
+    slots['team_susceptibility_z'] = team_means['susceptibility_z']
+
+    slots.to_parquet(path, index=False)
+    return TeamProfiles(slots)
+
+
+_profiles: Dict[Tuple[int, str, Optional[str]], Optional[TeamProfiles]] = {}
+
+
+def get_team_profiles(season: int, date_str: str) -> Optional[TeamProfiles]:
+    key = (season, date_str, profile_inputs(season))
+    if key not in _profiles:
+        _profiles[key] = build_team_profiles(season, date_str)
+    return _profiles[key]
+
+
+def get_projected_lineup(team_abbr: str, date_str: str) -> List[Dict]:
+    """
+    Provisional lineup (batter dicts flagged 'projected') for a team whose real
+    lineup hasn't posted. Empty when no archive history is available.
+    """
+    try:
+        profiles = get_team_profiles(int(date_str[:4]), date_str)
+    except Exception as e:
+        print(f"Error building team profiles for {date_str}: {str(e)}")
+        return []
+    if profiles is None:
+        return []
+    return profiles.projected_lineup(team_abbr)
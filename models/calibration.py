@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+
+from utils.data_loader import cache_path, pin_local_json
+
+PROJECTION_SD = 1.5
+# Book lines are grouped so each bucket has enough history to fit a mapping
+LINE_BUCKETS = [0.0, 4.0, 5.0, 6.0, 20.0]
+CALIBRATION_NAME = 'confidence_calibration.json'
+
+
+def raw_over_probability(projected_k: np.ndarray, book_line: np.ndarray, sd: float = PROJECTION_SD) -> np.ndarray:
+    """
+    Uncalibrated P(over) implied by the projection: norm.cdf of the edge in SDs.
+    """
+    return norm.cdf((np.asarray(projected_k, dtype=float) - np.asarray(book_line, dtype=float)) / sd)
+
+
+def line_bucket(book_line: np.ndarray, edges: Sequence[float] = LINE_BUCKETS) -> np.ndarray:
+    return np.clip(np.digitize(book_line, edges[1:-1]), 0, len(edges) - 2)
+
+
+class ConfidenceCalibrator:
+    """
+    Per-line-bucket mapping from raw P(over) to calibrated P(over).
+
+    Isotonic mappings are stored as their breakpoints and applied with np.interp;
+    Platt mappings are stored as (slope, intercept) on the raw probability's logit.
+    Both fit in a few hundred bytes of JSON. The bucket edges are saved with the
+    mappings, so a file keeps working after LINE_BUCKETS changes.
+    """
+
+    def __init__(
+        self,
+        method: str = 'isotonic',
+        buckets: Optional[Dict[int, Dict]] = None,
+        line_buckets: Optional[Sequence[float]] = None
+    ):
+        if method not in ('isotonic', 'platt'):
+            raise ValueError(f"Unsupported calibration method: {method}")
+        self.method = method
+        self.buckets = buckets or {}
+        self.line_buckets = list(line_buckets or LINE_BUCKETS)
+
+    def fit(self, projected_k: np.ndarray, book_line: np.ndarray, actual_k: np.ndarray, min_samples: int = 50) -> 'ConfidenceCalibrator':
+        book_line = np.asarray(book_line, dtype=float)
+        raw = raw_over_probability(projected_k, book_line)
+        went_over = (np.asarray(actual_k, dtype=float) > book_line).astype(int)
+        self.line_buckets = list(LINE_BUCKETS)
+        buckets = line_bucket(book_line, self.line_buckets)
+
+        self.buckets = {}
+        for bucket in np.unique(buckets):
+            mask = buckets == bucket
+            if mask.sum() < min_samples or went_over[mask].min() == went_over[mask].max():
+                print(f"Skipping line bucket {bucket}: not enough history ({mask.sum()} bets)")
+                continue
+            if self.method == 'isotonic':
+                model = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(raw[mask], went_over[mask])
+                self.buckets[int(bucket)] = {
+                    'x': model.X_thresholds_.round(6).tolist(),
+                    'y': model.y_thresholds_.round(6).tolist()
+                }
+            else:
+                model = LogisticRegression().fit(_logit(raw[mask])[:, None], went_over[mask])
+                self.buckets[int(bucket)] = {
+                    'slope': float(model.coef_[0, 0]),
+                    'intercept': float(model.intercept_[0])
+                }
+        return self
+
+    def predict_over(self, projected_k: np.ndarray, book_line: np.ndarray) -> np.ndarray:
+        """
+        Calibrated P(over) for a whole slate; buckets without a fitted mapping keep the raw value.
+        """
+        book_line = np.asarray(book_line, dtype=float)
+        raw = raw_over_probability(projected_k, book_line)
+        buckets = line_bucket(book_line, self.line_buckets)
+        calibrated = raw.copy()
+        for bucket, mapping in self.buckets.items():
+            mask = buckets == bucket
+            if not mask.any():
+                continue
+            if self.method == 'isotonic':
+                calibrated[mask] = np.interp(raw[mask], mapping['x'], mapping['y'])
+            else:
+                calibrated[mask] = 1 / (1 + np.exp(-(mapping['slope'] * _logit(raw[mask]) + mapping['intercept'])))
+        return calibrated
+
+    def confidence_pct(self, projected_k: np.ndarray, book_line: np.ndarray) -> np.ndarray:
+        """
+        Probability (in %) that the recommended side wins, matching run_daily_analysis.
+        """
+        p_over = self.predict_over(projected_k, book_line)
+        side = np.where(np.asarray(projected_k) > np.asarray(book_line), p_over, 1 - p_over)
+        return np.round(100 * side, 1)
+
+    def save(self, path: Optional[str] = None) -> str:
+        path = path or cache_path('models', CALIBRATION_NAME)
+        with open(path, 'w') as f:
+            json.dump({'method': self.method, 'line_buckets': self.line_buckets, 'buckets': self.buckets}, f)
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional['ConfidenceCalibrator']:
+        path = path or cache_path('models', CALIBRATION_NAME)
+        # Pinned to the run like its other inputs, so a replay applies the calibration it used
+        data = pin_local_json(f"calibrator:{os.path.basename(path)}", path)
+        if data is None:
+            return None
+        if 'line_buckets' not in data:
+            raise ValueError(f"Calibration file {path} has no line_buckets; refit it")
+        return cls(
+            data['method'],
+            {int(bucket): mapping for bucket, mapping in data['buckets'].items()},
+            data['line_buckets']
+        )
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return np.log(p / (1 - p))
+
+
+def reliability_table(p_over: np.ndarray, went_over: np.ndarray, n_bins: int = 10) -> pd.DataFrame:
+    bins = np.clip((np.asarray(p_over) * n_bins).astype(int), 0, n_bins - 1)
+    frame = pd.DataFrame({'bin': bins, 'predicted': p_over, 'observed': went_over})
+    table = frame.groupby('bin').agg(count=('observed', 'size'), predicted=('predicted', 'mean'), observed=('observed', 'mean'))
+    table.index = [f"{b / n_bins:.1f}-{(b + 1) / n_bins:.1f}" for b in table.index]
+    return table
+
+
+def brier_score(p_over: np.ndarray, went_over: np.ndarray) -> float:
+    return float(np.mean((np.asarray(p_over) - np.asarray(went_over)) ** 2))
+
+
+def evaluate(history: pd.DataFrame, calibrator: ConfidenceCalibrator, n_bins: int = 10) -> Dict:
+    """
+    Brier scores and reliability tables for raw vs calibrated probabilities.
+    """
+    went_over = (history['actual_k'] > history['book_line']).astype(int).to_numpy()
+    raw = raw_over_probability(history['projected_k'], history['book_line'])
+    calibrated = calibrator.predict_over(history['projected_k'], history['book_line'])
+    return {
+        'brier_raw': brier_score(raw, went_over),
+        'brier_calibrated': brier_score(calibrated, went_over),
+        'reliability_raw': reliability_table(raw, went_over, n_bins),
+        'reliability_calibrated': reliability_table(calibrated, went_over, n_bins)
+    }
+
+
+def print_evaluation(report: Dict) -> None:
+    print("\nCalibration Report")
+    print("=" * 80)
+    print(f"Brier score (raw):        {report['brier_raw']:.4f}")
+    print(f"Brier score (calibrated): {report['brier_calibrated']:.4f}")
+    for name in ('raw', 'calibrated'):
+        print(f"\nReliability ({name}):")
+        table = report[f'reliability_{name}']
+        for label, row in table.iterrows():
+            bar = '#' * int(round(row['observed'] * 40))
+            print(f"{label}  n={int(row['count']):5d}  pred={row['predicted']:.3f}  obs={row['observed']:.3f}  {bar}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and evaluate confidence calibration")
+    parser.add_argument('command', choices=['fit', 'evaluate'])
+    parser.add_argument('--history', required=True, help="Parquet/CSV of past projections with projected_k, book_line, actual_k")
+    parser.add_argument('--method', choices=['isotonic', 'platt'], default='isotonic')
+    args = parser.parse_args()
+
+    if args.history.endswith('.csv'):
+        history = pd.read_csv(args.history)
+    else:
+        history = pd.read_parquet(args.history)
+    history = history.dropna(subset=['projected_k', 'book_line', 'actual_k'])
+
+    if args.command == 'fit':
+        calibrator = ConfidenceCalibrator(args.method).fit(history['projected_k'], history['book_line'], history['actual_k'])
+        print(f"Saved calibration to {calibrator.save()}")
+    else:
+        calibrator = ConfidenceCalibrator.load()
+        if calibrator is None:
+            raise ValueError("No fitted calibration found; run the fit command first")
+    print_evaluation(evaluate(history, calibrator))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from models.train_model import FEATURE_COLUMNS, MODEL_NAME
+from utils.data_loader import cache_path
+
+_models: Dict[Tuple[str, float], Tuple[str, xgb.Booster]] = {}
+
+
+def load_explainer(model_path: Optional[str] = None) -> Optional[Tuple[str, xgb.Booster]]:
+    """
+    (model id, booster) for the saved strikeout model, or None when none is trained.
+    The id is a hash of the model file, so attributions from a retrained model never
+    come out of the cache.
+    """
+    model_path = model_path or cache_path('models', MODEL_NAME)
+    if not os.path.exists(model_path):
+        return None
+    key = (model_path, os.path.getmtime(model_path))
+    if key not in _models:
+        with open(model_path, 'rb') as f:
+            model_id = hashlib.sha256(f.read()).hexdigest()[:20]
+        booster = xgb.Booster(model_file=model_path)
+        booster.set_param({'nthread': os.cpu_count() or 1})
+        _models[key] = (model_id, booster)
+    return _models[key]
+
+
+def inputs_hash(model_id: str, row: np.ndarray) -> str:
+    return hashlib.sha256(model_id.encode() + np.ascontiguousarray(row, dtype=np.float32).tobytes()).hexdigest()[:20]
+
+
+def _cached_path(key: str) -> str:
+    return cache_path('explanations', f"{key}.json")
+
+
+def explain_slate(features: pd.DataFrame, model_path: Optional[str] = None) -> Dict:
+    """
+    TreeSHAP attributions for every row of a slate feature matrix (indexed by MLBAM id),
+    with the XGBoost model's own prediction they explain.
+
+    Rows whose (model, inputs) hash was explained before are read from
+    cache/explanations/; the rest go through one batched, multithreaded
+    pred_contribs call. Contributions are in the booster's margin space: with 'bias'
+    they sum to the raw margin, which for the count:poisson objective is
+    log(model_k). model_k is the booster's strikeout prediction, not the rule-based
+    projected_k the slate reports.
+
+    Returns:
+        Dict[int, Dict]: {'model_k': float, 'contributions': {feature: value, 'bias': value}}
+        per MLBAM id; empty when no model is trained.
+    """
+    explainer = load_explainer(model_path)
+    if explainer is None or features.empty:
+        return {}
+    model_id, booster = explainer
+
+    matrix = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    keys = [inputs_hash(model_id, row) for row in matrix]
+    explanations = {}
+    missing = []
+    for row, (mlbam_id, key) in enumerate(zip(features.index, keys)):
+        cached = None
+        if os.path.exists(_cached_path(key)):
+            with open(_cached_path(key)) as f:
+                cached = json.load(f)
+        if cached and 'contributions' in cached:
+            explanations[mlbam_id] = cached
+        else:
+            missing.append(row)
+
+    if missing:
+        data = xgb.DMatrix(matrix[missing], feature_names=FEATURE_COLUMNS)
+        contributions = booster.predict(data, pred_contribs=True)
+        predictions = booster.predict(data)
+        for row, values, prediction in zip(missing, contributions, predictions):
+            explanation = {
+                'model_k': round(float(prediction), 6),
+                'contributions': dict(zip(FEATURE_COLUMNS + ['bias'], np.round(values.astype(np.float64), 6).tolist()))
+            }
+            with open(_cached_path(keys[row]), 'w') as f:
+                json.dump(explanation, f)
+            explanations[features.index[row]] = explanation
+    print(f"Explained {len(features)} projections ({len(missing)} computed, {len(features) - len(missing)} cached)")
+    return explanations
+
+
+def top_drivers(attribution: Dict[str, float], n: int = 3) -> str:
+    """
+    The n largest attributions by magnitude, for a one-line summary.
+    """
+    drivers = sorted(((name, value) for name, value in attribution.items() if name != 'bias'),
+                     key=lambda item: abs(item[1]), reverse=True)[:n]
+    return ', '.join(f"{name} {value:+.3f}" for name, value in drivers)
@@ -0,0 +1,365 @@
+import argparse
+import ctypes
+import json
+import os
+import subprocess
+import time
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from models.train_model import FEATURE_COLUMNS, MODEL_NAME
+from utils.data_loader import cache_path
+
+FLAT_NAME = 'strikeout_xgb.npz'
+COMPILED_NAME = 'strikeout_xgb.so'
+WALKER_NAME = 'tree_walker.so'
+SLATE_ROWS = 30
+
+
+class FlatForest:
+    """
+    An XGBoost booster flattened into numpy arrays over every node of every tree.
+
+    Every row walks every tree in lockstep, one gather step per tree level, so a
+    slate-sized batch is scored with a handful of vectorized gathers and no
+    per-tree Python. Node ids are global (tree offset included) and the two
+    children of node i sit at children[2 * i] (left) and children[2 * i + 1].
+    Comparisons are done in float32, as XGBoost does.
+    """
+
+    def __init__(self, roots: np.ndarray, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 default_right: np.ndarray, value: np.ndarray, base_margin: float, objective: str, depth: int):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.default_right = default_right
+        self.value = value
+        self.base_margin = base_margin
+        self.objective = objective
+        self.depth = depth
+
+    @classmethod
+    def from_booster(cls, booster: xgb.Booster) -> 'FlatForest':
+        model = json.loads(booster.save_raw('json'))['learner']
+        objective = model['objective']['name']
+        if objective not in ('count:poisson', 'reg:squarederror'):
+            raise ValueError(f"Unsupported objective for flat export: {objective}")
+        trees = model['gradient_booster']['model']['trees']
+        base_score = float(str(model['learner_model_param']['base_score']).strip('[]'))
+
+        roots, features, thresholds, children, default_right, values = [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree in trees:
+            left = np.asarray(tree['left_children'], dtype=np.int64)
+            right = np.asarray(tree['right_children'], dtype=np.int64)
+            is_leaf = left == -1
+            node_ids = np.arange(len(left))
+            # Leaves point at themselves, so extra steps past a shallow leaf are no-ops
+            pairs = np.column_stack([np.where(is_leaf, node_ids, left), np.where(is_leaf, node_ids, right)]) + offset
+            roots.append(offset)
+            children.append(pairs.ravel())
+            features.append(np.asarray(tree['split_indices'], dtype=np.int64))
+            thresholds.append(np.where(is_leaf, np.inf, tree['split_conditions']))
+            default_right.append(~np.asarray(tree['default_left'], dtype=bool))
+            values.append(np.where(is_leaf, tree['split_conditions'], 0.0))
+            offset += len(left)
+            depth = max(depth, _tree_depth(left, right))
+
+        base_margin = float(np.log(base_score)) if objective == 'count:poisson' else base_score
+        return cls(np.asarray(roots, dtype=np.int64), np.concatenate(features), np.concatenate(thresholds).astype(np.float32),
+                   np.concatenate(children), np.concatenate(default_right), np.concatenate(values).astype(np.float32),
+                   base_margin, objective, depth)
+
+    def save(self, path: str) -> None:
+        np.savez(path, roots=self.roots, feature=self.feature, threshold=self.threshold, children=self.children,
+                 default_right=self.default_right, value=self.value,
+                 meta=np.array(json.dumps({'base_margin': self.base_margin, 'objective': self.objective, 'depth': self.depth})))
+
+    @classmethod
+    def load(cls, path: str) -> 'FlatForest':
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(data['roots'], data['feature'], data['threshold'], data['children'], data['default_right'],
+                       data['value'], meta['base_margin'], meta['objective'], meta['depth'])
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        n_rows, n_features = features.shape
+        flat = features.ravel()
+        has_missing = np.isnan(flat).any()
+        row_base = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots)))
+        for _ in range(self.depth):
+            x = flat[row_base + self.feature[node]]
+            # NaN >= threshold is False, so missing values go left unless the node defaults right
+            go_right = x >= self.threshold[node]
+            if has_missing:
+                go_right |= np.isnan(x) & self.default_right[node]
+            node = self.children[2 * node + go_right]
+        margin = self.base_margin + self.value[node].sum(axis=1, dtype=np.float64)
+        return np.exp(margin) if self.objective == 'count:poisson' else margin
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level for child in (left[node], right[node]) if child != -1]
+        if not level:
+            return depth
+        depth += 1
+
+
+# Native walker over FlatForest arrays, built with the system C compiler when
+# treelite/tl2cgen aren't installed. A node is a leaf when it points at itself.
+_WALKER_SOURCE = r"""
+#include <math.h>
+#include <stdint.h>
+
+void predict_forest(const float *x, int64_t n_rows, int64_t n_features,
+                    const int64_t *roots, int64_t n_trees, const int64_t *feature,
+                    const float *threshold, const int64_t *children, const uint8_t *default_right,
+                    const float *value, double base_margin, int poisson, double *out) {
+    for (int64_t r = 0; r < n_rows; r++) {
+        const float *row = x + r * n_features;
+        double margin = base_margin;
+        for (int64_t t = 0; t < n_trees; t++) {
+            int64_t node = roots[t];
+            while (children[2 * node] != node) {
+                float v = row[feature[node]];
+                int right = isnan(v) ? default_right[node] : v >= threshold[node];
+                node = children[2 * node + right];
+            }
+            margin += value[node];
+        }
+        out[r] = poisson ? exp(margin) : margin;
+    }
+}
+"""
+
+
+def build_walker(out_dir: str, compiler: str = 'cc') -> str:
+    source_path = os.path.join(out_dir, WALKER_NAME.replace('.so', '.c'))
+    lib_path = os.path.join(out_dir, WALKER_NAME)
+    with open(source_path, 'w') as f:
+        f.write(_WALKER_SOURCE)
+    subprocess.run([compiler, '-O3', '-shared', '-fPIC', '-o', lib_path, source_path, '-lm'], check=True)
+    return lib_path
+
+
+class NativeForest:
+    """
+    FlatForest arrays scored by the compiled C walker: one pass per row, stopping at
+    each tree's actual leaf.
+    """
+
+    def __init__(self, forest: FlatForest, lib_path: str):
+        self.forest = forest
+        self._default_right = forest.default_right.astype(np.uint8)
+        self._predict = ctypes.CDLL(lib_path).predict_forest
+        pointer = lambda dtype: np.ctypeslib.ndpointer(dtype=dtype, flags='C_CONTIGUOUS')
+        self._predict.argtypes = [
+            pointer(np.float32), ctypes.c_int64, ctypes.c_int64, pointer(np.int64), ctypes.c_int64,
+            pointer(np.int64), pointer(np.float32), pointer(np.int64), pointer(np.uint8), pointer(np.float32),
+            ctypes.c_double, ctypes.c_int, pointer(np.float64)
+        ]
+        self._predict.restype = None
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        out = np.empty(len(features), dtype=np.float64)
+        forest = self.forest
+        self._predict(features, features.shape[0], features.shape[1], forest.roots, len(forest.roots),
+                      forest.feature, forest.threshold, forest.children, self._default_right, forest.value,
+                      forest.base_margin, int(forest.objective == 'count:poisson'), out)
+        return out
+
+
+class CompiledPredictor:
+    """
+    Native shared library compiled from the booster with treelite + tl2cgen.
+    """
+
+    def __init__(self, path: str):
+        import tl2cgen
+        self._tl2cgen = tl2cgen
+        self.predictor = tl2cgen.Predictor(path, nthread=1)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        matrix = self._tl2cgen.DMatrix(np.asarray(features, dtype=np.float32), dtype='float32')
+        return np.asarray(self.predictor.predict(matrix), dtype=np.float64).reshape(len(features))
+
+
+class BoosterPredictor:
+    def __init__(self, booster: xgb.Booster):
+        self.booster = booster
+        self.booster.set_param({'nthread': 1})
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        matrix = xgb.DMatrix(np.asarray(features, dtype=np.float32), feature_names=FEATURE_COLUMNS)
+        return self.booster.predict(matrix).astype(np.float64)
+
+
+def export_model(model_path: Optional[str] = None, out_dir: Optional[str] = None) -> Dict[str, str]:
+    """
+    Export a saved booster for fast scoring: always as a flat forest (plus the native
+    walker when a C compiler is available), and as a tl2cgen-compiled shared library
+    when treelite and tl2cgen are installed.
+    """
+    model_path = model_path or cache_path('models', MODEL_NAME)
+    out_dir = out_dir or os.path.dirname(model_path)
+    booster = xgb.Booster(model_file=model_path)
+
+    exported = {}
+    flat_path = os.path.join(out_dir, FLAT_NAME)
+    FlatForest.from_booster(booster).save(flat_path)
+    exported['flat'] = flat_path
+    print(f"Exported flat forest to {flat_path}")
+    try:
+        exported['native'] = build_walker(out_dir)
+        print(f"Built native tree walker at {exported['native']}")
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Could not build the native tree walker: {str(e)}")
+
+    try:
+        import treelite
+        import tl2cgen
+        compiled_path = os.path.join(out_dir, COMPILED_NAME)
+        tl2cgen.export_lib(treelite.frontend.load_xgboost_model(model_path), toolchain='gcc', libpath=compiled_path,
+                           params={'parallel_comp': 8}, nthread=os.cpu_count() or 1)
+        exported['compiled'] = compiled_path
+        print(f"Compiled native predictor to {compiled_path}")
+    except ImportError:
+        print("Native compilation requires additional packages:")
+        print("pip install treelite tl2cgen")
+    return exported
+
+
+def load_predictor(model_dir: Optional[str] = None, prefer: Optional[str] = None):
+    """
+    Fastest available predictor for the exported model: tl2cgen library, native
+    walker, numpy flat forest, then the XGBoost booster itself. prefer forces one
+    kind ('compiled', 'native', 'flat', 'booster').
+    """
+    model_dir = model_dir or os.path.dirname(cache_path('models', MODEL_NAME))
+    path = lambda name: os.path.join(model_dir, name)
+    loaders = {
+        'compiled': lambda: CompiledPredictor(path(COMPILED_NAME)),
+        'native': lambda: NativeForest(FlatForest.load(path(FLAT_NAME)), path(WALKER_NAME)),
+        'flat': lambda: FlatForest.load(path(FLAT_NAME)),
+        'booster': lambda: BoosterPredictor(xgb.Booster(model_file=path(MODEL_NAME)))
+    }
+    required = {
+        'compiled': [COMPILED_NAME], 'native': [FLAT_NAME, WALKER_NAME], 'flat': [FLAT_NAME], 'booster': [MODEL_NAME]
+    }
+    for kind in ([prefer] if prefer else list(loaders)):
+        if not all(os.path.exists(path(name)) for name in required[kind]):
+            continue
+        try:
+            return loaders[kind]()
+        except (ImportError, OSError) as e:
+            print(f"Could not load {kind} predictor: {str(e)}")
+    raise ValueError(f"No exported strikeout model found in {model_dir}")
+
+
+def predict_frame(predictor, frame: pd.DataFrame) -> np.ndarray:
+    return predictor.predict(frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+
+
+def sample_features(n_rows: int, seed: int = 0, missing_rate: float = 0.02) -> np.ndarray:
+    """
+    Synthetic feature rows in realistic ranges, with some missing values, for parity
+    checks and benchmarks when no historical frame is at hand.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {
+        'k_per_9': rng.uniform(5.0, 13.0, n_rows),
+        'estimated_ip': rng.uniform(3.0, 7.5, n_rows),
+        'lineup_z': rng.normal(0.0, 0.5, n_rows),
+        'k_z': rng.normal(0.0, 1.0, n_rows),
+        'pitch_mix_score': rng.normal(0.0, 0.3, n_rows),
+        'quality_score': rng.uniform(-1.0, 1.0, n_rows),
+        'platoon_factor': rng.uniform(0.9, 1.1, n_rows),
+        'pvb_factor': rng.uniform(0.9, 1.1, n_rows)
+    }
+    features = np.column_stack([columns[name] for name in FEATURE_COLUMNS]).astype(np.float32)
+    features[rng.random(features.shape) < missing_rate] = np.nan
+    return features
+
+
+def parity_check(predictor, booster: xgb.Booster, features: np.ndarray, tolerance: float = 1e-3) -> Dict[str, float]:
+    """
+    Compare a fast predictor against booster.predict on the same rows. Raises
+    AssertionError when any prediction differs by more than tolerance.
+    """
+    expected = BoosterPredictor(booster).predict(features)
+    actual = predictor.predict(features)
+    diff = np.abs(actual - expected)
+    result = {'rows': len(features), 'max_abs_diff': float(diff.max()), 'mean_abs_diff': float(diff.mean())}
+    if result['max_abs_diff'] > tolerance:
+        raise AssertionError(f"{type(predictor).__name__} disagrees with the booster: {result}")
+    return result
+
+
+def benchmark(predictors: Dict[str, object], features: np.ndarray, repeats: int = 200) -> pd.DataFrame:
+    """
+    Median latency per batch and per row for each predictor on the same batch.
+    """
+    results = []
+    for name, predictor in predictors.items():
+        predictor.predict(features)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            predictor.predict(features)
+            timings.append(time.perf_counter() - started)
+        batch_us = float(np.median(timings)) * 1e6
+        results.append({'predictor': name, 'rows': len(features), 'batch_us': round(batch_us, 1),
+                        'per_row_us': round(batch_us / len(features), 2)})
+    return pd.DataFrame(results)
+
+
+def available_predictors(model_dir: Optional[str] = None) -> Dict[str, object]:
+    predictors = {}
+    for kind in ('compiled', 'native', 'flat', 'booster'):
+        try:
+            predictors[kind] = load_predictor(model_dir, prefer=kind)
+        except ValueError:
+            continue
+    return predictors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, verify and benchmark the XGBoost strikeout model")
+    parser.add_argument('command', choices=['export', 'check', 'bench'])
+    parser.add_argument('--model', default=None, help="Saved booster (default: cache/models/strikeout_xgb.json)")
+    parser.add_argument('--data', default=None, help="Parquet of feature rows to check/benchmark on (default: synthetic)")
+    parser.add_argument('--rows', type=int, default=SLATE_ROWS, help="Benchmark batch size")
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    model_path = args.model or cache_path('models', MODEL_NAME)
+    model_dir = os.path.dirname(model_path)
+    if args.command == 'export':
+        export_model(model_path)
+        return
+
+    if args.data:
+        features = pd.read_parquet(args.data)[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    else:
+        features = sample_features(max(args.rows, 1000))
+    predictors = available_predictors(model_dir)
+
+    if args.command == 'check':
+        booster = xgb.Booster(model_file=model_path)
+        for name, predictor in predictors.items():
+            if name != 'booster':
+                print(f"{name}: {parity_check(predictor, booster, features)}")
+    else:
+        print(benchmark(predictors, features[:args.rows], args.repeats).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from features.rule_based import PROJECTION_FEATURES, PROJECTION_FUDGE, MATCHUP_BLEND, combine_projection
+from utils.data_loader import cache_path
+
+# Training rows are one per historical start: the projection features at first pitch
+# plus the strikeouts actually recorded.
+FEATURE_COLUMNS = PROJECTION_FEATURES + ['platoon_factor', 'pvb_factor']
+# Multiplicative adjustments that older training frames may not carry (neutral = 1.0)
+OPTIONAL_FACTORS = ['platoon_factor', 'pvb_factor']
+TARGET_COLUMN = 'actual_k'
+DATE_COLUMN = 'game_date'
+
+MODEL_NAME = 'strikeout_xgb.json'
+BEST_PARAMS_NAME = 'best_params.json'
+
+
+def load_training_frame(path: str) -> pd.DataFrame:
+    frame = pd.read_parquet(path)
+    missing = [c for c in FEATURE_COLUMNS + [TARGET_COLUMN, DATE_COLUMN] if c not in frame.columns]
+    for column in OPTIONAL_FACTORS:
+        if column in missing:
+            frame[column] = 1.0
+            missing.remove(column)
+    if missing:
+        raise ValueError(f"Training frame is missing columns: {missing}")
+    return frame.sort_values(DATE_COLUMN).reset_index(drop=True)
+
+
+def walk_forward_folds(dates: np.ndarray, n_folds: int = 5, min_train_fraction: float = 0.4) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Expanding-window folds over sorted unique dates: each fold trains on every date
+    before its test block, so no future information leaks into training.
+    """
+    unique_dates = np.unique(dates)
+    first_test = int(len(unique_dates) * min_train_fraction)
+    blocks = np.array_split(unique_dates[first_test:], n_folds)
+
+    folds = []
+    for block in blocks:
+        if len(block) == 0:
+            continue
+        train_idx = np.flatnonzero(dates < block[0])
+        test_idx = np.flatnonzero((dates >= block[0]) & (dates <= block[-1]))
+        folds.append((train_idx, test_idx))
+    return folds
+
+
+class SharedMatrix:
+    """
+    A float32 matrix placed in shared memory once so worker processes can attach to
+    it by name instead of each receiving a pickled copy.
+    """
+
+    def __init__(self, array: np.ndarray):
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        self.shape = array.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf)[:] = array
+
+    @property
+    def handle(self) -> Tuple[str, Tuple[int, ...]]:
+        return self.shm.name, self.shape
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+_worker_state: Dict = {}
+
+
+def _attach(handle: Tuple[str, Tuple[int, ...]], folds: List[Tuple[np.ndarray, np.ndarray]]) -> None:
+    name, shape = handle
+    shm = shared_memory.SharedMemory(name=name)
+    _worker_state['shm'] = shm
+    _worker_state['matrix'] = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    _worker_state['folds'] = folds
+
+
+def _predict_rule_based(features: Dict[str, np.ndarray], params: Dict) -> np.ndarray:
+    projection = combine_projection(
+        features,
+        alpha=params['alpha'],
+        gamma=params['gamma'],
+        blend=params['blend']
+    )
+    return projection * features['platoon_factor'] * features['pvb_factor'] * params['fudge']
+
+
+def _xgb_params(params: Dict) -> Dict:
+    return {
+        'objective': 'count:poisson',
+        'max_depth': int(params['max_depth']),
+        'eta': params['learning_rate'],
+        'subsample': params['subsample'],
+        'colsample_bytree': params['colsample_bytree'],
+        'min_child_weight': params['min_child_weight'],
+        'lambda': params['reg_lambda'],
+        'nthread': 1,
+        'verbosity': 0
+    }
+
+
+def evaluate_fold(params: Dict, fold: int) -> float:
+    """
+    RMSE of one configuration on one walk-forward fold (runs inside a worker).
+    """
+    matrix = _worker_state['matrix']
+    train_idx, test_idx = _worker_state['folds'][fold]
+    features, target = matrix[:, :len(FEATURE_COLUMNS)], matrix[:, len(FEATURE_COLUMNS)]
+
+    if params['kind'] == 'rule':
+        test_features = {name: features[test_idx, i].astype(np.float64) for i, name in enumerate(FEATURE_COLUMNS)}
+        predictions = _predict_rule_based(test_features, params)
+    else:
+        train = xgb.DMatrix(features[train_idx], label=target[train_idx], feature_names=FEATURE_COLUMNS)
+        test = xgb.DMatrix(features[test_idx], feature_names=FEATURE_COLUMNS)
+        booster = xgb.train(_xgb_params(params), train, num_boost_round=int(params['n_estimators']))
+        predictions = booster.predict(test)
+
+    return float(np.sqrt(np.mean((predictions - target[test_idx]) ** 2)))
+
+
+def sample_configs(n_trials: int, seed: int = 0, kinds: Tuple[str, ...] = ('xgb', 'rule')) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    configs = []
+    for trial in range(n_trials):
+        kind = kinds[trial % len(kinds)]
+        if kind == 'rule':
+            configs.append({
+                'kind': 'rule',
+                'alpha': float(rng.uniform(0.0, 0.3)),
+                'gamma': float(rng.uniform(0.0, 0.3)),
+                'blend': float(rng.uniform(0.3, 0.9)),
+                'fudge': float(rng.uniform(0.9, 1.15))
+            })
+        else:
+            configs.append({
+                'kind': 'xgb',
+                'max_depth': int(rng.integers(2, 8)),
+                'learning_rate': float(10 ** rng.uniform(-2.3, -0.7)),
+                'n_estimators': int(rng.integers(100, 800)),
+                'subsample': float(rng.uniform(0.5, 1.0)),
+                'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+                'min_child_weight': float(10 ** rng.uniform(0, 1.5)),
+                'reg_lambda': float(10 ** rng.uniform(-1, 1.5))
+            })
+    return configs
+
+
+def run_search(
+    frame: pd.DataFrame,
+    configs: List[Dict],
+    n_folds: int = 5,
+    max_workers: Optional[int] = None,
+    prune_after: int = 2
+) -> pd.DataFrame:
+    """
+    Evaluate configurations with walk-forward CV across worker processes.
+
+    Each (trial, fold) is one task. After a trial finishes fold k it only continues
+    if its running mean RMSE is no worse than the median of every other trial that
+    has reached fold k (median pruning, starting at fold prune_after), so bad
+    configurations stop after a couple of folds.
+    """
+    dates = pd.to_datetime(frame[DATE_COLUMN]).to_numpy()
+    folds = walk_forward_folds(dates, n_folds)
+    matrix = np.column_stack([frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32), frame[TARGET_COLUMN].to_numpy(dtype=np.float32)])
+    shared = SharedMatrix(matrix)
+    print(f"Searching {len(configs)} configs over {len(folds)} walk-forward folds ({len(frame)} starts)")
+
+    scores: Dict[int, List[float]] = {trial: [] for trial in range(len(configs))}
+    fold_means: Dict[int, List[float]] = {fold: [] for fold in range(len(folds))}
+    pruned = set()
+    started = time.time()
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(shared.handle, folds)) as executor:
+            pending = {executor.submit(evaluate_fold, config, 0): (trial, 0) for trial, config in enumerate(configs)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial, fold = pending.pop(future)
+                    try:
+                        scores[trial].append(future.result())
+                    except Exception as e:
+                        print(f"Trial {trial} failed on fold {fold}: {str(e)}")
+                        pruned.add(trial)
+                        continue
+
+                    running = float(np.mean(scores[trial]))
+                    fold_means[fold].append(running)
+                    if fold + 1 == len(folds):
+                        continue
+                    if fold + 1 >= prune_after and running > np.median(fold_means[fold]):
+                        pruned.add(trial)
+                        continue
+                    pending[executor.submit(evaluate_fold, configs[trial], fold + 1)] = (trial, fold + 1)
+    finally:
+        shared.close()
+
+    results = pd.DataFrame([
+        {**configs[trial], 'folds_run': len(fold_scores), 'rmse': float(np.mean(fold_scores)) if fold_scores else np.nan,
+         'pruned': trial in pruned}
+        for trial, fold_scores in scores.items()
+    ])
+    complete = results[results['folds_run'] == len(folds)].sort_values('rmse')
+    print(f"Search finished in {time.time() - started:.1f}s; {len(complete)} of {len(configs)} configs ran every fold")
+    return pd.concat([complete, results.drop(complete.index)])
+
+
+def fit_final_model(frame: pd.DataFrame, params: Dict, path: Optional[str] = None) -> xgb.Booster:
+    if path is None:
+        path = cache_path('models', MODEL_NAME)
+    train = xgb.DMatrix(frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32), label=frame[TARGET_COLUMN].to_numpy(),
+                        feature_names=FEATURE_COLUMNS)
+    booster = xgb.train({**_xgb_params(params), 'nthread': os.cpu_count() or 1}, train,
+                        num_boost_round=int(params['n_estimators']))
+    booster.save_model(path)
+    print(f"Saved XGBoost model to {path}")
+    return booster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the strikeout projection with walk-forward CV")
+    parser.add_argument('--data', required=True, help="Parquet file of historical starts (features + actual_k)")
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    frame = load_training_frame(args.data)
+    results = run_search(frame, sample_configs(args.trials, args.seed), args.folds, args.workers)
+    results.to_csv(cache_path('models', 'search_results.csv'), index=False)
+
+    best = {}
+    for kind in ('rule', 'xgb'):
+        ranked = results[(results['kind'] == kind) & results['rmse'].notna() & ~results['pruned']]
+        if not ranked.empty:
+            best[kind] = ranked.iloc[0].dropna().to_dict()
+            print(f"Best {kind} config: {best[kind]}")
+    with open(cache_path('models', BEST_PARAMS_NAME), 'w') as f:
+        json.dump(best, f, indent=2, default=float)
+
+    if 'xgb' in best:
+        fit_final_model(frame, best['xgb'])
+    baseline = {'alpha': 0.15, 'gamma': 0.15, 'blend': MATCHUP_BLEND, 'fudge': PROJECTION_FUDGE}
+    print(f"Current rule-based defaults for comparison: {baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from glob import glob
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+
+from features.markets import MARKETS, build_feature_matrix, project_markets
+from features.normalization import freeze_baselines_as_of, use_frozen_baselines
+from features.pitchers import process_pitcher_stats
+from features.rule_based import compute_lineup_features
+from utils.data_loader import cache_path, current_run, start_run
+from utils.lineup_archive import date_to_int, get_archive, get_pitching_lines
+from utils.slate import Starter
+from utils.work_queue import WorkQueue, worker_id
+
+BATCH_SIZE = 16
+TASK_COLUMNS = ['task_id', 'date', 'game_pk', 'mlbam_id', 'pitcher', 'team', 'opponent', 'is_home']
+# What each starter actually recorded, from the game's box score
+ACTUAL_COLUMNS = {'actual_k': 'strikeOuts', 'actual_outs': 'outs', 'actual_bb': 'baseOnBalls', 'actual_h': 'hits'}
+
+
+def backtest_dir(name: str) -> str:
+    return os.path.dirname(cache_path('backtest', name, 'queue.sqlite'))
+
+
+def open_queue(name: str) -> WorkQueue:
+    return WorkQueue(os.path.join(backtest_dir(name), 'queue.sqlite'))
+
+
+def season_tasks(season: int, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Tuple[str, str, Dict]]:
+    """
+    One (task_id, shard, payload) per archived start: each game's two probable
+    starters against the opposing archived lineup, sharded by date.
+    """
+    archive = get_archive(season)
+    if archive is None:
+        print(f"No lineup archive for {season}; run download_season({season}) first")
+        return []
+    games = archive.games
+    if start_date:
+        games = games[games['date'] >= date_to_int(start_date)]
+    if end_date:
+        games = games[games['date'] <= date_to_int(end_date)]
+
+    tasks = []
+    for game in games.itertuples(index=False):
+        date_str = datetime.strptime(str(game.date), '%Y%m%d').strftime('%Y-%m-%d')
+        for pitcher_id, team, opponent, is_home in (
+            (game.home_pitcher_id, game.home, game.away, True),
+            (game.away_pitcher_id, game.away, game.home, False)
+        ):
+            if not pitcher_id:
+                continue
+            task_id = f"{date_str}:{int(game.game_pk)}:{int(pitcher_id)}"
+            tasks.append((task_id, date_str, {
+                'task_id': task_id,
+                'date': date_str,
+                'game_pk': int(game.game_pk),
+                'mlbam_id': int(pitcher_id),
+                'pitcher': archive.names.get(int(pitcher_id), ''),
+                'team': str(team),
+                'opponent': str(opponent),
+                'is_home': is_home
+            }))
+    return tasks
+
+
+def enqueue_backtest(name: str, seasons: List[int], start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
+    """
+    Queue every archived start in the given seasons (optionally within a date range).
+    """
+    queue = open_queue(name)
+    added = 0
+    for season in seasons:
+        added += queue.enqueue(season_tasks(season, start_date, end_date))
+    print(f"Queued {added} new tasks for backtest '{name}': {queue.counts()}")
+    return added
+
+
+def project_task(task: Dict) -> Dict:
+    """
+    Features for one historical start, from the archived lineup and the season's
+    stats through the day before the start (the current run must be dated to it).
+    """
+    season = int(task['date'][:4])
+    lineup = get_archive(season).lineup(task['opponent'], task['date'], task['game_pk'])
+    if not lineup:
+        raise ValueError(f"No archived lineup for {task['opponent']} in game {task['game_pk']}")
+
+    stats = process_pitcher_stats([{'pitcher_name': task['pitcher'], 'team': task['team'], 'mlbam_id': task['mlbam_id']}], season)
+    if stats.empty:
+        raise ValueError(f"No stats for {task['pitcher']}")
+    record = stats.iloc[0]
+    starter = Starter(
+        task['mlbam_id'], task['pitcher'], task['team'], task['opponent'], task['game_pk'], task['is_home'],
+        fg_id=int(record['fg_id']), k_per_9=float(record['k_per_9']), ip_per_g=float(record['ip_per_g']),
+        pitch_mix=record['pitch_mix'], has_stats=True
+    )
+    return compute_lineup_features(starter.to_info(), lineup, season)
+
+
+def actual_line(task: Dict) -> Dict:
+    """
+    The starter's box-score line for the task's game, as ACTUAL_COLUMNS.
+    """
+    line = get_pitching_lines(task['game_pk']).get(str(task['mlbam_id']))
+    if line is None:
+        raise ValueError(f"{task['pitcher']} did not pitch in game {task['game_pk']}")
+    return {column: line[field] for column, field in ACTUAL_COLUMNS.items()}
+
+
+def run_batch(queue: WorkQueue, batch: List[Tuple[str, Dict]]) -> pd.DataFrame:
+    """
+    Features, every market's projection and the actual line for a claimed batch, one
+    row per task. A batch comes from one shard (date), and the run is dated to it so
+    stats are pulled (once per date, into the snapshot store) as of that date. Tasks
+    that raise are reported back to the queue and left out.
+    """
+    date = batch[0][1]['date']
+    if current_run().run_date != date:
+        start_run(date)
+    rows = {}
+    tasks = {}
+    for task_id, task in batch:
+        try:
+            row, actual = project_task(task), actual_line(task)
+            rows[task_id] = row
+            tasks[task_id] = {**task, 'game_date': task['date'], **actual}
+        except Exception as e:
+            print(f"Error projecting {task_id}: {str(e)}")
+            queue.fail(task_id, str(e))
+    if not rows:
+        return pd.DataFrame()
+
+    features = build_feature_matrix(rows)
+    projections = project_markets(features).rename(columns={market: spec.column for market, spec in MARKETS.items()})
+    # game_date and actual_k make merged results a train_model training frame
+    frame = pd.DataFrame.from_dict(tasks, orient='index')[TASK_COLUMNS + ['game_date'] + list(ACTUAL_COLUMNS)]
+    return pd.concat([frame, features, projections], axis=1).reset_index(drop=True)
+
+
+def run_worker(name: str, batch_size: int = BATCH_SIZE, max_batches: Optional[int] = None,
+               baselines: Optional[str] = None) -> int:
+    """
+    Claim, project and checkpoint batches until the queue is drained.
+
+    Each batch is written as its own parquet part before its tasks are marked done,
+    so a worker killed mid-batch loses at most that batch, which is re-claimed once
+    its lease expires. With baselines, every start is normalized against those
+    frozen league baselines. Returns the number of tasks this worker completed.
+    """
+    use_frozen_baselines(baselines)
+    queue = open_queue(name)
+    worker = worker_id()
+    parts_dir = os.path.dirname(cache_path('backtest', name, 'parts', 'part.parquet'))
+    completed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = queue.claim(worker, batch_size)
+        if not batch:
+            break
+        frame = run_batch(queue, batch)
+        if not frame.empty:
+            path = os.path.join(parts_dir, f"{worker}-{time.time_ns()}.parquet")
+            # Written under a temporary name and renamed, so a merge never reads a partial part
+            frame.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+            queue.complete(frame['task_id'].tolist())
+            completed += len(frame)
+        batches += 1
+    print(f"Worker {worker} completed {completed} tasks in {batches} batches")
+    return completed
+
+
+def run_workers(name: str, workers: Optional[int] = None, batch_size: int = BATCH_SIZE,
+                baselines: Optional[str] = None) -> int:
+    """
+    Drain the queue with local worker processes. Workers on other hosts can run
+    against the same queue at the same time with `python -m run_backtest work`.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    started = time.time()
+    completed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_worker, name, batch_size, None, baselines) for _ in range(workers)]
+        for future in as_completed(futures):
+            completed += future.result()
+    elapsed = time.time() - started
+    print(f"{workers} workers completed {completed} tasks in {elapsed:.1f}s "
+          f"({completed / elapsed if elapsed else 0:.1f} tasks/s)")
+    return completed
+
+
+def merge_results(name: str) -> Optional[str]:
+    """
+    Merge every worker part into one results.parquet. A task re-run after a crash
+    appears in two parts; the later part wins.
+    """
+    parts = sorted(glob(os.path.join(backtest_dir(name), 'parts', '*.parquet')), key=os.path.getmtime)
+    if not parts:
+        print(f"No results for backtest '{name}'")
+        return None
+    frame = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+    frame = frame.drop_duplicates('task_id', keep='last').sort_values(['date', 'game_pk', 'mlbam_id'])
+    path = os.path.join(backtest_dir(name), 'results.parquet')
+    frame.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    print(f"Merged {len(parts)} parts into {len(frame)} rows at {path}")
+    return path
+
+
+def print_status(name: str) -> None:
+    queue = open_queue(name)
+    counts = queue.counts()
+    total = sum(counts.values())
+    print(f"Backtest '{name}': {total} tasks")
+    for status in ('pending', 'claimed', 'done', 'failed'):
+        print(f"  {status}: {counts.get(status, 0)}")
+    for task_id, error in queue.errors():
+        print(f"  {task_id}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the projector over archived starts with a shared work queue")
+    parser.add_argument('command', choices=['enqueue', 'work', 'status', 'merge', 'retry'])
+    parser.add_argument('--name', default='default', help="Backtest name; its queue and results live under cache/backtest/<name>")
+    parser.add_argument('--seasons', type=int, nargs='+', default=[], help="Seasons to enqueue")
+    parser.add_argument('--start', default=None, help="First date to enqueue (YYYY-MM-DD)")
+    parser.add_argument('--end', default=None, help="Last date to enqueue (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=None, help="Local worker processes; defaults to the CPU count")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Tasks claimed per batch")
+    parser.add_argument('--baselines', default=None, metavar='NAME',
+                        help="Normalize every start against frozen league baselines instead of its date's")
+    parser.add_argument('--freeze-baselines', dest='freeze_baselines', default=None, metavar='NAME',
+                        help="Freeze the league baselines as of --start under NAME and work against them")
+    args = parser.parse_args()
+
+    try:
+        baselines = args.baselines
+        if args.freeze_baselines:
+            if not args.start:
+                parser.error("--freeze-baselines needs --start")
+            freeze_baselines_as_of(args.freeze_baselines, args.start)
+            baselines = args.freeze_baselines
+        if args.command == 'enqueue':
+            if not args.seasons:
+                parser.error("enqueue needs --seasons")
+            enqueue_backtest(args.name, args.seasons, args.start, args.end)
+        elif args.command == 'work':
+            run_workers(args.name, args.workers, args.batch_size, baselines)
+            merge_results(args.name)
+        elif args.command == 'merge':
+            merge_results(args.name)
+        elif args.command == 'retry':
+            print(f"Re-queued {open_queue(args.name).reset_failed()} failed tasks")
+        else:
+            print_status(args.name)
+    except Exception as e:
+        print(f"Error running backtest: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -1,136 +1,309 @@
-from typing import Optional
-from scipy.stats import norm
+import argparse
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
 
 from features.pitchers import fetch_pitchers
 from features.pitchers import process_pitcher_stats
-from features.batters import get_opposing_lineups
-from features.batters import analyze_matchup
+from features.batters import get_lineup_with_fallback
+from features.batters import analyze_matchup, matchup_cache
 from features.contextual import apply_contextual_adjustments
-from betting.betting_lines import get_strikeout_props
+from betting.betting_lines import get_all_props, props_key
 from betting.export import export_results
 from betting.filters import filter_bets, get_bet_summary, print_filtered_bets
-from features.rule_based import project_strikeouts_with_lineup_fetching
+from betting.line_tracker import changes_since_last_run, print_changes, record_run
+from features.markets import MARKETS, build_feature_matrix, project_markets, projected_value
+from features.rule_based import compute_lineup_features
+from features.batters_faced import build_slate_pa_matrix
+from features.normalization import freeze_baselines_as_of, use_frozen_baselines
+from features.recent_form import get_form_store, get_recent_form
+from models.calibration import ConfidenceCalibrator, raw_over_probability
+from models.explain import explain_slate
+from utils.data_loader import load_stats_snapshot, recorded_snapshot_id, start_replay, start_run
+from utils.lazy_graph import LazyGraph
+from utils.slate import Slate, Starter
 
 
-def run_daily_analysis(date: Optional[str] = None) -> None:
+def apply_confidence(projections: List[Dict], calibrator: Optional[ConfidenceCalibrator] = None) -> None:
+    """
+    Set confidence_pct and recommendation for a whole slate, one vectorized pass per
+    market. The fitted calibrator covers strikeouts; other markets (and strikeouts
+    without a calibrator) use the raw normal-CDF estimate with the market's spread.
+    """
+    if not projections:
+        return
+    
+    by_market: Dict[str, List[Dict]] = {}
+    for proj in projections:
+        by_market.setdefault(proj.get('market', 'strikeouts'), []).append(proj)
+    for market, rows in by_market.items():
+        projected = np.array([projected_value(proj) for proj in rows], dtype=float)
+        lines = np.array([proj['book_line'] for proj in rows], dtype=float)
+        if market == 'strikeouts':
+            confidences = (calibrator or ConfidenceCalibrator()).confidence_pct(projected, lines)
+        else:
+            p_over = raw_over_probability(projected, lines, MARKETS[market].sd)
+            confidences = np.round(100 * np.where(projected > lines, p_over, 1 - p_over), 1)
+        _recommend(rows, confidences)
+
+
+def _recommend(projections: List[Dict], confidences: np.ndarray) -> None:
+    for proj, confidence_pct in zip(projections, confidences):
+        proj['confidence_pct'] = float(confidence_pct)
+        if proj['edge_pct'] > 7 and confidence_pct >= 70:
+            proj['recommendation'] = "Bet Over"
+        elif proj['edge_pct'] < -7 and confidence_pct >= 70:
+            proj['recommendation'] = "Bet Under"
+        else:
+            proj['recommendation'] = "Skip"
+
+
+def _timed(name: str, load, *args):
+    started = time.time()
+    try:
+        result = load(*args)
+    except Exception as e:
+        print(f"Prefetching {name} failed: {str(e)}")
+        raise
+    print(f"Prefetched {name} in {time.time() - started:.1f}s")
+    return result
+
+
+def prefetch_sources(executor: ThreadPoolExecutor, date: str, season: int) -> Dict[str, Future]:
+    """
+    Start every input that depends only on the slate date: schedule (with probable
+    starters), props and the league-wide stats frames. Stages block only on the
+    futures they need; lazily evaluated features that load the same stats snapshot
+    wait for the in-flight fetch instead of starting another.
+    """
+    return {
+        'schedule': executor.submit(_timed, 'schedule', fetch_pitchers, date),
+        'props': executor.submit(_timed, 'props', get_all_props, date, list(MARKETS)),
+        'pitching': executor.submit(_timed, 'pitching stats', load_stats_snapshot, 'pitching', season),
+        'batting': executor.submit(_timed, 'batting stats', load_stats_snapshot, 'batting', season)
+    }
+
+
+def build_slate_graph(slate: Slate, targets: List[Starter], season: int) -> LazyGraph:
+    """
+    Feature graph for a slate. Nodes are keyed by MLBAM id (or game_pk and team for
+    lineups) and only run when a requested output depends on them.
+    """
+    graph = LazyGraph()
+    
+    @graph.node('stats')
+    def stats(graph, mlbam_id):
+        starter = slate.starters[mlbam_id]
+        slate.attach_stats(process_pitcher_stats([{'pitcher_name': starter.name, 'team': starter.team, 'mlbam_id': mlbam_id}], season))
+        return starter if starter.has_stats else None
+    
+    @graph.node('lineup')
+    def lineup(graph, game_pk, team):
+        lineup = slate.add_lineup(game_pk, team, get_lineup_with_fallback(team, slate.date, game_pk=game_pk))
+        if lineup is None:
+            print(f"Failed to get lineup for {team}")
+        return lineup
+    
+    @graph.node('slot_pa')
+    def slot_pa(graph):
+        # One vectorized pass over every requested starter that has a lineup
+        starters = [starter for starter in targets if graph.get('lineup', starter.game_pk, starter.opponent)]
+        pa = build_slate_pa_matrix(
+            [starter.name for starter in starters],
+            [graph.get('lineup', starter.game_pk, starter.opponent).names for starter in starters],
+            season
+        )
+        return {
+            starter.mlbam_id: pa['pa'][row] if pa['batters_faced'][row] > 0 else None
+            for row, starter in enumerate(starters)
+        }
+    
+    @graph.node('features')
+    def features(graph, mlbam_id):
+        starter = graph.get('stats', mlbam_id)
+        lineup = graph.get('lineup', slate.starters[mlbam_id].game_pk, slate.starters[mlbam_id].opponent)
+        if starter is None or lineup is None:
+            print(f"Skipping {slate.starters[mlbam_id].name}: missing stats or lineup")
+            return None
+        try:
+            return compute_lineup_features(
+                starter.to_info(), lineup.batters, season, slot_weights=graph.get('slot_pa').get(mlbam_id)
+            )
+        except Exception as e:
+            print(f"Error computing features for {starter.name}: {str(e)}")
+            return None
+    
+    @graph.node('feature_matrix')
+    def feature_matrix(graph):
+        rows = {starter.mlbam_id: graph.get('features', starter.mlbam_id) for starter in targets}
+        rows = {mlbam_id: row for mlbam_id, row in rows.items() if row is not None}
+        return build_feature_matrix(rows) if rows else pd.DataFrame()
+    
+    @graph.node('projections')
+    def projections(graph):
+        # One shared feature matrix for the slate; each market is one vectorized pass over it
+        features = graph.get('feature_matrix')
+        if features.empty:
+            return pd.DataFrame()
+        markets = sorted({market for starter in targets for market in slate.props_for(starter) if market in MARKETS})
+        return project_markets(features, markets)
+    
+    @graph.node('attributions')
+    def attributions(graph):
+        # TreeSHAP over the whole slate in one call; rows explained before come from the cache
+        try:
+            return explain_slate(graph.get('feature_matrix'))
+        except Exception as e:
+            print(f"Error explaining projections: {str(e)}")
+            return {}
+    
+    @graph.node('matchup')
+    def matchup(graph, mlbam_id):
+        starter = graph.get('stats', mlbam_id)
+        lineup = graph.get('lineup', slate.starters[mlbam_id].game_pk, slate.starters[mlbam_id].opponent)
+        if starter is None or lineup is None:
+            return None
+        starter.matchup = analyze_matchup(starter.to_info(), lineup.batters, season)
+        return starter.matchup
+    
+    @graph.node('recent_form')
+    def recent_form(graph, mlbam_id):
+        starter = graph.get('stats', mlbam_id)
+        return get_recent_form(starter.fg_id, season, date=slate.date) if starter else None
+    
+    return graph
+
+
+def run_daily_analysis(
+    date: Optional[str] = None,
+    as_of: Optional[str] = None,
+    include_details: bool = True,
+    update_form: bool = True
+) -> List[Dict]:
     """
     Run the complete daily analysis pipeline.
     
     Args:
         date (Optional[str]): Date to analyze in YYYY-MM-DD format. If None, uses today's date.
+        as_of (Optional[str]): Run id to replay from its recorded input snapshots, without network access.
+        include_details (bool): Also compute matchup scores and recent form for the details field.
+        update_form (bool): Fold completed days before the slate into the recent-form store first.
+    
+    Returns:
+        List[Dict]: The slate's adjusted projections.
     """
+    started = time.time()
+    run = start_replay(as_of) if as_of else start_run(date)
+    date = run.run_date
+    season = int(date[:4])
+    print(f"{'Replaying' if as_of else 'Starting'} run {run.run_id} for {date}")
+    
+    if include_details and update_form and not as_of:
+        try:
+            day_before = (datetime.strptime(date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+            get_form_store(season).update(day_before)
+        except Exception as e:
+            print(f"Error updating recent form: {str(e)}")
+    
+    executor = ThreadPoolExecutor(max_workers=4)
     try:
-        pitchers = fetch_pitchers()
+        sources = prefetch_sources(executor, date, season)
+        pitchers = sources['schedule'].result()
         if not pitchers:
-            print("No pitchers found for today's games")
-            return
-
-        print("Processing pitcher statistics...")
-        pitcher_stats = process_pitcher_stats(pitchers)
-        
-        pitchers_with_stats = []
-        for _, row in pitcher_stats.iterrows():
-            original_pitcher = next((p for p in pitchers if p['pitcher_name'] == row['pitcher']), None)
-            if original_pitcher:
-                pitcher_with_stats = {
-                    'pitcher_name': row['pitcher'],
-                    'team': row['team'],
-                    'opponent': original_pitcher['opponent'],
-                    'stats': {
-                        'k_per_9': row['k_per_9'],
-                        'ip_per_g': row['ip_per_g'],
-                        'pitch_mix': row['pitch_mix']
-                    }
-                }
-                pitchers_with_stats.append(pitcher_with_stats)
-        
-        print("Pitchers with stats:", pitchers_with_stats)
-        
-        print("Fetching opposing lineups...")
-        lineup_map = get_opposing_lineups(pitchers_with_stats, date)
-        
-        print("Analyzing pitcher-batter matchups...")
-        matchup_scores = {}
-        for pitcher in pitchers_with_stats:
-            if pitcher['pitcher_name'] in lineup_map:
-                matchup = analyze_matchup(pitcher, lineup_map[pitcher['pitcher_name']])
-                if matchup:
-                    matchup_scores[pitcher['pitcher_name']] = {
-                        'agg_lineup_score': matchup['agg_lineup_score'],
-                        'lineup': lineup_map[pitcher['pitcher_name']]
-                    }
+            print(f"No pitchers found for {date}")
+            return []
+        slate = Slate.from_pitchers(date, pitchers)
         
         print("Fetching betting lines...")
-        betting_lines = get_strikeout_props(date)
-        print("Betting lines:", betting_lines)
+        props = sources['props'].result()
+        for market, market_props in props.items():
+            slate.add_props(market_props)
+            print(f"Betting lines ({market}):", market_props)
+        
+        # Only starters with a prop are requested; nothing upstream runs for the rest
+        targets = [starter for starter in slate.starters.values() if slate.props_for(starter)]
+        for starter in slate.starters.values():
+            if not slate.props_for(starter):
+                print(f"No betting line found for {starter.name}")
+        graph = build_slate_graph(slate, targets, season)
         
-        print("Projecting strikeouts using enhanced model...")
+        print("Projecting props using enhanced model...")
+        slate_projections = graph.get('projections')
+        attributions = graph.get('attributions')
         projections = []
-        for pitcher in pitchers_with_stats:
-            betting_line = next(
-                (line['line'] for line in betting_lines 
-                 if line['pitcher'] == pitcher['pitcher_name'] 
-                 and line['team'] == pitcher['team']),
-                None
-            )
-            
-            if betting_line is None:
-                print(f"No betting line found for {pitcher['pitcher_name']}")
+        for starter in targets:
+            if starter.mlbam_id not in slate_projections.index:
                 continue
-            
             try:
-                projected_k = project_strikeouts_with_lineup_fetching(
-                    pitcher_info=pitcher,
-                    date=date
-                )
-                
-                edge_pct = round(((projected_k - betting_line) / 1.5) * 100, 1)
-                z = (projected_k - betting_line) / 1.5
-                confidence_pct = round(
-                    100 * (norm.cdf(z) if projected_k > betting_line else 1 - norm.cdf(z)),
-                    1
-                )
-                
-                if edge_pct > 7 and confidence_pct >= 70:
-                    recommendation = "Bet Over"
-                elif edge_pct < -7 and confidence_pct >= 70:
-                    recommendation = "Bet Under"
-                else:
-                    recommendation = "Skip"
-                
-                lineup_details = matchup_scores.get(pitcher['pitcher_name'], {}).get('lineup', [])
-                
-                projection = {
-                    "pitcher": pitcher["pitcher_name"],
-                    "team": pitcher["team"],
-                    "opponent": pitcher["opponent"],
-                    "projected_k": round(projected_k, 1),
-                    "book_line": betting_line,
-                    "edge_pct": edge_pct,
-                    "confidence_pct": confidence_pct,
-                    "recommendation": recommendation,
-                    "details": {
-                        "matchup_score": matchup_scores.get(pitcher['pitcher_name'], {}).get('agg_lineup_score', 0),
-                        "lineup": lineup_details,
+                lineup = graph.get('lineup', starter.game_pk, starter.opponent)
+                details = None
+                if include_details:
+                    matchup = graph.get('matchup', starter.mlbam_id)
+                    details = {
+                        "matchup_score": matchup['agg_lineup_score'] if matchup else 0,
+                        "lineup": lineup.batters,
+                        "recent_form": graph.get('recent_form', starter.mlbam_id),
                         "model": "Enhanced Projection (Hitter Z-Scores + Pitcher K% + Pitch Quality + IP Adjustment)"
                     }
-                }
                 
-                projections.append(projection)
+                for market, prop in slate.props_for(starter).items():
+                    if market not in MARKETS:
+                        print(f"No model for {market} props; skipping {starter.name}")
+                        continue
+                    spec = MARKETS[market]
+                    projected = float(slate_projections.at[starter.mlbam_id, market])
+                    edge_pct = round(((projected - prop.line) / spec.edge_scale) * 100, 1)
+                    
+                    projection = {
+                        "pitcher": starter.name,
+                        "mlbam_id": starter.mlbam_id,
+                        "game_pk": starter.game_pk,
+                        "team": starter.team,
+                        "opponent": starter.opponent,
+                        "game_time": starter.game_time,
+                        "home_away": "Home" if starter.is_home else "Away",
+                        "market": market,
+                        spec.column: projected,
+                        "book_line": prop.line,
+                        "edge_pct": edge_pct,
+                        "lineup_status": "projected" if lineup.projected else "confirmed",
+                        "run_id": run.run_id
+                    }
+                    if details is not None:
+                        projection["details"] = details
+                    if market == 'strikeouts' and starter.mlbam_id in attributions:
+                        # The attributions explain the XGBoost model's prediction, carried as model_k
+                        projection["model_k"] = attributions[starter.mlbam_id]['model_k']
+                        projection["attributions"] = attributions[starter.mlbam_id]['contributions']
+                    
+                    projections.append(projection)
                 
             except Exception as e:
-                print(f"Error projecting strikeouts for {pitcher['pitcher_name']}: {str(e)}")
+                print(f"Error projecting props for {starter.name}: {str(e)}")
                 continue
+        print(f"Evaluated {graph.summary()} for {len(targets)} of {len(slate.starters)} starters")
+        print(f"Matchup score cache: {matchup_cache.summary()}")
+        
+        print("Scoring confidence...")
+        apply_confidence(projections, ConfidenceCalibrator.load())
         
         print("Applying contextual adjustments...")
         adjusted_projections = []
         for proj in projections:
+            if proj['market'] != 'strikeouts':
+                # Park and weather factors are strikeout-specific
+                adjusted_projections.append(proj)
+                continue
             adjusted = apply_contextual_adjustments(
                 pitcher={
                     'name': proj['pitcher'],
                     'team': proj['team'],
                     'opponent': proj['opponent'],
-                    'home_away': 'Home' if proj.get('is_home', False) else 'Away'
+                    'home_away': proj['home_away']
                 },
                 raw_k=proj['projected_k']
             )
@@ -141,20 +314,145 @@ def run_daily_analysis(date: Optional[str] = None) -> None:
         filtered_bets = filter_bets(adjusted_projections)
         bet_summary = get_bet_summary(filtered_bets)
         
+        # Every prefetched input belongs in the manifest, even if no stage needed it
+        wait(list(sources.values()))
+        if not as_of:
+            print(f"Recorded input snapshots to {run.save()}")
+        snapshots = {'run_id': run.run_id, **run.manifest}
+        print("Input snapshots:")
+        for key, snapshot_id in sorted(run.manifest.items()):
+            print(f"  {key}: {snapshot_id}")
+        
         print("Exporting results...")
-        export_results(adjusted_projections)
+        export_results(adjusted_projections, date=date, snapshots=snapshots)
         
         print_filtered_bets(filtered_bets, bet_summary)
         
-        print("Daily analysis complete!")
+        if not as_of:
+            # The tracker's schema is strikeout-only
+            record_run(
+                run.run_id, date,
+                [proj for proj in adjusted_projections if proj['market'] == 'strikeouts'],
+                props.get('strikeouts', [])
+            )
+        print_changes(changes_since_last_run(date, run.run_id))
+        
+        print(f"Daily analysis complete in {time.time() - started:.1f}s!")
+        return adjusted_projections
         
     except Exception as e:
         print(f"Error in daily analysis: {str(e)}")
         raise
+    finally:
+        # Drop prefetches that haven't started and wait out the running ones: they record
+        # into the global run manifest, which the next date's run replaces
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _run_dates(dates: List[str], include_details: bool = True, baselines: Optional[str] = None) -> Dict[str, Optional[int]]:
+    """
+    Run consecutive slates in one process so season snapshots and the tables derived
+    from them are loaded once and reused for every date.
+    """
+    use_frozen_baselines(baselines)
+    results = {}
+    for date in dates:
+        try:
+            # Workers share one form store on disk; it is updated by daily runs or `python -m features.recent_form`
+            results[date] = len(run_daily_analysis(date, include_details=include_details, update_form=False))
+        except Exception as e:
+            print(f"Error running slate for {date}: {str(e)}")
+            results[date] = None
+    return results
+
+
+def has_recorded_inputs(date: str) -> bool:
+    """
+    Whether a slate before today can run without later data: its props were recorded
+    on the date. Stats for a past date are pulled as of it, so they never block a slate.
+    """
+    return recorded_snapshot_id(props_key(date), date) is not None
+
+
+def run_date_range(
+    start_date: str,
+    end_date: str,
+    max_workers: Optional[int] = None,
+    include_details: bool = True,
+    baselines: Optional[str] = None
+) -> Dict[str, Optional[int]]:
+    """
+    Run every slate from start_date through end_date across worker processes.
+    
+    Each slate reads stats as of its own date and that date's props. Dates before
+    today without recorded inputs are refused rather than run on today's data. Each
+    worker gets a contiguous block of dates. With baselines, every slate is
+    normalized against those frozen league baselines instead of its own date's.
+    
+    Returns:
+        Dict[str, Optional[int]]: Number of projections per date (None when the date failed or was refused).
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    dates = [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range((end - start).days + 1)]
+    if not dates:
+        raise ValueError(f"Empty date range: {start_date} to {end_date}")
+    
+    started = time.time()
+    today = datetime.now().strftime('%Y-%m-%d')
+    refused = [date for date in dates if date < today and not has_recorded_inputs(date)]
+    for date in refused:
+        print(f"Skipping {date}: no props recorded on the date")
+    runnable = [date for date in dates if date not in refused]
+    
+    results = {date: None for date in refused}
+    if not runnable:
+        print("No slates in the range have recorded inputs")
+        return results
+    
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(runnable)))
+    block_size = -(-len(runnable) // workers)
+    blocks = [runnable[i:i + block_size] for i in range(0, len(runnable), block_size)]
+    print(f"Running {len(runnable)} slates across {len(blocks)} worker processes")
+    
+    with ProcessPoolExecutor(max_workers=len(blocks)) as executor:
+        futures = [executor.submit(_run_dates, block, include_details, baselines) for block in blocks]
+        for future in as_completed(futures):
+            results.update(future.result())
+    
+    print(f"\nBatch complete in {time.time() - started:.1f}s")
+    for date in dates:
+        count = results.get(date)
+        status = 'refused' if date in refused else 'failed' if count is None else f'{count} projections'
+        print(f"{date}: {status}")
+    return results
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Daily strikeout prop analysis")
+    parser.add_argument('--date', default=None, help="Slate date (YYYY-MM-DD); defaults to today")
+    parser.add_argument('--as-of', dest='as_of', default=None, metavar='RUN_ID',
+                        help="Replay a recorded run from its local input snapshots")
+    parser.add_argument('--start', default=None, help="First slate date of a batch run (YYYY-MM-DD)")
+    parser.add_argument('--end', default=None, help="Last slate date of a batch run; defaults to --start")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for a batch run")
+    parser.add_argument('--no-details', action='store_true', help="Skip matchup and recent-form details")
+    parser.add_argument('--baselines', default=None, metavar='NAME',
+                        help="Normalize against frozen league baselines instead of the slate's own")
+    parser.add_argument('--freeze-baselines', dest='freeze_baselines', default=None, metavar='NAME',
+                        help="Freeze the league baselines as of --start (or --date) under NAME and normalize against them")
+    args = parser.parse_args()
+    
     try:
-        run_daily_analysis()
+        baselines = args.baselines
+        if args.freeze_baselines:
+            freeze_baselines_as_of(args.freeze_baselines, args.start or args.date or datetime.now().strftime('%Y-%m-%d'))
+            baselines = args.freeze_baselines
+        if args.start:
+            run_date_range(args.start, args.end or args.start, args.workers, include_details=not args.no_details,
+                           baselines=baselines)
+        else:
+            use_frozen_baselines(baselines)
+            run_daily_analysis(args.date, args.as_of, include_details=not args.no_details)
         
     except Exception as e:
         print(f"Fatal error: {str(e)}")
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Keep everything the code under test caches out of the working tree
+os.environ.setdefault("K_MODEL_CACHE_DIR", tempfile.mkdtemp(prefix="k_model_cache_"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
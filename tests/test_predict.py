@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from models.predict import export_model, load_predictor, parity_check, sample_features
+from models.train_model import FEATURE_COLUMNS, MODEL_NAME
+
+TOLERANCE = 1e-4
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    model_dir = tmp_path_factory.mktemp("model")
+    features = sample_features(2000, seed=1)
+    rng = np.random.default_rng(1)
+    # Strikeout-scale counts: k_per_9 * estimated_ip / 9 plus noise
+    rate = np.nan_to_num(features[:, FEATURE_COLUMNS.index('k_per_9')], nan=8.5) * \
+        np.nan_to_num(features[:, FEATURE_COLUMNS.index('estimated_ip')], nan=5.0) / 9
+    labels = rng.poisson(rate)
+    booster = xgb.train(
+        {'objective': 'count:poisson', 'max_depth': 6, 'eta': 0.1, 'min_child_weight': 5},
+        xgb.DMatrix(features, labels, feature_names=FEATURE_COLUMNS), num_boost_round=100
+    )
+    booster.save_model(str(model_dir / MODEL_NAME))
+    kinds = set(export_model(str(model_dir / MODEL_NAME), str(model_dir))) | {'booster'}
+    return model_dir, booster, kinds
+
+
+def test_export_always_writes_flat_forest(exported):
+    _, _, kinds = exported
+    assert 'flat' in kinds
+
+
+@pytest.mark.parametrize("kind", ['compiled', 'native', 'flat', 'booster'])
+def test_predictor_matches_booster(exported, kind):
+    model_dir, booster, kinds = exported
+    if kind not in kinds:
+        pytest.skip(f"{kind} predictor not available here")
+    predictor = load_predictor(str(model_dir), prefer=kind)
+    # Includes missing values, which every tier must route the way XGBoost does
+    features = sample_features(500, seed=2)
+    result = parity_check(predictor, booster, features, tolerance=TOLERANCE)
+    assert result['rows'] == 500
+    assert result['max_abs_diff'] <= TOLERANCE
+
+
+def test_single_row_matches_batch(exported):
+    model_dir, _, _ = exported
+    predictor = load_predictor(str(model_dir))
+    features = sample_features(20, seed=3)
+    batch = predictor.predict(features)
+    rows = np.concatenate([predictor.predict(features[row:row + 1]) for row in range(len(features))])
+    np.testing.assert_allclose(rows, batch, atol=1e-6)
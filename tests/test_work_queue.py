@@ -0,0 +1,144 @@
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+import run_backtest
+from utils import work_queue
+from utils.data_loader import cache_path
+from utils.work_queue import LEASE_SECONDS, MAX_ATTEMPTS, WorkQueue
+
+SHARDS = 6
+TASKS_PER_SHARD = 10
+WORKERS = 4
+BATCH_SIZE = 4
+
+# Forked children inherit the monkeypatched modules and the test's cache directory
+context = multiprocessing.get_context('fork')
+
+
+def make_tasks():
+    tasks = []
+    for shard in range(SHARDS):
+        date = f"2024-05-{shard + 1:02d}"
+        for game in range(TASKS_PER_SHARD):
+            task_id = f"{date}:{game}"
+            tasks.append((task_id, date, {'task_id': task_id, 'date': date, 'game_pk': game, 'mlbam_id': game}))
+    return tasks
+
+
+def expire_clock():
+    # A clock whose claims are stamped far enough back that their lease has already run out
+    return SimpleNamespace(time=lambda: time.time() - LEASE_SECONDS - 1)
+
+
+def drain(path, results):
+    queue = WorkQueue(path)
+    worker = work_queue.worker_id()
+    while True:
+        batch = queue.claim(worker, BATCH_SIZE)
+        if not batch:
+            break
+        results.put([(task_id, task['date']) for task_id, task in batch])
+        queue.complete([task_id for task_id, _ in batch])
+
+
+def crash_after_claim(path, results):
+    work_queue.time = expire_clock()
+    batch = WorkQueue(path).claim(work_queue.worker_id(), BATCH_SIZE)
+    results.put([task_id for task_id, _ in batch])
+
+
+def fake_batch(queue, batch):
+    # Stands in for projecting: one row per claimed task
+    return pd.DataFrame([{**task, 'crashed': False} for _, task in batch])
+
+
+def crash_mid_batch(name, results):
+    work_queue.time = expire_clock()
+    batch = run_backtest.open_queue(name).claim(work_queue.worker_id(), BATCH_SIZE)
+    # The part is written but the worker dies before marking its tasks done
+    frame = pd.DataFrame([{**task, 'crashed': True} for _, task in batch])
+    frame.to_parquet(cache_path('backtest', name, 'parts', 'crashed.parquet'), index=False)
+    results.put([task_id for task_id, _ in batch])
+
+
+def run_processes(target, args, count):
+    processes = [context.Process(target=target, args=args) for _ in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+    return processes
+
+
+def collect(results):
+    collected = []
+    while not results.empty():
+        collected.append(results.get())
+    return collected
+
+
+def test_workers_claim_every_task_once(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    queue = WorkQueue(path)
+    assert queue.enqueue(make_tasks()) == SHARDS * TASKS_PER_SHARD
+    assert queue.enqueue(make_tasks()) == 0
+
+    results = context.Queue()
+    run_processes(drain, (path, results), WORKERS)
+    batches = collect(results)
+
+    claimed = [task_id for batch in batches for task_id, _ in batch]
+    assert len(claimed) == len(set(claimed)) == SHARDS * TASKS_PER_SHARD
+    assert all(len({shard for _, shard in batch}) == 1 for batch in batches)
+    assert queue.counts() == {'done': SHARDS * TASKS_PER_SHARD}
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    queue = WorkQueue(path)
+    queue.enqueue(make_tasks())
+
+    results = context.Queue()
+    run_processes(crash_after_claim, (path, results), 1)
+    abandoned = collect(results)[0]
+    assert len(abandoned) == BATCH_SIZE
+    assert queue.counts() == {'claimed': BATCH_SIZE, 'pending': SHARDS * TASKS_PER_SHARD - BATCH_SIZE}
+
+    # The earliest shard is claimable again, so the abandoned tasks come back first
+    assert [task_id for task_id, _ in queue.claim('next', BATCH_SIZE)] == abandoned
+
+
+def test_task_fails_after_max_attempts(tmp_path, monkeypatch):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'))
+    queue.enqueue(make_tasks()[:1])
+    # Each claim happens a full lease after the one before it
+    ticks = iter(range(MAX_ATTEMPTS + 1))
+    monkeypatch.setattr(work_queue, 'time', SimpleNamespace(time=lambda: next(ticks) * (LEASE_SECONDS + 1)))
+    for attempt in range(MAX_ATTEMPTS):
+        assert len(queue.claim(f"worker-{attempt}", BATCH_SIZE)) == 1
+    assert queue.claim('last', BATCH_SIZE) == []
+    assert queue.counts() == {'failed': 1}
+    assert queue.errors() == [(make_tasks()[0][0], 'lease expired')]
+
+
+def test_workers_resume_crashed_batch_and_merge(tmp_path, monkeypatch):
+    name = tmp_path.name
+    monkeypatch.setattr(run_backtest, 'run_batch', fake_batch)
+    tasks = make_tasks()
+    run_backtest.open_queue(name).enqueue(tasks)
+
+    results = context.Queue()
+    run_processes(crash_mid_batch, (name, results), 1)
+    abandoned = collect(results)[0]
+    run_processes(run_backtest.run_worker, (name, BATCH_SIZE), WORKERS)
+
+    assert run_backtest.open_queue(name).counts() == {'done': len(tasks)}
+    merged = pd.read_parquet(run_backtest.merge_results(name))
+    assert sorted(merged['task_id']) == sorted(task_id for task_id, _, _ in tasks)
+    # The re-run of the crashed batch is written later, so it replaces the stale part's rows
+    assert not merged['crashed'].any()
+    assert set(abandoned) <= set(merged['task_id'])
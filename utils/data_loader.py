@@ -0,0 +1,380 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from glob import glob
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pybaseball import batting_stats, pitching_stats
+from pybaseball.datasources.fangraphs import FangraphsBattingStatsTable, FangraphsDataTable, FangraphsPitchingStatsTable
+
+# Root directory for locally cached data (archives, snapshots, derived tables)
+CACHE_DIR = os.environ.get("K_MODEL_CACHE_DIR", "cache")
+
+
+def cache_path(*parts: str) -> str:
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+class SnapshotMissingError(LookupError):
+    pass
+
+
+# Snapshot store: every input a run reads (schedule, lineups, stats, props, registry,
+# and locally maintained tables such as the statcast aggregates and lineup archive)
+# is stored once under the hash of its serialized content. A run records which
+# snapshot ids it read in a manifest, so it can be replayed exactly, offline.
+
+def _object_path(snapshot_id: str, ext: str) -> str:
+    return cache_path('snapshots', 'objects', f"{snapshot_id}.{ext}")
+
+
+def _store(data: bytes, ext: str) -> str:
+    snapshot_id = hashlib.sha256(data).hexdigest()[:20]
+    path = _object_path(snapshot_id, ext)
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return snapshot_id
+
+
+def put_json(obj: Any) -> str:
+    return _store(json.dumps(obj, sort_keys=True, default=str).encode(), 'json')
+
+
+def get_json(snapshot_id: str) -> Any:
+    path = _object_path(snapshot_id, 'json')
+    if not os.path.exists(path):
+        raise SnapshotMissingError(f"Snapshot {snapshot_id} not found in local storage")
+    with open(path) as f:
+        return json.load(f)
+
+
+def put_frame(frame: pd.DataFrame) -> str:
+    # Uncompressed Arrow IPC so readers can memory-map the file instead of copying it
+    sink = pa.BufferOutputStream()
+    feather.write_feather(frame.reset_index(drop=True), sink, compression='uncompressed')
+    return _store(sink.getvalue().to_pybytes(), 'arrow')
+
+
+def get_frame(snapshot_id: str) -> pd.DataFrame:
+    """
+    Memory-mapped load: numeric columns stay backed by the OS page cache, so worker
+    processes reading the same snapshot share one physical copy.
+    """
+    path = _object_path(snapshot_id, 'arrow')
+    if not os.path.exists(path):
+        if os.path.exists(_object_path(snapshot_id, 'pkl')):
+            return pd.read_pickle(_object_path(snapshot_id, 'pkl'))
+        raise SnapshotMissingError(f"Snapshot {snapshot_id} not found in local storage")
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+
+class RunContext:
+    """
+    Snapshot manifest for one run. In 'live' mode inputs are fetched (or reused) and
+    recorded; in 'replay' mode every input must come from the recorded manifest and
+    nothing is fetched.
+    """
+
+    def __init__(self, run_id: str, mode: str = 'live', run_date: Optional[str] = None,
+                 manifest: Optional[Dict[str, str]] = None):
+        self.run_id = run_id
+        self.mode = mode
+        self.run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        self.manifest: Dict[str, str] = dict(manifest or {})
+
+    def save(self) -> str:
+        path = cache_path('runs', f"{self.run_id}.json")
+        with open(path, 'w') as f:
+            json.dump({'run_id': self.run_id, 'run_date': self.run_date, 'snapshots': self.manifest}, f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, run_id: str) -> 'RunContext':
+        path = cache_path('runs', f"{run_id}.json")
+        if not os.path.exists(path):
+            raise SnapshotMissingError(f"No recorded run '{run_id}'")
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['run_id'], 'replay', data['run_date'], data['snapshots'])
+
+
+_run = RunContext(datetime.now().strftime('%Y%m%dT%H%M%S'))
+
+
+def start_run(run_date: Optional[str] = None) -> RunContext:
+    global _run
+    run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+    # Prefixed with the slate date so runs started together for different dates never collide
+    _run = RunContext(f"{run_date.replace('-', '')}_{datetime.now().strftime('%Y%m%dT%H%M%S%f')}", 'live', run_date)
+    return _run
+
+
+def start_replay(run_id: str) -> RunContext:
+    global _run
+    _run = RunContext.load(run_id)
+    return _run
+
+
+def current_run() -> RunContext:
+    return _run
+
+
+def get_run_date() -> str:
+    return _run.run_date
+
+
+def _latest_path(reuse_key: str) -> str:
+    return cache_path('snapshots', 'latest', f"{reuse_key}.txt")
+
+
+def recorded_snapshot_id(key: str, run_date: str) -> Optional[str]:
+    """
+    The snapshot id the most recent saved run for run_date recorded for key, or None.
+    """
+    for path in sorted(glob(cache_path('runs', f"{run_date.replace('-', '')}_*.json")), reverse=True):
+        with open(path) as f:
+            snapshots = json.load(f).get('snapshots', {})
+        if key in snapshots:
+            return snapshots[key]
+    return None
+
+
+# Concurrent callers (prefetch workers, lazily evaluated features) fetch a key once:
+# later callers wait on its lock and then find it in the manifest
+_key_locks: Dict[str, threading.Lock] = {}
+_key_locks_guard = threading.Lock()
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _key_locks_guard:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _snapshot(key: str, fetch: Callable[[], Any], put: Callable, get: Callable,
+              reuse_key: Optional[str], refresh: bool = False) -> Tuple[str, Any]:
+    with _key_lock(key):
+        return _locked_snapshot(key, fetch, put, get, reuse_key, refresh)
+
+
+def _locked_snapshot(key: str, fetch: Callable[[], Any], put: Callable, get: Callable,
+                     reuse_key: Optional[str], refresh: bool = False) -> Tuple[str, Any]:
+    if key in _run.manifest and not (refresh and _run.mode == 'live'):
+        snapshot_id = _run.manifest[key]
+        return snapshot_id, get(snapshot_id)
+    if _run.mode == 'replay':
+        raise SnapshotMissingError(f"Run {_run.run_id} has no snapshot for '{key}'")
+
+    if reuse_key and not refresh and os.path.exists(_latest_path(reuse_key)):
+        with open(_latest_path(reuse_key)) as f:
+            snapshot_id = f.read().strip()
+        try:
+            value = get(snapshot_id)
+            _run.manifest[key] = snapshot_id
+            return snapshot_id, value
+        except SnapshotMissingError:
+            pass
+
+    value = fetch()
+    snapshot_id = put(value)
+    if reuse_key:
+        with open(_latest_path(reuse_key), 'w') as f:
+            f.write(snapshot_id)
+    _run.manifest[key] = snapshot_id
+    return snapshot_id, value
+
+
+def snapshot_json(key: str, fetch: Callable[[], Any], reuse_key: Optional[str] = None,
+                  refresh: bool = False) -> Any:
+    """
+    JSON-serializable input (API payloads, props) pinned to the current run.
+
+    Within a run the same key is fetched at most once. reuse_key lets live runs share
+    a snapshot across runs (e.g. once per day) instead of refetching; refresh fetches
+    anew in a live run regardless.
+    """
+    return _snapshot(key, fetch, put_json, get_json, reuse_key, refresh)[1]
+
+
+def snapshot_frame(key: str, fetch: Callable[[], pd.DataFrame], reuse_key: Optional[str] = None,
+                   refresh: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    DataFrame input pinned to the current run. Returns (snapshot_id, frame).
+    """
+    return _snapshot(key, fetch, put_frame, get_frame, reuse_key, refresh)
+
+
+_snapshots: Dict[str, pd.DataFrame] = {}
+
+
+def load_snapshot_frame(key: str, fetch: Callable[[], pd.DataFrame], reuse_key: Optional[str] = None,
+                        refresh: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    snapshot_frame for inputs read many times per run: within a process the loaded
+    frame is shared per snapshot id, so callers must not mutate it.
+    """
+    if not refresh and key in _run.manifest and _run.manifest[key] in _snapshots:
+        snapshot_id = _run.manifest[key]
+        return snapshot_id, _snapshots[snapshot_id]
+    snapshot_id, frame = snapshot_frame(key, fetch, reuse_key, refresh)
+    _snapshots.setdefault(snapshot_id, frame)
+    return snapshot_id, _snapshots[snapshot_id]
+
+
+def _file_reuse_key(key: str, path: str) -> str:
+    # A local file's snapshot is reused until the file is rewritten
+    return f"{key.replace(':', '_')}_{os.stat(path).st_mtime_ns}"
+
+
+def pin_local_frame(key: str, path: str, read: Callable[[str], pd.DataFrame] = pd.read_parquet) -> Optional[Tuple[str, pd.DataFrame]]:
+    """
+    A locally maintained table (statcast aggregates, lineup archive) pinned to the
+    current run, so a replay reads the version the original run saw even after the
+    file has been rebuilt. None when the file doesn't exist (or, in a replay, when
+    the original run didn't read it).
+    """
+    if key not in _run.manifest and (_run.mode == 'replay' or not os.path.exists(path)):
+        return None
+    reuse_key = _file_reuse_key(key, path) if os.path.exists(path) else None
+    return load_snapshot_frame(key, lambda: read(path), reuse_key)
+
+
+def pin_local_json(key: str, path: str) -> Optional[Any]:
+    """
+    JSON counterpart of pin_local_frame, for fitted artifacts like the calibrator.
+    """
+    if key not in _run.manifest and (_run.mode == 'replay' or not os.path.exists(path)):
+        return None
+
+    def read():
+        with open(path) as f:
+            return json.load(f)
+
+    reuse_key = _file_reuse_key(key, path) if os.path.exists(path) else None
+    return snapshot_json(key, read, reuse_key)
+
+
+# The only FanGraphs columns anything downstream reads; everything else is dropped at load
+STATS_COLUMNS = {
+    'batting': [
+        'IDfg', 'Name', 'PA', 'SO', 'wOBA', 'OBP', 'SLG', 'ISO', 'SwStr%', 'Contact% (sc)',
+        'wFA (sc)', 'FA% (sc)', 'wSL (sc)', 'SL% (sc)', 'wCH (sc)', 'CH% (sc)',
+        'wCU (sc)', 'CU% (sc)', 'wFC (sc)', 'FC% (sc)'
+    ],
+    'pitching': [
+        'IDfg', 'Name', 'G', 'IP', 'TBF', 'Pitches', 'SO', 'BB', 'H', 'K/9', 'Stuff+', 'Location+',
+        'FA% (pi)', 'FC% (pi)', 'SL% (pi)', 'CH% (pi)', 'CU% (pi)', 'SI% (pi)', 'vFA (pi)'
+    ]
+}
+COUNT_STATS = {'G', 'PA', 'TBF', 'Pitches', 'SO', 'BB', 'H'}
+
+
+def compact_stats(kind: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Project a FanGraphs frame to STATS_COLUMNS and downcast: counts to int16 (int32 if
+    they don't fit), rates to float32, ids to int32.
+    """
+    columns = {}
+    for column in STATS_COLUMNS[kind]:
+        if column not in frame.columns:
+            continue
+        if column == 'Name':
+            columns[column] = frame[column].astype(str)
+            continue
+        values = pd.to_numeric(frame[column], errors='coerce')
+        if column == 'IDfg':
+            columns[column] = values.fillna(-1).astype('int32')
+        elif column in COUNT_STATS and values.notna().all():
+            columns[column] = values.astype('int16' if values.abs().max() <= np.iinfo(np.int16).max else 'int32')
+        else:
+            columns[column] = values.astype('float32')
+    return pd.DataFrame(columns).reset_index(drop=True)
+
+
+def _fetch_stats(kind: str, season: int) -> pd.DataFrame:
+    if kind == 'batting':
+        frame = batting_stats(season, qual=0)
+    elif kind == 'pitching':
+        frame = pitching_stats(season, qual=1)
+    else:
+        raise ValueError(f"Unknown stats kind: {kind}")
+    return compact_stats(kind, frame)
+
+
+STATS_TABLES = {'batting': (FangraphsBattingStatsTable, 0), 'pitching': (FangraphsPitchingStatsTable, 1)}
+# FanGraphs' leaderboard month value for an arbitrary startdate/enddate range
+DATE_RANGE_MONTH = 1000
+
+
+class _DateRangeAccessor:
+    """
+    Wraps a pybaseball FanGraphs table's HTML accessor to restrict its leaderboard
+    query to a date range, which pybaseball doesn't expose.
+    """
+
+    def __init__(self, accessor, start_date: str, end_date: str):
+        self.accessor = accessor
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def get_tabular_data_from_options(self, base_url: str, query_params: Dict, **kwargs) -> pd.DataFrame:
+        query_params = {**query_params, 'month': DATE_RANGE_MONTH, 'startdate': self.start_date, 'enddate': self.end_date}
+        return self.accessor.get_tabular_data_from_options(base_url, query_params, **kwargs)
+
+
+def _fetch_stats_through(kind: str, season: int, through: str) -> pd.DataFrame:
+    """
+    Season stats counting only games through a past day (YYYY-MM-DD).
+    """
+    if kind not in STATS_TABLES:
+        raise ValueError(f"Unknown stats kind: {kind}")
+    table_class, qual = STATS_TABLES[kind]
+    table = table_class()
+    table.html_accessor = _DateRangeAccessor(table.html_accessor, f"{season}-03-01", through)
+    # The base fetch, not the table's own, which caches results keyed only on the season
+    return compact_stats(kind, FangraphsDataTable.fetch(table, season, qual=qual))
+
+
+def load_stats_snapshot(kind: str, season: int) -> Tuple[str, pd.DataFrame]:
+    """
+    Load a league-wide stats frame ('batting' or 'pitching') for a season.
+
+    Live runs pull each frame at most once per run date; replays load the snapshot
+    the original run recorded. FanGraphs' default leaderboard is season-to-date as of
+    now, so a live run dated before today instead pulls the season only through the
+    day before its date (unless a frame was already recorded for that date), keeping
+    later games out of past slates and backtests. Frames hold only STATS_COLUMNS in
+    compact dtypes and are memory-mapped from the snapshot store. Within a process the
+    loaded frame is shared, so callers must not mutate it.
+
+    Returns:
+        (snapshot_id, frame)
+    """
+    run_date = _run.run_date
+    reuse_key = f"{kind}_{season}_{run_date.replace('-', '')}"
+    past = season == int(run_date[:4]) and run_date < datetime.now().strftime('%Y-%m-%d')
+
+    def fetch():
+        if past:
+            through = (datetime.strptime(run_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+            print(f"Fetching {kind} stats for {season} through {through}...")
+            return _fetch_stats_through(kind, season, through)
+        print(f"Fetching {kind} stats for {season}...")
+        return _fetch_stats(kind, season)
+
+    return load_snapshot_frame(f"{kind}:{season}", fetch, reuse_key=reuse_key)
+
+
+def load_batting_stats(season: int) -> pd.DataFrame:
+    return load_stats_snapshot('batting', season)[1]
+
+
+def load_pitching_stats(season: int) -> pd.DataFrame:
+    return load_stats_snapshot('pitching', season)[1]
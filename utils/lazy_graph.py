@@ -0,0 +1,33 @@
+from collections import Counter
+from typing import Any, Callable, Dict, Tuple
+
+
+class LazyGraph:
+    """
+    Demand-driven feature graph. Nodes are functions registered by name that take the
+    graph plus a key and pull their own inputs with graph.get(); a node runs only
+    when something downstream asks for it, and at most once per key.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, Callable[..., Any]] = {}
+        self._values: Dict[Tuple[str, Tuple], Any] = {}
+        self.evaluated: Counter = Counter()
+
+    def node(self, name: str) -> Callable:
+        def register(fn: Callable[..., Any]) -> Callable[..., Any]:
+            self._nodes[name] = fn
+            return fn
+        return register
+
+    def get(self, name: str, *key: Any) -> Any:
+        cache_key = (name, key)
+        if cache_key not in self._values:
+            if name not in self._nodes:
+                raise KeyError(f"No feature node named '{name}'")
+            self._values[cache_key] = self._nodes[name](self, *key)
+            self.evaluated[name] += 1
+        return self._values[cache_key]
+
+    def summary(self) -> str:
+        return ', '.join(f"{name} x{count}" for name, count in sorted(self.evaluated.items())) or 'nothing'
@@ -0,0 +1,356 @@
+import os
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.batters import TEAM_NAME_TO_ABBR
+from utils.data_loader import cache_path, current_run, pin_local_frame, snapshot_json
+
+SCHEDULE_URL = "https://statsapi.mlb.com/api/v1/schedule"
+BOXSCORE_URL = "https://statsapi.mlb.com/api/v1/game/{game_pk}/boxscore"
+
+GAME_COLUMNS = ['game_pk', 'date', 'game_time', 'home', 'away', 'home_pitcher_id', 'away_pitcher_id']
+LINEUP_COLUMNS = ['game_pk', 'date', 'team', 'slot', 'mlbam_id']
+PEOPLE_COLUMNS = ['mlbam_id', 'name']
+ARCHIVE_TABLES = ('games', 'lineups', 'people')
+# Box-score pitching line fields kept per pitcher
+PITCHING_LINE_FIELDS = ('strikeOuts', 'outs', 'baseOnBalls', 'hits')
+
+
+def date_to_int(date_str: str) -> int:
+    return int(date_str.replace('-', ''))
+
+
+def season_dir(season: int) -> str:
+    return os.path.dirname(cache_path('lineups', str(season), 'games.parquet'))
+
+
+def fetch_schedule_range(start_date: str, end_date: str, game_types: str = "R") -> Dict:
+    params = {
+        'sportId': 1,
+        'startDate': start_date,
+        'endDate': end_date,
+        'gameType': game_types,
+        'hydrate': 'probablePitcher,lineups'
+    }
+    response = requests.get(SCHEDULE_URL, params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_pitching_lines(game_pk: int) -> Dict[str, Dict[str, int]]:
+    """
+    Every pitcher's line in a game's box score as {mlbam_id: {field: value}} over
+    PITCHING_LINE_FIELDS (ids are strings so the result round-trips through JSON).
+    """
+    response = requests.get(BOXSCORE_URL.format(game_pk=game_pk), timeout=30)
+    response.raise_for_status()
+    teams = response.json().get('teams', {})
+    lines = {}
+    for side in ('home', 'away'):
+        team = teams.get(side, {})
+        for pitcher_id in team.get('pitchers', []):
+            pitching = team.get('players', {}).get(f"ID{pitcher_id}", {}).get('stats', {}).get('pitching', {})
+            lines[str(pitcher_id)] = {field: int(pitching.get(field, 0)) for field in PITCHING_LINE_FIELDS}
+    return lines
+
+
+def get_pitching_lines(game_pk: int) -> Dict[str, Dict[str, int]]:
+    """
+    A game's pitching lines pinned to the current run. A final box score doesn't
+    change, so live runs share one snapshot per game.
+    """
+    return snapshot_json(f"boxscore:{game_pk}", lambda: fetch_pitching_lines(game_pk),
+                         reuse_key=f"boxscore_{game_pk}")
+
+
+def parse_schedule_payload(data: Dict) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Flatten a statsapi schedule payload (hydrated with probablePitcher and lineups)
+    into compact games, lineups and people tables.
+    """
+    games, lineups, people = [], [], {}
+
+    for date_block in data.get('dates', []):
+        for game in date_block.get('games', []):
+            game_pk = game.get('gamePk')
+            date_int = date_to_int(game.get('officialDate') or date_block.get('date', ''))
+            teams = game.get('teams', {})
+
+            abbrs = {}
+            pitcher_ids = {}
+            for side in ('home', 'away'):
+                team_name = teams.get(side, {}).get('team', {}).get('name', '')
+                abbrs[side] = TEAM_NAME_TO_ABBR.get(team_name, team_name)
+                probable = teams.get(side, {}).get('probablePitcher') or {}
+                pitcher_ids[side] = probable.get('id', 0)
+                if probable.get('id'):
+                    people[probable['id']] = probable.get('fullName', '')
+
+            games.append((
+                game_pk, date_int, game.get('gameDate', ''),
+                abbrs['home'], abbrs['away'],
+                pitcher_ids['home'], pitcher_ids['away']
+            ))
+
+            game_lineups = game.get('lineups', {})
+            for side, key in (('home', 'homePlayers'), ('away', 'awayPlayers')):
+                for slot, player in enumerate(game_lineups.get(key, []), start=1):
+                    lineups.append((game_pk, date_int, abbrs[side], slot, player.get('id', 0)))
+                    people[player.get('id', 0)] = player.get('fullName', '')
+
+    games_df = pd.DataFrame(games, columns=GAME_COLUMNS)
+    lineups_df = pd.DataFrame(lineups, columns=LINEUP_COLUMNS)
+    people_df = pd.DataFrame(list(people.items()), columns=PEOPLE_COLUMNS)
+    return compact_tables(games_df, lineups_df, people_df)
+
+
+def compact_tables(games: pd.DataFrame, lineups: pd.DataFrame, people: pd.DataFrame):
+    games = games.astype({
+        'game_pk': 'int32', 'date': 'int32',
+        'home_pitcher_id': 'int32', 'away_pitcher_id': 'int32'
+    })
+    games['game_time'] = pd.to_datetime(games['game_time'], utc=True, errors='coerce')
+    games['home'] = games['home'].astype('category')
+    games['away'] = games['away'].astype('category')
+
+    lineups = lineups.astype({'game_pk': 'int32', 'date': 'int32', 'slot': 'int8', 'mlbam_id': 'int32'})
+    lineups['team'] = lineups['team'].astype('category')
+
+    people = people.astype({'mlbam_id': 'int32'})
+    return games, lineups, people
+
+
+def _chunk_ranges(season: int, chunk_days: int) -> List[Tuple[str, str]]:
+    start = datetime(season, 3, 1)
+    end = datetime(season, 11, 30)
+    ranges = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        ranges.append((start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+        start = chunk_end + timedelta(days=1)
+    return ranges
+
+
+def _chunk_dir(season: int) -> str:
+    return os.path.join(season_dir(season), 'chunks')
+
+
+def _chunk_path(season: int, start_date: str, end_date: str) -> str:
+    return cache_path('lineups', str(season), 'chunks', f"{start_date}_{end_date}")
+
+
+def _fetch_chunk(season: int, start_date: str, end_date: str, game_types: str) -> int:
+    games, lineups, people = parse_schedule_payload(fetch_schedule_range(start_date, end_date, game_types))
+    path = _chunk_path(season, start_date, end_date)
+    games.to_parquet(f"{path}.games.parquet", index=False)
+    lineups.to_parquet(f"{path}.lineups.parquet", index=False)
+    people.to_parquet(f"{path}.people.parquet", index=False)
+
+    # Chunks that are still in the future or in progress get re-fetched next time
+    if end_date < datetime.now().strftime('%Y-%m-%d'):
+        open(f"{path}.done", 'w').close()
+    return len(games)
+
+
+def download_season(
+    season: int,
+    chunk_days: int = 7,
+    max_workers: int = 8,
+    game_types: str = "R"
+) -> None:
+    """
+    Download schedule, lineup and probable pitcher payloads for a whole season.
+
+    The season is split into date chunks fetched in parallel. Completed chunks are
+    marked on disk, so an interrupted download resumes where it stopped.
+    """
+    pending = [
+        (start, end) for start, end in _chunk_ranges(season, chunk_days)
+        if not os.path.exists(f"{_chunk_path(season, start, end)}.done")
+    ]
+    print(f"Downloading {len(pending)} schedule chunks for {season}")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_chunk, season, start, end, game_types): (start, end)
+            for start, end in pending
+        }
+        for future in as_completed(futures):
+            start, end = futures[future]
+            try:
+                n_games = future.result()
+                print(f"Archived {n_games} games for {start} to {end}")
+            except Exception as e:
+                failed += 1
+                print(f"Error archiving {start} to {end}: {str(e)}")
+
+    if failed:
+        print(f"{failed} chunks failed for {season}; re-run to resume")
+    compact_season(season)
+
+
+def compact_season(season: int) -> None:
+    chunk_dir = _chunk_dir(season)
+    if not os.path.isdir(chunk_dir):
+        print(f"No archived chunks found for {season}")
+        return
+
+    tables = {'games': [], 'lineups': [], 'people': []}
+    for filename in sorted(os.listdir(chunk_dir)):
+        for name in tables:
+            if filename.endswith(f".{name}.parquet"):
+                tables[name].append(pd.read_parquet(os.path.join(chunk_dir, filename)))
+
+    if not tables['games']:
+        print(f"No archived chunks found for {season}")
+        return
+
+    games = pd.concat(tables['games'], ignore_index=True).drop_duplicates('game_pk', keep='last')
+    lineups = pd.concat(tables['lineups'], ignore_index=True).drop_duplicates(
+        ['game_pk', 'team', 'slot'], keep='last'
+    )
+    people = pd.concat(tables['people'], ignore_index=True).drop_duplicates('mlbam_id', keep='last')
+    games, lineups, people = compact_tables(games, lineups, people)
+
+    directory = season_dir(season)
+    games.sort_values(['date', 'game_pk']).to_parquet(os.path.join(directory, 'games.parquet'), index=False)
+    lineups.sort_values(['date', 'team', 'game_pk', 'slot']).to_parquet(
+        os.path.join(directory, 'lineups.parquet'), index=False
+    )
+    people.to_parquet(os.path.join(directory, 'people.parquet'), index=False)
+    print(f"Compacted {len(games)} games and {len(lineups)} lineup slots for {season}")
+
+
+def archive_tables(season: int) -> Optional[Dict[str, Tuple[str, pd.DataFrame]]]:
+    """
+    The season's compacted tables as {name: (snapshot_id, frame)}, pinned to the
+    current run so a replay sees the archive as it was. None when the season hasn't
+    been downloaded.
+    """
+    tables = {}
+    for name in ARCHIVE_TABLES:
+        pinned = pin_local_frame(f"lineups:{name}:{season}", os.path.join(season_dir(season), f"{name}.parquet"))
+        if pinned is None:
+            return None
+        tables[name] = pinned
+    return tables
+
+
+class LineupArchive:
+    """
+    Indexed, in-memory view over archived seasons.
+
+    Lineups are indexed by (team, yyyymmdd) so a lookup is a single dict access.
+    Doubleheaders resolve to the first game of the day unless a game_pk is given.
+    """
+
+    def __init__(self, seasons: List[int]):
+        self.games = pd.DataFrame(columns=GAME_COLUMNS)
+        self.lineups = pd.DataFrame(columns=LINEUP_COLUMNS)
+        self.names: Dict[int, str] = {}
+        self._by_team_date: Dict[Tuple[str, int], np.ndarray] = {}
+        self._by_game_team: Dict[Tuple[int, str], np.ndarray] = {}
+        self._starters: Dict[Tuple[str, int], int] = {}
+        self.load(seasons)
+
+    def load(self, seasons: List[int]) -> None:
+        games = [self.games] if len(self.games) else []
+        lineups = [self.lineups] if len(self.lineups) else []
+        people = []
+        for season in seasons:
+            tables = archive_tables(season)
+            if tables is None:
+                print(f"No lineup archive for {season}; run download_season({season}) first")
+                continue
+            games.append(tables['games'][1])
+            lineups.append(tables['lineups'][1])
+            people.append(tables['people'][1])
+
+        if games:
+            self.games = pd.concat(games, ignore_index=True)
+            self.lineups = pd.concat(lineups, ignore_index=True)
+        for table in people:
+            self.names.update(zip(table['mlbam_id'].tolist(), table['name'].tolist()))
+        self._build_index()
+
+    def _build_index(self) -> None:
+        self._by_team_date.clear()
+        self._by_game_team.clear()
+        self._starters.clear()
+
+        ordered = self.lineups.sort_values(['date', 'game_pk', 'team', 'slot'])
+        game_pks = ordered['game_pk'].to_numpy()
+        teams = ordered['team'].astype(str).to_numpy()
+        dates = ordered['date'].to_numpy()
+        ids = ordered['mlbam_id'].to_numpy(dtype=np.int32)
+
+        if len(ids):
+            # Rows are sorted, so each (game, team) lineup is a contiguous slice
+            boundaries = np.flatnonzero((game_pks[1:] != game_pks[:-1]) | (teams[1:] != teams[:-1])) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(ids)]))
+            for start, end in zip(starts, ends):
+                team, date_int, game_pk = teams[start], int(dates[start]), int(game_pks[start])
+                self._by_game_team[(game_pk, team)] = ids[start:end]
+                self._by_team_date.setdefault((team, date_int), ids[start:end])
+
+        for row in self.games.sort_values(['date', 'game_pk']).itertuples(index=False):
+            self._starters.setdefault((str(row.home), int(row.date)), int(row.home_pitcher_id))
+            self._starters.setdefault((str(row.away), int(row.date)), int(row.away_pitcher_id))
+
+    def lineup_ids(self, team_abbr: str, date_str: str, game_pk: Optional[int] = None) -> Optional[np.ndarray]:
+        if game_pk is not None:
+            return self._by_game_team.get((game_pk, team_abbr))
+        return self._by_team_date.get((team_abbr, date_to_int(date_str)))
+
+    def lineup(self, team_abbr: str, date_str: str, game_pk: Optional[int] = None) -> List[Dict]:
+        ids = self.lineup_ids(team_abbr, date_str, game_pk)
+        if ids is None:
+            return []
+        return [
+            {'name': self.names.get(int(mlbam_id), ''), 'team': team_abbr, 'mlbam_id': int(mlbam_id)}
+            for mlbam_id in ids
+        ]
+
+    def probable_pitcher_id(self, team_abbr: str, date_str: str) -> Optional[int]:
+        pitcher_id = self._starters.get((team_abbr, date_to_int(date_str)))
+        return pitcher_id or None
+
+
+# season -> (snapshot ids of its tables, archive)
+_archives: Dict[int, Tuple[Tuple[str, ...], LineupArchive]] = {}
+# season -> (run, archive) for the run that last resolved it. Tables stay pinned for the
+# rest of a run, so later lookups in that run skip re-resolving the snapshots
+_run_archives: Dict[int, Tuple[Tuple[str, str], LineupArchive]] = {}
+
+
+def archive_version(season: int) -> Optional[Tuple[str, ...]]:
+    tables = archive_tables(season)
+    if tables is None:
+        return None
+    return tuple(snapshot_id for snapshot_id, _ in tables.values())
+
+
+def get_archive(season: int) -> Optional[LineupArchive]:
+    run = (current_run().run_id, current_run().mode)
+    if season in _run_archives and _run_archives[season][0] == run:
+        return _run_archives[season][1]
+    version = archive_version(season)
+    if version is None:
+        return None
+    if season not in _archives or _archives[season][0] != version:
+        _archives[season] = (version, LineupArchive([season]))
+    _run_archives[season] = (run, _archives[season][1])
+    return _archives[season][1]
+
+
+def get_archived_lineup(team_abbr: str, date_str: str, game_pk: Optional[int] = None) -> List[Dict]:
+    archive = get_archive(int(date_str[:4]))
+    if archive is None:
+        return []
+    return archive.lineup(team_abbr, date_str, game_pk)
@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import json
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from features.contextual import apply_contextual_adjustments
+from features.markets import MARKETS
+from features.scenarios import LineupScenario
+from features.team_profiles import get_projected_lineup
+from utils.data_loader import cache_path, put_json
+from utils.lineup_archive import fetch_schedule_range, parse_schedule_payload
+from utils.player_registry import mlbam_to_fangraphs
+
+# Lineups post one to four hours before first pitch; poll hard inside that window,
+# lazily outside it, and stop watching a game once it has started.
+LINEUP_WINDOW_MINUTES = 240
+PENDING_POLL_SECONDS = 120
+POSTED_POLL_SECONDS = 600
+MIN_POLL_SECONDS = 60
+MAX_POLL_SECONDS = 1800
+
+
+def json_default(value: Any) -> Any:
+    """
+    json.dumps default for event payloads: numpy scalars and arrays (ids, counts and
+    projections read out of frames) become native numbers and lists, not strings.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+
+def poll_interval(games: pd.DataFrame, posted: Dict[Tuple[int, str], bool], now: pd.Timestamp) -> Optional[float]:
+    """
+    Seconds until the next schedule poll, driven by the game that needs it soonest.
+    Returns None once every game on the slate has started.
+    """
+    interval = None
+    for game_pk, game_time, home, away in games[['game_pk', 'game_time', 'home', 'away']].itertuples(index=False):
+        if pd.isna(game_time) or game_time <= now:
+            continue
+        minutes_to_start = (game_time - now).total_seconds() / 60
+        if posted.get((game_pk, home)) and posted.get((game_pk, away)):
+            # Both lineups are in; only late scratches can still change
+            wait = POSTED_POLL_SECONDS
+        elif minutes_to_start <= LINEUP_WINDOW_MINUTES:
+            wait = PENDING_POLL_SECONDS
+        else:
+            wait = (minutes_to_start - LINEUP_WINDOW_MINUTES) * 60
+        wait = min(wait, (game_time - now).total_seconds())
+        interval = wait if interval is None else min(interval, wait)
+
+    if interval is None:
+        return None
+    return float(min(max(interval, MIN_POLL_SECONDS), MAX_POLL_SECONDS))
+
+
+class SlateState:
+    """
+    Last seen probable pitchers and lineups for each game on the slate. diff() compares a
+    new poll against it and returns change events naming the pitchers to re-project.
+    """
+
+    def __init__(self):
+        self.pitchers: Dict[Tuple[int, str], int] = {}
+        self.lineups: Dict[Tuple[int, str], Tuple[int, ...]] = {}
+
+    def posted(self) -> Dict[Tuple[int, str], bool]:
+        return {key: len(lineup) > 0 for key, lineup in self.lineups.items()}
+
+    def diff(self, games: pd.DataFrame, lineups: pd.DataFrame, people: Dict[int, str]) -> List[Dict]:
+        events = []
+        by_team = {
+            key: tuple(group.sort_values('slot')['mlbam_id'].tolist())
+            for key, group in lineups.groupby(['game_pk', 'team'], observed=True)
+        }
+
+        for game in games.itertuples(index=False):
+            sides = {'home': (game.home, game.away, game.home_pitcher_id), 'away': (game.away, game.home, game.away_pitcher_id)}
+            for side, (team, opponent, pitcher_id) in sides.items():
+                key = (game.game_pk, team)
+                previous_pitcher = self.pitchers.get(key, 0)
+                if pitcher_id != previous_pitcher:
+                    if previous_pitcher:
+                        events.append({
+                            'event': 'pitcher_scratched', 'game_pk': game.game_pk, 'team': team,
+                            'scratched': people.get(previous_pitcher, str(previous_pitcher)),
+                            'pitcher': people.get(pitcher_id) if pitcher_id else None
+                        })
+                    elif pitcher_id:
+                        events.append({
+                            'event': 'pitcher_announced', 'game_pk': game.game_pk, 'team': team,
+                            'pitcher': people.get(pitcher_id, str(pitcher_id))
+                        })
+                    self.pitchers[key] = pitcher_id
+
+                lineup = by_team.get(key, ())
+                previous_lineup = self.lineups.get(key, ())
+                if lineup and lineup != previous_lineup:
+                    # A lineup affects the pitcher facing it, i.e. the opponent's starter
+                    events.append({
+                        'event': 'lineup_changed' if previous_lineup else 'lineup_posted',
+                        'game_pk': game.game_pk, 'team': team,
+                        'pitcher_team': opponent,
+                        'changed_slots': [
+                            slot + 1 for slot in range(max(len(lineup), len(previous_lineup)))
+                            if lineup[slot:slot + 1] != previous_lineup[slot:slot + 1]
+                        ]
+                    })
+                if lineup or key not in self.lineups:
+                    self.lineups[key] = lineup
+        return events
+
+
+def affected_pitchers(events: List[Dict]) -> List[Tuple[int, str]]:
+    """
+    (game_pk, team) of every starter whose projection an event invalidates.
+    """
+    affected = []
+    for event in events:
+        team = event.get('pitcher_team') or event['team']
+        if event['event'] == 'pitcher_scratched' and not event.get('pitcher'):
+            continue
+        if (event['game_pk'], team) not in affected:
+            affected.append((event['game_pk'], team))
+    return affected
+
+
+class LineupWatcher:
+    """
+    Watches one slate with a single coroutine and one schedule request per poll.
+
+    Every poll payload is stored in the snapshot store and its id is attached to the
+    events it produced. Events are appended to cache/watch/<date>.jsonl and passed to
+    any registered hooks; re-projections run in a worker thread so polling keeps time.
+    """
+
+    def __init__(self, date: str, hooks: Optional[List[Callable[[Dict], None]]] = None, reproject: bool = True):
+        self.date = date
+        self.season = int(date[:4])
+        self.hooks = hooks or []
+        self.reproject = reproject
+        self.state = SlateState()
+        self.names: Dict[int, str] = {}
+        # Last posted-lineup scenario per (game_pk, pitching team), so late scratches are deltas
+        self.scenarios: Dict[Tuple[int, str], LineupScenario] = {}
+        self.events_path = cache_path('watch', f"{date}.jsonl")
+
+    def emit(self, event: Dict) -> None:
+        event = {'time': datetime.now().isoformat(timespec='seconds'), 'date': self.date, **event}
+        with open(self.events_path, 'a') as f:
+            f.write(json.dumps(event, default=json_default) + '\n')
+        print(f"[{event['time']}] {event['event']}: {', '.join(f'{k}={v}' for k, v in event.items() if k not in ('time', 'date', 'event'))}")
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"Event hook failed: {str(e)}")
+
+    def project(self, game_pk: int, team: str, games: pd.DataFrame, lineups: pd.DataFrame, people: Dict[int, str]) -> Optional[Dict]:
+        game = games[games['game_pk'] == game_pk].iloc[0]
+        is_home = game['home'] == team
+        opponent = game['away'] if is_home else game['home']
+        pitcher_id = int(game['home_pitcher_id'] if is_home else game['away_pitcher_id'])
+        lineup = lineups[(lineups['game_pk'] == game_pk) & (lineups['team'] == opponent)].sort_values('slot')
+        if not pitcher_id:
+            return None
+
+        pitcher_info = {
+            'pitcher_name': people.get(pitcher_id, ''),
+            'team': team,
+            'opponent': opponent,
+            'mlbam_id': pitcher_id,
+            'fg_id': mlbam_to_fangraphs(pitcher_id) or -1
+        }
+        lineup_data = [
+            {'name': people.get(mlbam_id, ''), 'team': opponent, 'mlbam_id': mlbam_id}
+            for mlbam_id in lineup['mlbam_id'].tolist()
+        ]
+        provisional = not lineup_data
+        if provisional:
+            # Project against the opponent's typical lineup until the real one posts
+            lineup_data = get_projected_lineup(opponent, self.date)
+            if not lineup_data:
+                return None
+        scenario = self.scenarios.get((game_pk, team))
+        swaps = None
+        if (not provisional and scenario is not None and scenario.pitcher_info['mlbam_id'] == pitcher_id
+                and len(lineup_data) == len(scenario.lineup)):
+            # Same starter, same lineup length: re-score only the changed slots
+            swaps = {
+                slot: batter for slot, (batter, previous) in enumerate(zip(lineup_data, scenario.lineup), start=1)
+                if batter['mlbam_id'] != previous.get('mlbam_id')
+            }
+            scenario = scenario.apply(swaps)
+        else:
+            scenario = LineupScenario(pitcher_info, lineup_data, self.season)
+        if not provisional:
+            self.scenarios[(game_pk, team)] = scenario
+        projections = scenario.evaluate()
+        # The same park/weather adjustment the daily run applies, so the numbers match its export
+        projections['strikeouts'] = apply_contextual_adjustments(
+            pitcher={
+                'name': pitcher_info['pitcher_name'],
+                'team': team,
+                'opponent': opponent,
+                'home_away': 'Home' if is_home else 'Away'
+            },
+            raw_k=projections['strikeouts']
+        )['adjusted_k']
+        return {'event': 'projection', 'game_pk': game_pk, 'pitcher': pitcher_info['pitcher_name'],
+                'team': team, 'opponent': opponent, 'provisional': provisional,
+                'incremental': swaps is not None,
+                **{MARKETS[market].column: float(value) for market, value in projections.items()}}
+
+    async def poll_once(self) -> Optional[float]:
+        data = await asyncio.to_thread(fetch_schedule_range, self.date, self.date)
+        snapshot_id = put_json(data)
+        games, lineups, people = parse_schedule_payload(data)
+        # Keep names across polls so a scratched starter is still reported by name
+        self.names.update(zip(people['mlbam_id'].tolist(), people['name'].tolist()))
+        names = self.names
+
+        events = self.state.diff(games, lineups, names)
+        for event in events:
+            self.emit({**event, 'snapshot_id': snapshot_id})
+
+        if self.reproject:
+            for game_pk, team in affected_pitchers(events):
+                try:
+                    projection = await asyncio.to_thread(self.project, game_pk, team, games, lineups, names)
+                except Exception as e:
+                    print(f"Error re-projecting {team} starter in game {game_pk}: {str(e)}")
+                    continue
+                if projection:
+                    self.emit({**projection, 'snapshot_id': snapshot_id})
+
+        return poll_interval(games, self.state.posted(), pd.Timestamp.now(tz='UTC'))
+
+    async def run(self) -> None:
+        print(f"Watching lineups for {self.date}; events -> {self.events_path}")
+        while True:
+            try:
+                interval = await self.poll_once()
+            except Exception as e:
+                # A bad payload or a failing step shouldn't end the watch; try again on the next poll
+                print(f"Error polling schedule: {str(e)}")
+                interval = PENDING_POLL_SECONDS
+            if interval is None:
+                print("Every game on the slate has started; stopping watcher")
+                return
+            await asyncio.sleep(interval)
+
+
+def command_hook(command: str) -> Callable[[Dict], None]:
+    """
+    Hook that runs a local command per event with the event JSON on stdin.
+    """
+    def hook(event: Dict) -> None:
+        subprocess.run(command, shell=True, input=json.dumps(event, default=json_default), text=True, timeout=30)
+    return hook
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch today's lineups and re-project affected starters")
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'))
+    parser.add_argument('--hook', default=None, help="Command to run for each event (event JSON on stdin)")
+    parser.add_argument('--no-reproject', action='store_true')
+    args = parser.parse_args()
+
+    hooks = [command_hook(args.hook)] if args.hook else []
+    asyncio.run(LineupWatcher(args.date, hooks, reproject=not args.no_reproject).run())
+
+
+if __name__ == "__main__":
+    main()
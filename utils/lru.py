@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry once maxsize is
+    reached, and counts hits and misses so callers can report how well it works.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        (found, value); a cached value may itself be None.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+                f"{stats['size']}/{self.maxsize} entries, {stats['evictions']} evicted")
@@ -0,0 +1,122 @@
+import os
+import requests
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from pybaseball import chadwick_register
+
+from utils.data_loader import cache_path, load_snapshot_frame
+
+REGISTRY_COLUMNS = ['key_mlbam', 'key_fangraphs', 'name_first', 'name_last']
+PLAYERS_URL = "https://statsapi.mlb.com/api/v1/sports/1/players"
+
+_registry: Optional[pd.DataFrame] = None
+_registry_id: Optional[str] = None
+_mlbam_to_fg: Dict[int, int] = {}
+_fg_to_mlbam: Dict[int, int] = {}
+_fg_by_name: Dict[Tuple[str, str], int] = {}
+# season -> (snapshot id, hands frame, mlbam id -> (bats, throws))
+_hands: Dict[int, Tuple[str, pd.DataFrame, Dict[int, Tuple[str, str]]]] = {}
+
+
+def registry_snapshot(refresh: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    (snapshot_id, registry) for the cross-site player id registry (MLBAM <-> FanGraphs),
+    pinned to the current run. Live runs reuse the last downloaded registry until
+    refresh is requested.
+    """
+    global _registry, _registry_id
+
+    def fetch():
+        path = cache_path('registry', 'players.parquet')
+        if os.path.exists(path) and not refresh:
+            # Registry cached before it went through the snapshot store
+            return pd.read_parquet(path)
+        print("Downloading player id registry...")
+        registry = chadwick_register()[REGISTRY_COLUMNS]
+        registry = registry[(registry['key_mlbam'] > 0) & (registry['key_fangraphs'] > 0)]
+        return registry.astype({'key_mlbam': 'int32', 'key_fangraphs': 'int32'}).reset_index(drop=True)
+
+    snapshot_id, registry = load_snapshot_frame('registry', fetch, reuse_key='registry', refresh=refresh)
+    if snapshot_id != _registry_id:
+        _mlbam_to_fg.clear()
+        _fg_to_mlbam.clear()
+        _fg_by_name.clear()
+        _mlbam_to_fg.update(zip(registry['key_mlbam'].tolist(), registry['key_fangraphs'].tolist()))
+        _fg_to_mlbam.update(zip(registry['key_fangraphs'].tolist(), registry['key_mlbam'].tolist()))
+        names = zip(registry['name_first'].str.lower().tolist(), registry['name_last'].str.lower().tolist())
+        for name, fg_id in zip(names, registry['key_fangraphs'].tolist()):
+            _fg_by_name.setdefault(name, fg_id)
+        _registry, _registry_id = registry, snapshot_id
+    return snapshot_id, _registry
+
+
+def load_registry(refresh: bool = False) -> pd.DataFrame:
+    return registry_snapshot(refresh)[1]
+
+
+def mlbam_to_fangraphs(mlbam_id: int) -> Optional[int]:
+    load_registry()
+    return _mlbam_to_fg.get(int(mlbam_id))
+
+
+def fangraphs_to_mlbam(fg_id: int) -> Optional[int]:
+    load_registry()
+    return _fg_to_mlbam.get(int(fg_id))
+
+
+def lookup_fangraphs_id(first_name: str, last_name: str) -> Optional[int]:
+    """
+    Exact (case-insensitive) name lookup against the local registry, so resolving ids
+    needs no network access once the registry is cached.
+    """
+    load_registry()
+    return _fg_by_name.get((first_name.lower(), last_name.lower()))
+
+
+def handedness_snapshot(season: int, refresh: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    (snapshot_id, hands) with bats/throws for every player on a season roster, from a
+    single statsapi request pinned to the current run and reused across live runs
+    until refresh is requested. Columns: mlbam_id, key_fangraphs (-1 when unmapped),
+    bats, throws.
+    """
+    def fetch():
+        path = cache_path('registry', f"hands_{season}.parquet")
+        if os.path.exists(path) and not refresh:
+            return pd.read_parquet(path)
+        print(f"Downloading player handedness for {season}...")
+        response = requests.get(PLAYERS_URL, params={'season': season}, timeout=30)
+        response.raise_for_status()
+        people = response.json().get('people', [])
+        hands = pd.DataFrame({
+            'mlbam_id': [p.get('id', 0) for p in people],
+            'bats': [p.get('batSide', {}).get('code', 'R') for p in people],
+            'throws': [p.get('pitchHand', {}).get('code', 'R') for p in people]
+        })
+        registry = load_registry()
+        hands['key_fangraphs'] = hands['mlbam_id'].map(
+            dict(zip(registry['key_mlbam'], registry['key_fangraphs']))
+        ).fillna(-1)
+        hands = hands.astype({'mlbam_id': 'int32', 'key_fangraphs': 'int32'})
+        hands['bats'] = hands['bats'].astype(pd.CategoricalDtype(['L', 'R', 'S']))
+        hands['throws'] = hands['throws'].astype(pd.CategoricalDtype(['L', 'R', 'S']))
+        return hands
+
+    snapshot_id, hands = load_snapshot_frame(f"hands:{season}", fetch, reuse_key=f"hands_{season}", refresh=refresh)
+    if season not in _hands or _hands[season][0] != snapshot_id:
+        _hands[season] = (snapshot_id, hands, dict(zip(
+            hands['mlbam_id'].tolist(), zip(hands['bats'].astype(str), hands['throws'].astype(str))
+        )))
+    return snapshot_id, _hands[season][1]
+
+
+def load_handedness(season: int, refresh: bool = False) -> pd.DataFrame:
+    return handedness_snapshot(season, refresh)[1]
+
+
+def get_handedness(mlbam_id: int, season: int) -> Tuple[str, str]:
+    """
+    (bats, throws) for a player, defaulting to right-handed when unknown.
+    """
+    load_handedness(season)
+    return _hands[season][2].get(int(mlbam_id), ('R', 'R'))
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+@dataclass(slots=True)
+class Game:
+    game_pk: int
+    game_time: str
+    home: str
+    away: str
+
+
+@dataclass(slots=True)
+class Starter:
+    mlbam_id: int
+    name: str
+    team: str
+    opponent: str
+    game_pk: int
+    is_home: bool
+    game_time: str = ''
+    fg_id: int = -1
+    k_per_9: float = 0.0
+    ip_per_g: float = 0.0
+    pitch_mix: Dict[str, float] = field(default_factory=dict)
+    has_stats: bool = False
+    matchup: Optional[Dict] = None
+
+    def to_info(self) -> Dict:
+        """
+        The pitcher dict the feature functions (analyze_matchup, platoon, projector) take.
+        """
+        return {
+            'pitcher_name': self.name,
+            'team': self.team,
+            'opponent': self.opponent,
+            'fg_id': self.fg_id,
+            'mlbam_id': self.mlbam_id,
+            'is_home': self.is_home,
+            'stats': {'k_per_9': self.k_per_9, 'ip_per_g': self.ip_per_g, 'pitch_mix': self.pitch_mix}
+        }
+
+
+@dataclass(slots=True)
+class Lineup:
+    game_pk: int
+    team: str
+    batters: List[Dict]
+    mlbam_ids: np.ndarray
+    projected: bool = False
+
+    @classmethod
+    def from_batters(cls, game_pk: int, team: str, batters: List[Dict]) -> 'Lineup':
+        return cls(
+            game_pk, team, batters,
+            np.array([batter.get('mlbam_id') or 0 for batter in batters], dtype=np.int32),
+            any(batter.get('projected') for batter in batters)
+        )
+
+    @property
+    def names(self) -> List[str]:
+        return [batter['name'] for batter in self.batters]
+
+
+@dataclass(slots=True)
+class Prop:
+    pitcher: str
+    team: str
+    line: float
+    book: str = ''
+    over_odds: Optional[float] = None
+    under_odds: Optional[float] = None
+    market: str = 'strikeouts'
+
+
+class Slate:
+    """
+    One day's games, starters, lineups and props, indexed so every join in the daily
+    pipeline is a dict lookup: games by game_pk, starters by MLBAM id, lineups by
+    (game_pk, team) and props by (pitcher name, team), then market.
+    """
+
+    __slots__ = ('date', 'games', 'starters', 'lineups', 'props')
+
+    def __init__(self, date: str):
+        self.date = date
+        self.games: Dict[int, Game] = {}
+        self.starters: Dict[int, Starter] = {}
+        self.lineups: Dict[Tuple[int, str], Lineup] = {}
+        self.props: Dict[Tuple[str, str], Dict[str, Prop]] = {}
+
+    @classmethod
+    def from_pitchers(cls, date: str, pitchers: List[Dict]) -> 'Slate':
+        """
+        Build from fetch_pitchers() records. Starters without an MLBAM id can't be
+        indexed and are skipped.
+        """
+        slate = cls(date)
+        for pitcher in pitchers:
+            if not pitcher.get('mlbam_id'):
+                print(f"Skipping {pitcher.get('pitcher_name')}: no MLBAM id")
+                continue
+            game_pk = int(pitcher.get('game_pk') or 0)
+            home, away = (pitcher['team'], pitcher['opponent']) if pitcher['is_home'] else (pitcher['opponent'], pitcher['team'])
+            slate.games.setdefault(game_pk, Game(game_pk, pitcher.get('game_time', ''), home, away))
+            slate.starters[int(pitcher['mlbam_id'])] = Starter(
+                int(pitcher['mlbam_id']), pitcher['pitcher_name'], pitcher['team'], pitcher['opponent'],
+                game_pk, bool(pitcher['is_home']), pitcher.get('game_time', '')
+            )
+        return slate
+
+    def attach_stats(self, pitcher_stats: pd.DataFrame) -> None:
+        """
+        Join process_pitcher_stats() rows onto starters by MLBAM id.
+        """
+        for row in pitcher_stats.itertuples(index=False):
+            starter = self.starters.get(int(row.mlbam_id))
+            if starter is None:
+                continue
+            starter.fg_id = int(row.fg_id)
+            starter.k_per_9 = float(row.k_per_9)
+            starter.ip_per_g = float(row.ip_per_g)
+            starter.pitch_mix = row.pitch_mix
+            starter.has_stats = True
+
+    def add_lineup(self, game_pk: int, team: str, batters: List[Dict]) -> Optional[Lineup]:
+        if not batters:
+            return None
+        lineup = Lineup.from_batters(game_pk, team, batters)
+        self.lineups[(game_pk, team)] = lineup
+        return lineup
+
+    def add_props(self, props: List[Dict]) -> None:
+        for prop in props:
+            market = prop.get('market', 'strikeouts')
+            self.props.setdefault((prop['pitcher'], prop['team']), {})[market] = Prop(
+                prop['pitcher'], prop['team'], prop['line'], prop.get('book', ''),
+                prop.get('over_odds'), prop.get('under_odds'), market
+            )
+
+    def opposing_lineup(self, starter: Starter) -> Optional[Lineup]:
+        return self.lineups.get((starter.game_pk, starter.opponent))
+
+    def prop_for(self, starter: Starter, market: str = 'strikeouts') -> Optional[Prop]:
+        return self.props.get((starter.name, starter.team), {}).get(market)
+
+    def props_for(self, starter: Starter) -> Dict[str, Prop]:
+        return dict(self.props.get((starter.name, starter.team), {}))
+
+    def starters_with_stats(self) -> Iterator[Starter]:
+        return (starter for starter in self.starters.values() if starter.has_stats)
@@ -0,0 +1,140 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+# A claimed task whose worker hasn't finished it within this many seconds is handed out again
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    shard TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, shard, task_id);
+"""
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    SQLite-backed task queue that any number of worker processes can share, on one
+    host or several mounting the same filesystem (it needs working POSIX locks, so
+    not every network filesystem qualifies).
+
+    A claim hands out a batch of tasks from one shard under a lease; completing
+    marks them done, and a crashed worker's tasks become claimable again once the
+    lease runs out, so a killed run resumes where it stopped. Tasks that fail
+    MAX_ATTEMPTS times are parked as 'failed'.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def enqueue(self, tasks: List[Tuple[str, str, Dict]]) -> int:
+        """
+        Add (task_id, shard, payload) tasks; ids already queued are left alone.
+        Returns the number added.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (task_id, shard, payload) VALUES (?, ?, ?)",
+                [(task_id, shard, json.dumps(payload)) for task_id, shard, payload in tasks]
+            )
+            connection.execute("COMMIT")
+            return connection.total_changes - before
+        finally:
+            connection.close()
+
+    def claim(self, worker: str, batch_size: int) -> List[Tuple[str, Dict]]:
+        """
+        Lease up to batch_size tasks from a single shard (the earliest with work
+        left), so a worker's batch shares whatever it loads for that shard.
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, so two workers never claim the same rows
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', error = COALESCE(error, 'lease expired') "
+                "WHERE status = 'claimed' AND claimed_at < ? AND attempts >= ?",
+                (now - LEASE_SECONDS, MAX_ATTEMPTS)
+            )
+            claimable =("(status = 'pending' OR (status = 'claimed' AND claimed_at < ?)) "
+                         "AND attempts < ?")
+            row = connection.execute(
+                f"SELECT shard FROM tasks WHERE {claimable} ORDER BY shard LIMIT 1",
+                (now - LEASE_SECONDS, MAX_ATTEMPTS)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return []
+            rows = connection.execute(
+                f"SELECT task_id, payload FROM tasks WHERE shard = ? AND {claimable} ORDER BY task_id LIMIT ?",
+                (row[0], now - LEASE_SECONDS, MAX_ATTEMPTS, batch_size)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE tasks SET status = 'claimed', worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE task_id = ?",
+                [(worker, now, task_id) for task_id, _ in rows]
+            )
+            connection.execute("COMMIT")
+            return [(task_id, json.loads(payload)) for task_id, payload in rows]
+        finally:
+            connection.close()
+
+    def complete(self, task_ids: List[str]) -> None:
+        with closing(self._connect()) as connection:
+            connection.executemany("UPDATE tasks SET status = 'done', error = NULL WHERE task_id = ?",
+                                   [(task_id,) for task_id in task_ids])
+
+    def fail(self, task_id: str, error: str) -> None:
+        """
+        Record an error; the task is retried until it has used MAX_ATTEMPTS claims.
+        """
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ? WHERE task_id = ?",
+                (MAX_ATTEMPTS, error, task_id)
+            )
+
+    def reset_failed(self) -> int:
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                "UPDATE tasks SET status = 'pending', attempts = 0 WHERE status = 'failed'"
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with closing(self._connect()) as connection:
+            return dict(connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def errors(self, limit: int = 20) -> List[Tuple[str, Optional[str]]]:
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                "SELECT task_id, error FROM tasks WHERE status = 'failed' ORDER BY task_id LIMIT ?", (limit,)
+            ).fetchall()